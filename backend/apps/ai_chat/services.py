@@ -2,6 +2,7 @@
 Servicio para consultar el stock y generar contexto para la IA
 """
 from django.db.models import Count, Avg, Sum, Q
+from apps.stock.derivados import obtener_derivado
 from apps.stock.models import Stock
 from typing import Dict, List, Any
 import json
@@ -11,6 +12,9 @@ class StockQueryService:
     """
     Servicio que maneja las consultas al stock y genera
     información contextual para la IA.
+
+    Los resúmenes se leen de la caché de derivados del stock, que la carga
+    nocturna deja precalculada; los métodos calculate_* hacen las consultas.
     """
 
     @staticmethod
@@ -18,6 +22,13 @@ class StockQueryService:
         """
         Obtiene un resumen general del stock
         """
+        return obtener_derivado('resumen_stock', StockQueryService.calculate_stock_summary)
+
+    @staticmethod
+    def calculate_stock_summary() -> Dict[str, Any]:
+        """
+        Calcula el resumen general del stock
+        """
         total_vehicles = Stock.objects.count()
         available = Stock.objects.filter(reservado=False).count()
         reserved = Stock.objects.filter(reservado=True).count()
@@ -42,6 +53,13 @@ class StockQueryService:
         """
         Obtiene resumen por marca
         """
+        return obtener_derivado('resumen_marcas', StockQueryService.calculate_brands_summary)
+
+    @staticmethod
+    def calculate_brands_summary() -> List[Dict[str, Any]]:
+        """
+        Calcula el resumen por marca
+        """
         brands = Stock.objects.values('marca').annotate(
             total=Count('bastidor'),
             avg_price=Avg('precio_venta'),
@@ -63,6 +81,16 @@ class StockQueryService:
         """
         Obtiene resumen por modelo, opcionalmente filtrado por marca
         """
+        brand = (brand or '').lower()
+        return obtener_derivado(
+            'resumen_modelos', lambda: StockQueryService.calculate_models_summary(brand), brand
+        )
+
+    @staticmethod
+    def calculate_models_summary(brand: str = None) -> List[Dict[str, Any]]:
+        """
+        Calcula el resumen por modelo, opcionalmente filtrado por marca
+        """
         queryset = Stock.objects.all()
         if brand:
             queryset = queryset.filter(marca__iexact=brand)
@@ -147,6 +175,13 @@ class StockQueryService:
         """
         Obtiene distribución de vehículos por rango de precio
         """
+        return obtener_derivado('rangos_precio', StockQueryService.calculate_price_range_summary)
+
+    @staticmethod
+    def calculate_price_range_summary() -> List[Dict[str, Any]]:
+        """
+        Calcula la distribución de vehículos por rango de precio
+        """
         ranges = [
             (0, 10000, '0-10k'),
             (10000, 20000, '10k-20k'),
@@ -174,6 +209,13 @@ class StockQueryService:
         """
         Genera un contexto completo del stock para la IA
         """
+        return obtener_derivado('contexto_chat', StockQueryService.build_context_for_ai)
+
+    @staticmethod
+    def build_context_for_ai() -> str:
+        """
+        Construye el contexto del stock para la IA a partir de los resúmenes
+        """
         summary = StockQueryService.get_stock_summary()
         brands = StockQueryService.get_brands_summary()
         price_ranges = StockQueryService.get_price_range_summary()
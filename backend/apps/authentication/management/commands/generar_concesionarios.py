@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from apps.authentication.models import Concesionario, Provincia
+from apps.stock.perfilado import ComandoPerfilable
 import random
 
 # Datos de concesionarios por provincia
@@ -265,7 +266,7 @@ CONCESIONARIOS_DATA = [
 ]
 
 
-class Command(BaseCommand):
+class Command(ComandoPerfilable, BaseCommand):
     help = 'Genera datos de concesionarios para las provincias existentes'
 
     def add_arguments(self, parser):
@@ -291,13 +292,15 @@ class Command(BaseCommand):
             self.stdout.write(
                 self.style.WARNING('\n🗑️  Limpiando concesionarios anteriores...')
             )
-            Concesionario.objects.all().delete()
+            with self.perfil.paso('limpieza') as medicion:
+                medicion['filas'], _ = Concesionario.objects.all().delete()
             self.stdout.write(
                 self.style.SUCCESS('✅ Concesionarios limpiados')
             )
 
         # Generar datos de concesionarios
-        self._generar_concesionarios()
+        with self.perfil.paso('generacion') as medicion:
+            medicion['filas'] = self._generar_concesionarios()
 
         self.stdout.write(
             self.style.SUCCESS('\n✅ Generación de concesionarios completada')
@@ -346,3 +349,4 @@ class Command(BaseCommand):
         self.stdout.write(
             self.style.SUCCESS(f'✅ {contador} concesionarios generados en total')
         )
+        return contador
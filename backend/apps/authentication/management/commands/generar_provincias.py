@@ -3,6 +3,7 @@ Comando Django para generar todas las provincias españolas en la base de datos
 """
 from django.core.management.base import BaseCommand
 from apps.authentication.models import Provincia
+from apps.stock.perfilado import ComandoPerfilable
 
 PROVINCIAS_ESPAÑA = [
     ('01', 'Álava'),
@@ -57,7 +58,7 @@ PROVINCIAS_ESPAÑA = [
 ]
 
 
-class Command(BaseCommand):
+class Command(ComandoPerfilable, BaseCommand):
     help = 'Genera todas las provincias españolas en la base de datos'
 
     def add_arguments(self, parser):
@@ -83,13 +84,16 @@ class Command(BaseCommand):
             self.stdout.write(
                 self.style.WARNING('\n🗑️  Limpiando provincias anteriores...')
             )
-            cantidad_eliminada, _ = Provincia.objects.all().delete()
+            with self.perfil.paso('limpieza') as medicion:
+                cantidad_eliminada, _ = Provincia.objects.all().delete()
+                medicion['filas'] = cantidad_eliminada
             self.stdout.write(
                 self.style.SUCCESS(f'✅ {cantidad_eliminada} provincias eliminadas')
             )
 
         # Generar provincias
-        self._generar_provincias()
+        with self.perfil.paso('generacion') as medicion:
+            medicion['filas'] = self._generar_provincias()
 
         self.stdout.write(
             self.style.SUCCESS('\n✅ Generación completada')
@@ -140,3 +144,4 @@ class Command(BaseCommand):
         self.stdout.write(
             self.style.SUCCESS(f'   • Existentes: {contador_existentes}')
         )
+        return contador_creadas
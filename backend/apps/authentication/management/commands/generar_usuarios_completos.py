@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from apps.authentication.models import User, Perfil, Concesionario, Provincia
+from apps.stock.perfilado import ComandoPerfilable
 from datetime import datetime, date, timedelta
 import random
 import string
@@ -102,7 +103,7 @@ USUARIOS_EJECUTIVOS = [
 ]
 
 
-class Command(BaseCommand):
+class Command(ComandoPerfilable, BaseCommand):
     help = 'Genera una estructura completa de usuarios con jerarquía organizacional'
 
     def add_arguments(self, parser):
@@ -197,23 +198,29 @@ class Command(BaseCommand):
                 self.style.WARNING('\n🗑️  Limpiando usuarios anteriores...')
             )
             # No eliminar superusuarios ni el usuario actual
-            User.objects.exclude(is_superuser=True).exclude(username='admin').delete()
+            with self.perfil.paso('limpieza') as medicion:
+                medicion['filas'], _ = User.objects.exclude(is_superuser=True).exclude(username='admin').delete()
             self.stdout.write(
                 self.style.SUCCESS('✅ Usuarios limpiados')
             )
 
         with transaction.atomic():
             # Crear perfiles si no existen
-            self._crear_perfiles()
+            with self.perfil.paso('perfiles'):
+                self._crear_perfiles()
 
             # Crear usuarios ejecutivos predefinidos
-            ejecutivos = self._crear_usuarios_ejecutivos()
+            with self.perfil.paso('ejecutivos') as medicion:
+                ejecutivos = self._crear_usuarios_ejecutivos()
+                medicion['filas'] = len(ejecutivos)
 
             # Crear estructura jerárquica de usuarios
-            self._crear_usuarios_jerarquicos(count, ejecutivos)
+            with self.perfil.paso('jerarquia') as medicion:
+                medicion['filas'] = self._crear_usuarios_jerarquicos(count, ejecutivos)
 
             # Crear algunos usuarios dados de baja
-            self._crear_usuarios_baja()
+            with self.perfil.paso('bajas') as medicion:
+                medicion['filas'] = self._crear_usuarios_baja()
 
         self.stdout.write(
             self.style.SUCCESS('\n✅ Generación de usuarios completada')
@@ -383,6 +390,7 @@ class Command(BaseCommand):
         self.stdout.write(
             self.style.SUCCESS(f'✅ {usuarios_creados} usuarios jerárquicos creados')
         )
+        return usuarios_creados
 
     def _crear_usuarios_baja(self):
         """Crea algunos usuarios dados de baja"""
@@ -409,3 +417,4 @@ class Command(BaseCommand):
         self.stdout.write(
             self.style.SUCCESS(f'✅ {usuarios_baja} usuarios marcados como dados de baja')
         )
+        return usuarios_baja
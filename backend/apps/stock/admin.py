@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Stock, StockHistorico
+from django.template.response import TemplateResponse
+from django.urls import path
+from .models import CambioStock, CargaStock, JobRun, JobStep, Stock, StockHistorico, StockVersion
+from .perfilado import tendencias
 
 
 @admin.register(Stock)
@@ -156,3 +159,173 @@ class StockHistoricoAdmin(admin.ModelAdmin):
             'fields': ('fecha_snapshot', 'fecha_insert', 'fecha_actualizacion'),
         }),
     )
+
+
+@admin.register(StockVersion)
+class StockVersionAdmin(admin.ModelAdmin):
+    list_display = (
+        'bastidor',
+        'marca',
+        'modelo',
+        'precio_venta',
+        'reservado',
+        'publicado',
+        'valid_from',
+        'valid_to',
+    )
+    list_filter = (
+        'marca',
+        'valid_from',
+        'valid_to',
+    )
+    search_fields = ('bastidor', 'matricula')
+    date_hierarchy = 'valid_from'
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(CargaStock)
+class CargaStockAdmin(admin.ModelAdmin):
+    list_display = (
+        'fecha_snapshot',
+        'modo',
+        'estado',
+        'paso_completado',
+        'insertados',
+        'actualizados',
+        'sin_cambios',
+        'eliminados',
+        'fecha_inicio',
+        'fecha_fin',
+    )
+    list_filter = (
+        'modo',
+        'estado',
+        'fecha_snapshot',
+    )
+    readonly_fields = (
+        'modo',
+        'fecha_snapshot',
+        'fecha_inicio',
+        'fecha_fin',
+        'insertados',
+        'actualizados',
+        'sin_cambios',
+        'eliminados',
+        'estado',
+        'paso_completado',
+        'opciones',
+        'error',
+    )
+
+
+@admin.register(CambioStock)
+class CambioStockAdmin(admin.ModelAdmin):
+    """Eventos del outbox; los escriben los triggers de stock, así que son de solo lectura"""
+    list_display = (
+        'id',
+        'bastidor',
+        'operacion',
+        'columnas',
+        'version',
+        'fecha',
+    )
+    list_filter = (
+        'operacion',
+        'fecha',
+    )
+    search_fields = ('bastidor',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class JobStepInline(admin.TabularInline):
+    model = JobStep
+    extra = 0
+    can_delete = False
+    fields = (
+        'order',
+        'name',
+        'rows',
+        'wall_time',
+        'cpu_time',
+        'db_queries',
+        'db_time',
+        'peak_rss',
+        'profile',
+    )
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(JobRun)
+class JobRunAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/stock/jobrun/change_list.html'
+    list_display = (
+        'command',
+        'status',
+        'started_at',
+        'wall_time',
+        'cpu_time',
+        'db_queries',
+        'db_time',
+        'peak_rss_mb',
+    )
+    list_filter = (
+        'command',
+        'status',
+        'started_at',
+    )
+    readonly_fields = (
+        'command',
+        'options',
+        'status',
+        'error',
+        'started_at',
+        'finished_at',
+        'wall_time',
+        'cpu_time',
+        'db_queries',
+        'db_time',
+        'peak_rss',
+    )
+    inlines = [JobStepInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description='Pico de memoria (MB)', ordering='peak_rss')
+    def peak_rss_mb(self, obj):
+        return round(obj.peak_rss / 2 ** 20, 1) if obj.peak_rss is not None else None
+
+    def get_urls(self):
+        return [
+            path(
+                'tendencias/',
+                self.admin_site.admin_view(self.tendencias_view),
+                name='stock_jobrun_tendencias',
+            ),
+        ] + super().get_urls()
+
+    def tendencias_view(self, request):
+        """Evolución por paso de las últimas ejecuciones de cada comando"""
+        comandos = JobRun.objects.order_by('command').values_list('command', flat=True).distinct()
+        try:
+            ultimas = max(1, int(request.GET.get('ultimas', 30)))
+        except ValueError:
+            ultimas = 30
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Tendencias de ejecuciones',
+            'opts': self.model._meta,
+            'ultimas': ultimas,
+            'tendencias': [tendencias(comando, ultimas) for comando in comandos],
+        }
+        return TemplateResponse(request, 'admin/stock/jobrun/tendencias.html', context)
@@ -2,12 +2,15 @@
 Generador de datos de vehículos usando IA para mayor realismo y coherencia
 """
 import logging
+import queue
 import random
 import json
 import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
 from decimal import Decimal
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterator, List, Optional
 import uuid
 
 from django.conf import settings
@@ -22,20 +25,133 @@ from apps.stock.scrapers import (
 logger = logging.getLogger(__name__)
 
 
+class AdaptiveBatchSizer:
+    """
+    Ajusta el tamaño de lote según la latencia y la tasa de errores observadas.
+
+    Crece poco a poco mientras los lotes responden rápido, se reduce un cuarto
+    si la latencia supera el objetivo y se divide a la mitad ante un error. No
+    vuelve a crecer mientras la tasa de errores reciente supere el umbral.
+    """
+
+    def __init__(self, initial: int, minimum: int = 2, maximum: int = 30,
+                 target_latency: float = 20.0, error_threshold: float = 0.2, window: int = 5):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.size = min(max(initial, self.minimum), self.maximum)
+        self.step = max(1, self.size // 4)
+        self.target_latency = target_latency
+        self.error_threshold = error_threshold
+        self._results = deque(maxlen=window)
+
+    @property
+    def error_rate(self) -> float:
+        return self._results.count(False) / len(self._results) if self._results else 0.0
+
+    def record(self, latency: Optional[float], ok: bool):
+        """Registra el resultado de un lote y recalcula el tamaño del siguiente"""
+        self._results.append(ok)
+        if not ok:
+            self.size = max(self.minimum, self.size // 2)
+        elif self.error_rate > self.error_threshold:
+            return
+        elif latency > self.target_latency:
+            self.size = max(self.minimum, int(self.size * 0.75))
+        elif latency < self.target_latency / 2:
+            self.size = min(self.maximum, self.size + self.step)
+
+
+class StreamingVehicleParser:
+    """
+    Parser JSON incremental que entrega cada vehículo en cuanto se cierra su objeto.
+
+    Sigue el anidamiento de llaves y corchetes (y las cadenas, con sus escapes)
+    fragmento a fragmento y devuelve los objetos cuyo contenedor es un array,
+    sea el array "vehicles" o un array en la raíz. Solo guarda el texto del
+    objeto en curso e ignora lo que haya fuera del JSON.
+    """
+
+    def __init__(self):
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._object_depth = None
+        self._buffer = []
+        self.errors = 0
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """Procesa un fragmento de la respuesta y devuelve los objetos completados en él"""
+        objects = []
+        start = 0 if self._object_depth is not None else None
+
+        for i, char in enumerate(chunk):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = bool(self._stack)
+            elif char in '{[':
+                if char == '{' and self._object_depth is None and self._stack and self._stack[-1] == '[':
+                    self._object_depth = len(self._stack)
+                    start = i
+                self._stack.append(char)
+            elif char in '}]' and self._stack:
+                self._stack.pop()
+                if char == '}' and len(self._stack) == self._object_depth:
+                    self._buffer.append(chunk[start:i + 1])
+                    parsed = self._parse(''.join(self._buffer))
+                    if parsed is not None:
+                        objects.append(parsed)
+                    self._buffer = []
+                    self._object_depth = None
+                    start = None
+
+        if self._object_depth is not None:
+            self._buffer.append(chunk[start:])
+        return objects
+
+    def _parse(self, text: str) -> Optional[Dict]:
+        try:
+            parsed = json.loads(text)
+        except json.JSONDecodeError as e:
+            self.errors += 1
+            logger.warning(f"⚠️  Vehículo con JSON inválido descartado del stream: {str(e)}")
+            return None
+        return parsed if isinstance(parsed, dict) else None
+
+
 class AIVehicleGenerator:
     """Generador de datos de vehículos usando IA"""
 
-    def __init__(self):
-        """Inicializa el cliente de OpenAI con configuración para Zscaler"""
-        # Cliente httpx con SSL deshabilitado para Zscaler
-        http_client = httpx.Client(verify=False)
+    def __init__(self, api_base: Optional[str] = None, api_key: Optional[str] = None,
+                 model: Optional[str] = None, max_in_flight: Optional[int] = None):
+        """
+        Inicializa el cliente de OpenAI con configuración para Zscaler
+
+        Args:
+            api_base: URL de la API compatible con OpenAI (default: settings.DEEPSEEK_API_BASE)
+            api_key: Clave de la API (default: settings.DEEPSEEK_API_KEY)
+            model: Modelo a usar (default: settings.DEEPSEEK_MODEL)
+            max_in_flight: Peticiones simultáneas al modelo (default: settings.AI_GENERATOR_CONCURRENCIA)
+        """
+        self.max_in_flight = max(1, max_in_flight or settings.AI_GENERATOR_CONCURRENCIA)
+
+        # Cliente httpx con SSL deshabilitado para Zscaler; el pool admite una conexión por lote en vuelo
+        http_client = httpx.Client(
+            verify=False,
+            limits=httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=self.max_in_flight),
+        )
 
         self.client = OpenAI(
-            api_key=settings.DEEPSEEK_API_KEY,
-            base_url=settings.DEEPSEEK_API_BASE,
+            api_key=api_key or settings.DEEPSEEK_API_KEY,
+            base_url=api_base or settings.DEEPSEEK_API_BASE,
             http_client=http_client,
         )
-        self.model = settings.DEEPSEEK_MODEL
+        self.model = model or settings.DEEPSEEK_MODEL
         # Solo usar el modelo principal, sin fallbacks para asegurar consistencia
         self.fallback_models = []
 
@@ -50,12 +166,140 @@ class AIVehicleGenerator:
         Returns:
             Lista de diccionarios con datos de vehículos generados por IA
         """
-        vehicles = []
+        sizer = self._create_sizer(count)
 
-        # Optimización para generar 1000 coches eficientemente
-        # Usar lotes más grandes pero manejables para openai/gpt-oss-20b
+        logger.info(
+            f"Generando {count} vehículos con IA en lotes de {sizer.size} "
+            f"con hasta {self.max_in_flight} peticiones simultáneas"
+        )
+
+        results = {}
+        pending = {}
+        remaining = count
+        index = 0
+        generated = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            while remaining > 0 or pending:
+                # Mantener lleno el cupo de peticiones en vuelo con el tamaño de lote actual
+                while remaining > 0 and len(pending) < self.max_in_flight:
+                    batch_count = min(sizer.size, remaining)
+                    pending[pool.submit(self._timed_batch, batch_count, brand)] = (index, batch_count)
+                    index += 1
+                    remaining -= batch_count
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch_index, batch_count = pending.pop(future)
+                    try:
+                        batch, latency = future.result()
+                        sizer.record(latency, ok=True)
+                    except Exception as e:
+                        sizer.record(None, ok=False)
+                        logger.error(f"❌ Error generando lote de vehículos: {str(e)}")
+                        # Solo este lote pasa a fallback; el resto sigue en curso
+                        logger.warning(f"⚠️  Usando generación fallback para {batch_count} vehículos")
+                        batch = [self._generate_fallback_vehicle(brand) for _ in range(batch_count)]
+
+                    results[batch_index] = batch
+                    generated += len(batch)
+                    logger.info(
+                        f"✓ Lote completado: {len(batch)} vehículos (total: {generated}/{count}, "
+                        f"siguiente lote: {sizer.size})"
+                    )
+
+        return [vehicle for batch_index in sorted(results) for vehicle in results[batch_index]]
+
+    def stream_vehicles(self, count: int = 10, brand: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Genera vehículos con IA entregando cada uno en cuanto el modelo cierra su objeto
+
+        Los lotes se piden en paralelo igual que en generate_vehicles, pero con
+        respuestas en streaming: no se espera a la respuesta completa de ningún
+        lote. Los vehículos llegan en orden de llegada, no de lote. Si un lote
+        falla o se corta, solo los vehículos que le faltan pasan a fallback.
+
+        Args:
+            count: Número de vehículos a generar
+            brand: Marca específica (opcional)
+
+        Yields:
+            Diccionarios con datos de vehículos completados
+        """
+        sizer = self._create_sizer(count)
+        events = queue.Queue()
+
+        logger.info(
+            f"Generando {count} vehículos con IA en streaming en lotes de {sizer.size} "
+            f"con hasta {self.max_in_flight} peticiones simultáneas"
+        )
+
+        pending = {}
+        remaining = count
+        generated = 0
+
+        pool = ThreadPoolExecutor(max_workers=self.max_in_flight)
+        wait = True
+        try:
+            while remaining > 0 or pending:
+                while remaining > 0 and len(pending) < self.max_in_flight:
+                    batch_count = min(sizer.size, remaining)
+                    emitted = [0]
+
+                    def emit(vehicle, emitted=emitted):
+                        emitted[0] += 1
+                        events.put(vehicle)
+
+                    future = pool.submit(self._timed_stream_batch, batch_count, brand, emit)
+                    pending[future] = (batch_count, emitted)
+                    # Se encola al terminar, detrás de todos los vehículos del lote
+                    future.add_done_callback(events.put)
+                    remaining -= batch_count
+
+                event = events.get()
+                if not isinstance(event, Future):
+                    generated += 1
+                    yield event
+                    continue
+
+                batch_count, emitted = pending.pop(event)
+                try:
+                    latency = event.result()
+                    missing = batch_count - emitted[0]
+                    sizer.record(latency, ok=missing == 0)
+                    if missing:
+                        logger.warning(
+                            f"⚠️  El lote en streaming terminó con {emitted[0]}/{batch_count} vehículos"
+                        )
+                except Exception as e:
+                    missing = batch_count - emitted[0]
+                    sizer.record(None, ok=False)
+                    logger.error(
+                        f"❌ Error en lote en streaming tras {emitted[0]} vehículos: {str(e)}"
+                    )
+
+                if missing:
+                    logger.warning(f"⚠️  Usando generación fallback para {missing} vehículos")
+                    for _ in range(missing):
+                        generated += 1
+                        yield self._generate_fallback_vehicle(brand)
+
+                logger.info(
+                    f"✓ Lote en streaming completado (total: {generated}/{count}, "
+                    f"siguiente lote: {sizer.size})"
+                )
+        except GeneratorExit:
+            # El consumidor dejó de iterar: se cancelan los lotes sin empezar y no se
+            # espera a los que siguen en curso
+            wait = False
+            raise
+        finally:
+            pool.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _create_sizer(self, count: int) -> AdaptiveBatchSizer:
+        """Tamaño de lote inicial según la cantidad; después se adapta a la latencia y errores observados"""
         if count >= 1000:
-            batch_size = 30  # Lotes de 15 para generación masiva eficiente
+            batch_size = 30
         elif count > 100:
             batch_size = 20
         elif count > 50:
@@ -63,100 +307,122 @@ class AIVehicleGenerator:
         else:
             batch_size = 5  # Lotes pequeños para cantidades menores
 
-        logger.info(f"Generando {count} vehículos con IA en lotes de {batch_size}")
-
-        for i in range(0, count, batch_size):
-            batch_count = min(batch_size, count - i)
-            try:
-                batch = self._generate_batch(batch_count, brand)
-                vehicles.extend(batch)
-                logger.info(f"✓ Lote completado: {len(batch)} vehículos (total: {len(vehicles)}/{count})")
+        return AdaptiveBatchSizer(
+            initial=batch_size,
+            maximum=max(batch_size, settings.AI_GENERATOR_MAX_LOTE),
+            target_latency=settings.AI_GENERATOR_LATENCIA_OBJETIVO,
+        )
 
-                # Delay optimizado entre lotes para eficiencia con lotes más grandes
-                if i + batch_size < count:
-                    time.sleep(1.0)  # 1 segundo entre lotes para buen balance entre velocidad y estabilidad
+    def _timed_stream_batch(self, count: int, brand: Optional[str], emit: Callable[[Dict], None]) -> float:
+        """Pide un lote en streaming y devuelve la latencia total en segundos"""
+        start = time.perf_counter()
+        self._stream_batch(count, brand, emit)
+        return time.perf_counter() - start
 
-            except Exception as e:
-                logger.error(f"❌ Error generando lote de vehículos: {str(e)}")
-                # Si falla la IA, generar datos básicos para no bloquear
-                logger.warning(f"⚠️  Usando generación fallback para {batch_count} vehículos")
-                for _ in range(batch_count):
-                    vehicles.append(self._generate_fallback_vehicle(brand))
+    def _stream_batch(self, count: int, brand: Optional[str], emit: Callable[[Dict], None]) -> int:
+        """
+        Pide un lote con respuesta en streaming y emite cada vehículo completado al cerrarse su objeto
 
-        return vehicles
+        Returns:
+            Número de vehículos emitidos (como máximo count)
+        """
+        parser = StreamingVehicleParser()
+        emitted = 0
+
+        logger.info(f"Generando vehículos en streaming con modelo: {self.model}")
+
+        with self.client.chat.completions.create(
+            model=self.model,
+            messages=self._create_messages(count, brand),
+            temperature=0.7,
+            max_tokens=4000,
+            stream=True,
+            extra_body={
+                "data_collection": "allow"
+            }
+        ) as stream:
+            for chunk in stream:
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                for vehicle_data in parser.feed(chunk.choices[0].delta.content):
+                    if emitted < count:
+                        emit(self._complete_vehicle_data(vehicle_data))
+                        emitted += 1
+
+        return emitted
+
+    def _timed_batch(self, count: int, brand: Optional[str] = None):
+        """Pide un lote al modelo y devuelve (vehículos, latencia en segundos)"""
+        start = time.perf_counter()
+        vehicles = self._request_batch(count, brand)
+        return vehicles, time.perf_counter() - start
 
     def _generate_batch(self, count: int, brand: Optional[str] = None) -> List[Dict]:
         """Genera un lote de vehículos usando IA"""
+        try:
+            return self._request_batch(count, brand)
+        except Exception as e:
+            logger.error(f"❌ Error con modelo {self.model}: {str(e)}")
+            # Si hay error, usar fallback inmediatamente
+            logger.warning(f"⚠️  Error con {self.model}, usando generación fallback para {count} vehículos")
+            return [self._generate_fallback_vehicle(brand) for _ in range(count)]
+
+    def _request_batch(self, count: int, brand: Optional[str] = None) -> List[Dict]:
+        """Pide un lote de vehículos al modelo; lanza excepción si la petición o el JSON fallan"""
+
+        model = self.model
+
+        logger.info(f"Generando vehículos con modelo: {model}")
+
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=self._create_messages(count, brand),
+            temperature=0.7,  # Temperatura moderada para consistencia
+            max_tokens=4000,  # Aumentado proporcionalmente al batch_size para lotes más grandes
+            extra_body={
+                "data_collection": "allow"
+            }
+        )
 
-        prompt = self._create_prompt(count, brand)
-
-        # Solo usar el modelo principal openai/gpt-oss-20b
-        models_to_try = [self.model]
-        last_error = None
-
-        for model in models_to_try:
-            try:
-                logger.info(f"Generando vehículos con modelo: {model}")
-
-                response = self.client.chat.completions.create(
-                    model=model,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "Eres un experto en el mercado de vehículos de ocasión en España. "
-                                     "Generas datos realistas y coherentes de vehículos usados con relaciones "
-                                     "lógicas entre año, kilometraje, precio y condición. "
-                                     "Siempre respondes ÚNICAMENTE con JSON válido, sin texto adicional."
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    temperature=0.7,  # Temperatura moderada para consistencia
-                    max_tokens=4000,  # Aumentado proporcionalmente al batch_size para lotes más grandes
-                    extra_body={
-                        "data_collection": "allow"
-                    }
-                )
+        # Parsear respuesta JSON con mejor manejo de errores
+        content = response.choices[0].message.content
+        logger.debug(f"Respuesta cruda del modelo {model}: {content[:500]}...")
 
-                # Parsear respuesta JSON con mejor manejo de errores
-                content = response.choices[0].message.content
-                logger.debug(f"Respuesta cruda del modelo {model}: {content[:500]}...")
+        try:
+            vehicles_data = json.loads(content)
+        except json.JSONDecodeError as e:
+            logger.error(f"❌ Error parseando JSON de {model}: {str(e)}")
+            logger.error(f"Contenido recibido: {content}")
 
-                try:
-                    vehicles_data = json.loads(content)
-                except json.JSONDecodeError as e:
-                    logger.error(f"❌ Error parseando JSON de {model}: {str(e)}")
-                    logger.error(f"Contenido recibido: {content}")
+            # Intentar limpiar el JSON si tiene problemas comunes; si no se puede, el lote falla
+            cleaned_content = self._clean_json_response(content)
+            vehicles_data = json.loads(cleaned_content)
+            logger.info(f"✓ JSON limpiado exitosamente para {model}")
 
-                    # Intentar limpiar el JSON si tiene problemas comunes
-                    try:
-                        cleaned_content = self._clean_json_response(content)
-                        vehicles_data = json.loads(cleaned_content)
-                        logger.info(f"✓ JSON limpiado exitosamente para {model}")
-                    except json.JSONDecodeError:
-                        logger.error(f"❌ No se pudo limpiar el JSON de {model}")
-                        # Usar fallback en lugar de fallar
-                        logger.warning(f"⚠️  Usando generación fallback para {count} vehículos")
-                        return [self._generate_fallback_vehicle(brand) for _ in range(count)]
-
-                # Validar y completar datos
-                vehicles = []
-                for vehicle_data in vehicles_data.get('vehicles', []):
-                    vehicle = self._complete_vehicle_data(vehicle_data)
-                    vehicles.append(vehicle)
-
-                logger.info(f"✓ Generados {len(vehicles)} vehículos con {model}")
-                return vehicles
-
-            except Exception as e:
-                error_str = str(e)
-                logger.error(f"❌ Error con modelo {model}: {error_str}")
-                last_error = e
-                # Si hay error, usar fallback inmediatamente
-                logger.warning(f"⚠️  Error con {model}, usando generación fallback para {count} vehículos")
-                return [self._generate_fallback_vehicle(brand) for _ in range(count)]
+        # Validar y completar datos
+        vehicles = []
+        for vehicle_data in vehicles_data.get('vehicles', []):
+            vehicle = self._complete_vehicle_data(vehicle_data)
+            vehicles.append(vehicle)
+
+        logger.info(f"✓ Generados {len(vehicles)} vehículos con {model}")
+        return vehicles
+
+    def _create_messages(self, count: int, brand: Optional[str] = None) -> List[Dict]:
+        """Mensajes de sistema y de usuario para pedir un lote de vehículos"""
+        return [
+            {
+                "role": "system",
+                "content": "Eres un experto en el mercado de vehículos de ocasión en España. "
+                         "Generas datos realistas y coherentes de vehículos usados con relaciones "
+                         "lógicas entre año, kilometraje, precio y condición. "
+                         "Siempre respondes ÚNICAMENTE con JSON válido, sin texto adicional."
+            },
+            {
+                "role": "user",
+                "content": self._create_prompt(count, brand)
+            }
+        ]
 
     def _create_prompt(self, count: int, brand: Optional[str] = None) -> str:
         """Crea el prompt para generar vehículos"""
@@ -385,3 +651,18 @@ def generar_vehiculos_con_ia(num_vehiculos: int = 10, marca: Optional[str] = Non
     """
     generator = AIVehicleGenerator()
     return generator.generate_vehicles(count=num_vehiculos, brand=marca)
+
+
+def generar_vehiculos_con_ia_en_streaming(num_vehiculos: int = 10, marca: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Función de conveniencia para generar vehículos con IA en streaming
+
+    Args:
+        num_vehiculos: Cantidad de vehículos a generar
+        marca: Marca específica (opcional)
+
+    Yields:
+        Diccionarios con datos de vehículos, en cuanto el modelo los completa
+    """
+    generator = AIVehicleGenerator()
+    yield from generator.stream_vehicles(count=num_vehiculos, brand=marca)
@@ -0,0 +1,119 @@
+"""
+Utilidades para medir los pasos del pipeline nocturno de stock.
+
+Cada medición registra el tiempo, el pico de memoria residente (RSS) del
+proceso y el número de consultas ejecutadas a través del cursor de Django,
+y los resultados se pueden comparar con los de otra ejecución para detectar
+regresiones entre commits.
+"""
+import logging
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Variación de filas/s a partir de la cual una diferencia se considera regresión
+UMBRAL_REGRESION = 0.2
+
+
+def rss_actual() -> int:
+    """Memoria residente actual del proceso en bytes"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        # Fuera de Linux solo está disponible el pico acumulado del proceso (en KB)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MedidorMemoria:
+    """Muestrea el RSS en un hilo mientras dura el bloque y guarda el máximo observado"""
+
+    def __init__(self, intervalo: float = 0.05):
+        self.intervalo = intervalo
+        self.pico = 0
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+
+    def _muestrear(self):
+        while not self._parar.is_set():
+            self.pico = max(self.pico, rss_actual())
+            self._parar.wait(self.intervalo)
+
+    def __enter__(self):
+        self.pico = rss_actual()
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._parar.set()
+        self._hilo.join()
+        self.pico = max(self.pico, rss_actual())
+
+
+class ContadorConsultas:
+    """Execute wrapper de Django que cuenta las consultas sin guardar su SQL"""
+
+    def __init__(self):
+        self.consultas = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.consultas += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def medir(paso: str, using: str = 'default'):
+    """
+    Mide un bloque de código. Quien lo usa debe asignar resultado['filas'].
+
+    Yields:
+        Diccionario que al salir contiene paso, filas, segundos,
+        filas_por_segundo, pico_rss_mb y consultas
+    """
+    resultado = {'paso': paso, 'filas': 0}
+    contador = ContadorConsultas()
+    with MedidorMemoria() as memoria, connections[using].execute_wrapper(contador):
+        inicio = time.perf_counter()
+        yield resultado
+        segundos = time.perf_counter() - inicio
+
+    resultado.update({
+        'segundos': round(segundos, 4),
+        'filas_por_segundo': round(resultado['filas'] / segundos, 1) if segundos else 0.0,
+        'pico_rss_mb': round(memoria.pico / 2 ** 20, 1),
+        'consultas': contador.consultas,
+    })
+    logger.info(f"Benchmark {paso}: {resultado}")
+
+
+def comparar(actuales: List[Dict], anteriores: List[Dict], umbral: float = UMBRAL_REGRESION) -> List[Dict]:
+    """
+    Compara filas/s por tamaño y paso con los resultados de otra ejecución.
+
+    Returns:
+        Una entrada por (tamano, paso) presente en ambas, con la variación
+        relativa y si supera el umbral de regresión
+    """
+    previos = {(r['tamano'], r['paso']): r for r in anteriores}
+    comparacion = []
+    for resultado in actuales:
+        previo = previos.get((resultado['tamano'], resultado['paso']))
+        if not previo or not previo['filas_por_segundo']:
+            continue
+        variacion = resultado['filas_por_segundo'] / previo['filas_por_segundo'] - 1
+        comparacion.append({
+            'tamano': resultado['tamano'],
+            'paso': resultado['paso'],
+            'antes': previo['filas_por_segundo'],
+            'ahora': resultado['filas_por_segundo'],
+            'variacion': round(variacion, 3),
+            'regresion': variacion < -umbral,
+        })
+    return comparacion
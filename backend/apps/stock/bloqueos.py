@@ -0,0 +1,109 @@
+"""
+Exclusión mutua entre procesos con advisory locks de PostgreSQL.
+
+Los advisory locks de sesión se liberan solos si el proceso o su conexión
+mueren, así que no quedan bloqueos huérfanos como con un fichero o una fila
+marcada a mano.
+"""
+import logging
+import zlib
+from contextlib import contextmanager
+
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+
+def clave_bloqueo(nombre: str) -> int:
+    """Clave numérica estable para pg_advisory_lock a partir de un nombre"""
+    return zlib.crc32(nombre.encode('utf-8'))
+
+
+CLAVE_LIDER_SCHEDULER = clave_bloqueo('stock.scheduler.lider')
+CLAVE_MIGRACION_STOCK = clave_bloqueo('stock.migrate_stock_and_scrape')
+
+
+@contextmanager
+def bloqueo_exclusivo(clave: int, using: str = 'default'):
+    """
+    Intenta tomar un advisory lock de sesión sin esperar.
+
+    Yields:
+        True si se ha obtenido el bloqueo (se libera al salir), False si lo tiene otro proceso
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_lock(%s)', [clave])
+        adquirido = cursor.fetchone()[0]
+    try:
+        yield adquirido
+    finally:
+        if adquirido:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [clave])
+
+
+class Liderazgo:
+    """
+    Elección de líder entre varios procesos con un advisory lock.
+
+    El bloqueo se mantiene en una conexión dedicada, independiente de la que
+    usan los trabajos, para que ninguna transacción ni cierre de conexión de
+    Django lo libere por accidente. Si esa conexión se pierde, el proceso deja
+    de ser líder y otro puede tomar el relevo.
+    """
+
+    def __init__(self, clave: int, using: str = 'default'):
+        self.clave = clave
+        self.using = using
+        self.es_lider = False
+        self._conexion = None
+
+    def _cursor(self):
+        if self._conexion is None:
+            self._conexion = connections.create_connection(self.using)
+        return self._conexion.cursor()
+
+    def intentar(self) -> bool:
+        """Intenta ser líder sin esperar; devuelve si lo es"""
+        if self.es_lider:
+            return True
+        try:
+            with self._cursor() as cursor:
+                cursor.execute('SELECT pg_try_advisory_lock(%s)', [self.clave])
+                self.es_lider = cursor.fetchone()[0]
+        except DatabaseError as e:
+            logger.warning(f"No se pudo intentar el liderazgo: {str(e)}")
+            self._cerrar()
+        return self.es_lider
+
+    def sigue_siendo_lider(self) -> bool:
+        """Comprueba que la conexión que mantiene el bloqueo sigue viva"""
+        if not self.es_lider:
+            return False
+        try:
+            with self._cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except DatabaseError as e:
+            logger.error(f"Conexión del líder perdida: {str(e)}")
+            self._cerrar()
+        return self.es_lider
+
+    def liberar(self):
+        """Renuncia al liderazgo y cierra la conexión dedicada"""
+        if self.es_lider:
+            try:
+                with self._cursor() as cursor:
+                    cursor.execute('SELECT pg_advisory_unlock(%s)', [self.clave])
+            except DatabaseError:
+                pass
+        self._cerrar()
+
+    def _cerrar(self):
+        self.es_lider = False
+        if self._conexion is not None:
+            try:
+                self._conexion.close()
+            except DatabaseError:
+                pass
+            self._conexion = None
@@ -0,0 +1,147 @@
+"""
+Búsqueda de vehículos: tolerante a erratas con trigramas (pg_trgm) y de
+texto completo en español sobre la columna stock.busqueda.
+
+Cada palabra del texto tiene que parecerse (word_similarity por encima del
+umbral de pg_trgm, 0,6 por defecto) a alguna de las columnas buscadas, y el
+resultado se ordena por la suma de la mejor similitud de cada palabra. Así
+"mercedez" encuentra Mercedes-Benz y "golf bmw" exige las dos palabras.
+
+Las columnas se comparan en mayúsculas para usar los mismos índices GIN de
+trigramas sobre UPPER(columna) que sirven a los filtros icontains.
+
+La columna busqueda (tsvector) reúne marca, modelo, versión, tipo,
+color, concesionario y provincia con la configuración es_sin_acentos
+(diccionario español sin tildes, creada en la migración
+0014_stock_busqueda). No se mantiene con triggers: la carga nocturna la
+recalcula con un único UPDATE al terminar de insertar.
+"""
+import re
+from functools import reduce
+from operator import and_, or_
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connections
+from django.db.models import F, Q
+from django.db.models.functions import Greatest, Upper
+
+from apps.stock.models import Stock
+
+# Columnas de Stock en las que se busca (cada una con su índice de trigramas)
+CAMPOS_BUSQUEDA = ['marca', 'modelo', 'bastidor', 'matricula', 'color']
+
+# Configuración de búsqueda de texto: español con las tildes eliminadas
+CONFIGURACION_TEXTO = 'es_sin_acentos'
+
+# Columnas del vector de búsqueda por peso (A pesa más en el orden por relevancia).
+# Stock no tiene versión ni combustible propios: vienen en el modelo comercial
+# y en la descripción del modelo
+PESOS_TEXTO = {
+    'A': ['marca', 'modelo'],
+    'B': ['modelo_comercial', 'descripcion_modelo_qbi', 'tipo_vehiculo', 'categoria', 'descripcion_tipo_vo'],
+    'C': ['color', 'color_secundario'],
+    'D': ['nom_concesionario', 'dealer_corto', 'provincia'],
+}
+
+# Abreviaturas de marca habituales que no se parecen al nombre completo
+ALIAS_MARCAS = {
+    'vw': 'volkswagen',
+    'merche': 'mercedes',
+    'mb': 'mercedes',
+    'alfa': 'alfa romeo',
+    'landrover': 'land rover',
+}
+
+
+def palabras_busqueda(texto: str):
+    """Palabras del texto en minúsculas, con las abreviaturas de marca expandidas"""
+    palabras = []
+    for palabra in re.findall(r'[\w-]+', texto.lower()):
+        palabras.extend(ALIAS_MARCAS.get(palabra, palabra).split())
+    return palabras
+
+
+def buscar_por_similitud(queryset, texto: str):
+    """
+    Filtra y ordena por relevancia los vehículos que se parecen al texto.
+
+    Las palabras de cuatro cifras también se comparan con el año de
+    matriculación ("bmw 2020").
+
+    Returns:
+        El queryset filtrado, anotado con relevancia y ordenado de más a menos relevante
+    """
+    palabras = palabras_busqueda(texto)
+    if not palabras:
+        return queryset.none()
+
+    alias = {f'{campo}_mayus': Upper(campo) for campo in CAMPOS_BUSQUEDA}
+    queryset = queryset.alias(**alias)
+
+    condiciones = []
+    puntuaciones = []
+    for palabra in palabras:
+        condicion = reduce(or_, (Q(**{f'{nombre}__trigram_word_similar': palabra}) for nombre in alias))
+        if re.fullmatch(r'\d{4}', palabra):
+            condicion |= Q(anio_matricula=int(palabra))
+        condiciones.append(condicion)
+        puntuaciones.append(Greatest(*(TrigramWordSimilarity(palabra, F(nombre)) for nombre in alias)))
+
+    return queryset.filter(reduce(and_, condiciones)).annotate(
+        relevancia=sum(puntuaciones[1:], puntuaciones[0])
+    ).order_by('-relevancia', 'bastidor')
+
+
+def expresion_vector_busqueda(using: str = 'default') -> str:
+    """SQL del tsvector de búsqueda de una fila de stock (o de una tabla con su estructura)"""
+    qn = connections[using].ops.quote_name
+    partes = []
+    for peso, columnas in PESOS_TEXTO.items():
+        texto = " || ' ' || ".join(f"COALESCE({qn(c)}, '')" for c in columnas)
+        partes.append(f"setweight(to_tsvector('{CONFIGURACION_TEXTO}', {texto}), '{peso}')")
+    return ' || '.join(partes)
+
+
+def actualizar_vector_busqueda(tabla: str = None, using: str = 'default') -> int:
+    """
+    Recalcula en bloque la columna busqueda con un único UPDATE en el servidor.
+
+    Solo escribe las filas cuyo vector cambia, así que tras una carga
+    incremental no reescribe los vehículos que siguen igual.
+
+    Args:
+        tabla: Tabla con la estructura de stock (por defecto stock; en modo swap, la staging)
+        using: Alias de la base de datos
+
+    Returns:
+        Número de filas actualizadas
+    """
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    tabla = qn(tabla or Stock._meta.db_table)
+    vector = expresion_vector_busqueda(using=using)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {tabla} SET {qn("busqueda")} = {vector} '
+            f'WHERE {qn("busqueda")} IS DISTINCT FROM ({vector})'
+        )
+        return cursor.rowcount
+
+
+def buscar_texto_completo(queryset, texto: str):
+    """
+    Filtra por la columna busqueda y ordena por relevancia (ts_rank con pesos).
+
+    El texto admite la sintaxis de websearch_to_tsquery: todas las palabras
+    tienen que aparecer, "frase exacta", "or" entre alternativas y -palabra
+    para excluir. "suv diésel automático blanco" equivale a "suv diesel
+    automatico blanco".
+
+    Returns:
+        El queryset filtrado, anotado con relevancia y ordenado de más a menos relevante
+    """
+    consulta = SearchQuery(texto, config=CONFIGURACION_TEXTO, search_type='websearch')
+    return queryset.filter(busqueda=consulta).annotate(
+        relevancia=SearchRank(F('busqueda'), consulta)
+    ).order_by('-relevancia', 'bastidor')
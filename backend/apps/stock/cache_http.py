@@ -0,0 +1,145 @@
+"""
+Caché HTTP en disco para el scraping.
+
+Guarda por URL las cabeceras ETag y Last-Modified, el hash del cuerpo y el
+resultado ya procesado de la página. En la siguiente ejecución se envían
+peticiones condicionales (If-None-Match / If-Modified-Since): si el servidor
+responde 304, o responde 200 con un cuerpo idéntico, se reutiliza el
+resultado guardado y la página no se vuelve a procesar.
+"""
+import hashlib
+import json
+import logging
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class CacheHTTP:
+    """
+    Caché de páginas en un directorio local.
+
+    Por cada URL se guardan dos ficheros con el hash de la URL como nombre:
+    `<clave>.json` con los validadores y `<clave>.pkl` con el resultado procesado.
+
+    Args:
+        directorio: Directorio donde se guardan las entradas (se crea si no existe)
+    """
+
+    def __init__(self, directorio):
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.peticiones = 0
+        self.aciertos_304 = 0
+        self.aciertos_hash = 0
+        self.bytes_descargados = 0
+        self.bytes_ahorrados = 0
+
+    @staticmethod
+    def _clave(url: str) -> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def hash_cuerpo(contenido: bytes) -> str:
+        return hashlib.sha256(contenido).hexdigest()
+
+    def _ruta(self, url: str, extension: str) -> Path:
+        return self.directorio / f'{self._clave(url)}.{extension}'
+
+    def _escribir(self, ruta: Path, datos: bytes):
+        """Escritura atómica: un fallo a mitad no deja una entrada corrupta"""
+        temporal = ruta.with_suffix(ruta.suffix + '.tmp')
+        temporal.write_bytes(datos)
+        os.replace(temporal, ruta)
+
+    def _metadatos(self, url: str) -> Optional[Dict[str, Any]]:
+        ruta = self._ruta(url, 'json')
+        if not ruta.exists() or not self._ruta(url, 'pkl').exists():
+            return None
+        try:
+            return json.loads(ruta.read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Entrada de caché ilegible para {url}: {str(e)}")
+            return None
+
+    def _resultado(self, url: str) -> Any:
+        with open(self._ruta(url, 'pkl'), 'rb') as fichero:
+            return pickle.load(fichero)
+
+    def cabeceras_condicionales(self, url: str) -> Dict[str, str]:
+        """Cabeceras If-None-Match / If-Modified-Since para la URL, si hay una entrada guardada"""
+        metadatos = self._metadatos(url)
+        if not metadatos:
+            return {}
+        cabeceras = {}
+        if metadatos.get('etag'):
+            cabeceras['If-None-Match'] = metadatos['etag']
+        if metadatos.get('last_modified'):
+            cabeceras['If-Modified-Since'] = metadatos['last_modified']
+        return cabeceras
+
+    def resultado_en_cache(self, url: str, respuesta: httpx.Response) -> Optional[Any]:
+        """
+        Devuelve el resultado guardado si la página no ha cambiado.
+
+        La página no ha cambiado si el servidor responde 304 o si el hash del
+        cuerpo coincide con el guardado. Devuelve None si hay que procesarla.
+        """
+        self.peticiones += 1
+        metadatos = self._metadatos(url)
+
+        if respuesta.status_code == 304:
+            if metadatos is None:
+                logger.warning(f"304 sin entrada en caché para {url}")
+                return None
+            self.aciertos_304 += 1
+            self.bytes_ahorrados += metadatos.get('bytes', 0)
+            return self._resultado(url)
+
+        self.bytes_descargados += len(respuesta.content)
+        if metadatos and metadatos.get('hash') == self.hash_cuerpo(respuesta.content):
+            self.aciertos_hash += 1
+            # El servidor puede haber renovado los validadores aunque el cuerpo sea el mismo
+            self._guardar_metadatos(url, respuesta)
+            return self._resultado(url)
+
+        return None
+
+    def _guardar_metadatos(self, url: str, respuesta: httpx.Response):
+        metadatos = {
+            'url': url,
+            'etag': respuesta.headers.get('ETag'),
+            'last_modified': respuesta.headers.get('Last-Modified'),
+            'hash': self.hash_cuerpo(respuesta.content),
+            'bytes': len(respuesta.content),
+        }
+        self._escribir(self._ruta(url, 'json'), json.dumps(metadatos).encode('utf-8'))
+
+    def guardar(self, url: str, respuesta: httpx.Response, resultado: Any):
+        """Guarda los validadores de la respuesta y el resultado de procesarla"""
+        self._escribir(self._ruta(url, 'pkl'), pickle.dumps(resultado))
+        self._guardar_metadatos(url, respuesta)
+
+    @property
+    def aciertos(self) -> int:
+        return self.aciertos_304 + self.aciertos_hash
+
+    @property
+    def ratio_aciertos(self) -> float:
+        return self.aciertos / self.peticiones if self.peticiones else 0.0
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Resumen de uso de la caché durante la ejecución"""
+        return {
+            'peticiones': self.peticiones,
+            'aciertos_304': self.aciertos_304,
+            'aciertos_hash': self.aciertos_hash,
+            'ratio_aciertos': round(self.ratio_aciertos, 3),
+            'bytes_descargados': self.bytes_descargados,
+            'bytes_ahorrados': self.bytes_ahorrados,
+        }
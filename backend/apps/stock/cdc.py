@@ -0,0 +1,156 @@
+"""
+Captura de cambios (CDC) de la tabla stock en el outbox stock_cambio.
+
+Los triggers son de sentencia y usan tablas de transición, así que una
+carga de miles de filas genera sus eventos con una sola consulta por
+sentencia en lugar de una por fila. Las columnas que cambian se obtienen
+comparando la fila anterior y la nueva en jsonb, ignorando la clave y los
+metadatos de la carga (los mismos que ignora la carga incremental).
+
+En una recarga completa (DELETE de todo el stock e INSERT del nuevo en la
+misma transacción) las filas borradas se guardan en una tabla temporal y,
+al volver a insertarse, el par baja/alta se sustituye por una modificación
+con las columnas que cambian, o desaparece si el vehículo no cambió.
+
+La versión de cada evento es el identificador de la transacción que lo
+produjo. Los consumidores leen por (version, id) y solo hasta la
+transacción más antigua aún en curso, de modo que un cursor nunca se salta
+eventos que se confirmen más tarde.
+"""
+import logging
+from typing import Dict, Tuple
+
+from django.db import connections
+
+from apps.stock.models import CambioStock, Stock
+
+logger = logging.getLogger(__name__)
+
+# Funciones de PostgreSQL creadas por la migración 0008_cambio_stock
+FUNCION_COLUMNAS = 'stock_cdc_columnas'
+FUNCION_TRIGGER = 'stock_cdc_capturar'
+
+LIMITE_CAMBIOS = 1000
+LIMITE_MAXIMO_CAMBIOS = 10000
+
+# (nombre, evento, cláusula REFERENCING) de cada trigger sobre stock
+TRIGGERS = [
+    ('stock_cdc_insert', 'INSERT', 'REFERENCING NEW TABLE AS nuevas'),
+    ('stock_cdc_update', 'UPDATE', 'REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas'),
+    ('stock_cdc_delete', 'DELETE', 'REFERENCING OLD TABLE AS viejas'),
+    ('stock_cdc_truncate', 'TRUNCATE', ''),
+]
+
+
+def crear_triggers(cursor, tabla: str = None):
+    """Crea (o recrea) los triggers de captura sobre la tabla de stock"""
+    tabla = tabla or Stock._meta.db_table
+    for nombre, evento, referencias in TRIGGERS:
+        cursor.execute(f'DROP TRIGGER IF EXISTS {nombre} ON {tabla}')
+        cursor.execute(
+            f'CREATE TRIGGER {nombre} AFTER {evento} ON {tabla} {referencias} '
+            f'FOR EACH STATEMENT EXECUTE FUNCTION {FUNCION_TRIGGER}()'
+        )
+
+
+def registrar_diferencias(cursor, tabla_nueva: str) -> int:
+    """
+    Registra como eventos las diferencias entre stock y una tabla que va a
+    sustituirla (publicación por swap, donde no se ejecuta ningún DML sobre stock).
+
+    Returns:
+        Número de eventos registrados
+    """
+    tabla = Stock._meta.db_table
+    cursor.execute(
+        f"""
+        INSERT INTO {CambioStock._meta.db_table} (bastidor, operacion, columnas, version, fecha)
+        SELECT COALESCE(n.bastidor, v.bastidor),
+               CASE WHEN v.bastidor IS NULL THEN 'I' WHEN n.bastidor IS NULL THEN 'D' ELSE 'U' END,
+               COALESCE(c.columnas, '{{}}'),
+               txid_current(), now()
+        FROM {tabla} v
+        FULL JOIN {tabla_nueva} n ON n.bastidor = v.bastidor
+        LEFT JOIN LATERAL (
+            SELECT {FUNCION_COLUMNAS}(to_jsonb(v), to_jsonb(n)) AS columnas
+            WHERE v.bastidor IS NOT NULL AND n.bastidor IS NOT NULL
+        ) c ON TRUE
+        WHERE v.bastidor IS NULL OR n.bastidor IS NULL OR c.columnas <> '{{}}'
+        """
+    )
+    return cursor.rowcount
+
+
+def _parsear_cursor(valor: str) -> Tuple[int, int]:
+    """Convierte el cursor "version.id" en la tupla (version, id)"""
+    if not valor:
+        return 0, 0
+    try:
+        version, id_ = valor.split('.')
+        return int(version), int(id_)
+    except ValueError:
+        raise ValueError(f'Cursor no válido: {valor}')
+
+
+def leer_cambios(despues_de: str = '', limite: int = LIMITE_CAMBIOS, using: str = 'default') -> Dict:
+    """
+    Lee en bloque los eventos posteriores a un cursor.
+
+    Args:
+        despues_de: Cursor devuelto por la lectura anterior ('' para empezar por el principio)
+        limite: Máximo de eventos a devolver
+        using: Alias de la base de datos
+
+    Returns:
+        Diccionario con los eventos, el cursor para la siguiente lectura y si quedan más
+
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    version, id_ = _parsear_cursor(despues_de)
+    limite = max(1, min(limite, LIMITE_MAXIMO_CAMBIOS))
+
+    with connections[using].cursor() as cursor:
+        # Solo transacciones ya terminadas (y la propia): un evento que aún no se
+        # ha confirmado no puede aparecer después por detrás del cursor
+        cursor.execute(
+            f"""
+            SELECT id, bastidor, operacion, columnas, version, fecha
+            FROM {CambioStock._meta.db_table}
+            WHERE (version, id) > (%s, %s)
+              AND (version < txid_snapshot_xmin(txid_current_snapshot())
+                   OR version = txid_current_if_assigned())
+            ORDER BY version, id
+            LIMIT %s
+            """,
+            [version, id_, limite + 1],
+        )
+        filas = cursor.fetchall()
+
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+    if filas:
+        despues_de = f'{filas[-1][4]}.{filas[-1][0]}'
+
+    return {
+        'cambios': [
+            {
+                'id': fila[0],
+                'bastidor': fila[1],
+                'operacion': fila[2],
+                'columnas': fila[3],
+                'version': fila[4],
+                'fecha': fila[5],
+            }
+            for fila in filas
+        ],
+        'cursor': despues_de,
+        'hay_mas': hay_mas,
+    }
+
+
+def purgar_cambios(antes_de, using: str = 'default') -> int:
+    """Elimina los eventos anteriores a una fecha; devuelve cuántos se eliminaron"""
+    eliminados, _ = CambioStock.objects.using(using).filter(fecha__lt=antes_de).delete()
+    logger.info(f"{eliminados} eventos de cambio de stock purgados (anteriores a {antes_de})")
+    return eliminados
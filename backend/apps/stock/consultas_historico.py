@@ -0,0 +1,249 @@
+"""
+Consultas de la API sobre el histórico de stock.
+
+Cada una está pensada para un índice concreto de StockHistorico, de modo que
+el tiempo de respuesta dependa de las filas que devuelve y no de los años de
+histórico acumulados.
+
+El inventario de un día sale del snapshot de stock_historico si lo hay y, si
+no, de las versiones vigentes ese día en stock_version: con
+--modo-historico versiones la carga nocturna deja de escribir snapshots, y
+tras purgar_historico los días antiguos solo quedan como versiones.
+"""
+from datetime import date
+from typing import Dict, Iterator, Optional, Tuple
+
+from django.db import connections
+from django.db.models import DateField, Max, Min, Q, Value
+
+from apps.stock.models import StockHistorico, StockVersion
+from apps.stock.versiones import columnas_versionadas
+
+# Columnas de la serie temporal de un vehículo. Están incluidas en el índice
+# (bastidor, fecha_snapshot) junto con id, así que la serie se lee solo del índice
+COLUMNAS_SERIE = ('precio_venta', 'dias_stock', 'reservado', 'publicado')
+
+# Filas que se traen de cada vez del cursor del servidor al comparar dos días
+FILAS_POR_PAGINA_DIFERENCIAS = 2000
+
+# Origen del inventario de un día
+ORIGEN_SNAPSHOT = 'snapshot'
+ORIGEN_VERSIONES = 'versiones'
+
+# Tipos de cambio entre dos snapshots
+CAMBIO_ALTA = 'alta'
+CAMBIO_BAJA = 'baja'
+CAMBIO_MODIFICACION = 'modificacion'
+
+
+def rango_versiones(using: str = 'default') -> Optional[Tuple[date, date]]:
+    """
+    Días que describe stock_version: desde la primera versión hasta el último
+    registro (la última fecha que abrió o cerró versiones), o None si está vacía
+    """
+    rango = StockVersion.objects.using(using).aggregate(
+        primera=Min('valid_from'), ultima_apertura=Max('valid_from'), ultimo_cierre=Max('valid_to'),
+    )
+    if rango['primera'] is None:
+        return None
+    return rango['primera'], max(f for f in (rango['ultima_apertura'], rango['ultimo_cierre']) if f)
+
+
+def origen_del_dia(fecha: date, using: str = 'default') -> Optional[str]:
+    """Origen con el inventario de ese mismo día (ORIGEN_SNAPSHOT u ORIGEN_VERSIONES), o None"""
+    if StockHistorico.objects.using(using).filter(fecha_snapshot=fecha).exists():
+        return ORIGEN_SNAPSHOT
+    rango = rango_versiones(using)
+    if rango and rango[0] <= fecha <= rango[1]:
+        return ORIGEN_VERSIONES
+    return None
+
+
+def ultimo_inventario(fecha: date, using: str = 'default') -> Optional[Tuple[date, str]]:
+    """
+    Fecha y origen del inventario más reciente hasta `fecha` (incluida).
+
+    Un snapshot de ese día tiene preferencia; si no lo hay, se usa el origen
+    que llegue más cerca de la fecha, de modo que tras pasar a versiones no
+    se devuelve el último snapshot anterior al cambio.
+
+    Returns:
+        (fecha del inventario, origen), o None si no hay histórico hasta la fecha
+    """
+    fecha_snapshot = StockHistorico.objects.using(using).filter(
+        fecha_snapshot__lte=fecha
+    ).aggregate(fecha=Max('fecha_snapshot'))['fecha']
+    if fecha_snapshot == fecha:
+        return fecha, ORIGEN_SNAPSHOT
+
+    rango = rango_versiones(using)
+    fecha_versiones = min(fecha, rango[1]) if rango and rango[0] <= fecha else None
+    if fecha_versiones and (fecha_snapshot is None or fecha_versiones > fecha_snapshot):
+        return fecha_versiones, ORIGEN_VERSIONES
+    if fecha_snapshot:
+        return fecha_snapshot, ORIGEN_SNAPSHOT
+    return None
+
+
+def versiones_del_dia(fecha: date, using: str = 'default'):
+    """Versiones vigentes en una fecha (valid_from <= fecha < valid_to), con la fecha como fecha_snapshot"""
+    return StockVersion.objects.using(using).filter(valid_from__lte=fecha).filter(
+        Q(valid_to__isnull=True) | Q(valid_to__gt=fecha)
+    ).annotate(fecha_snapshot=Value(fecha, output_field=DateField()))
+
+
+def inventario_del_dia(fecha: date, origen: str, using: str = 'default'):
+    """Inventario de un día del origen indicado, un vehículo por fila"""
+    if origen == ORIGEN_VERSIONES:
+        return versiones_del_dia(fecha, using=using)
+    return snapshot_del_dia(fecha, using=using)
+
+
+def snapshot_del_dia(fecha: date, using: str = 'default'):
+    """
+    Vehículos del snapshot de un día, uno por bastidor.
+
+    Si un vehículo se archivó dos veces el mismo día vale la última fila (la
+    de mayor id), igual que en diferencias_snapshots y en el histórico SCD.
+    """
+    del_dia = StockHistorico.objects.using(using).filter(fecha_snapshot=fecha)
+    ultimas = del_dia.order_by('bastidor', '-id').distinct('bastidor').values('id')
+    return del_dia.filter(id__in=ultimas)
+
+
+def serie_vehiculo(bastidor: str, desde: Optional[date] = None, hasta: Optional[date] = None,
+                   using: str = 'default') -> Optional[Dict]:
+    """
+    Evolución de un vehículo a lo largo de los snapshots, en formato columnar.
+
+    Los días con snapshot en stock_historico dan un punto cada uno. Fuera de
+    ellos (tras pasar a --modo-historico versiones o purgar el histórico) cada
+    versión de stock_version da un punto en el día en que empieza, o en
+    `desde` si ya estaba vigente; sus contadores, como dias_stock, conservan
+    el valor con el que empezó la versión.
+
+    Args:
+        bastidor: Bastidor (VIN) del vehículo
+        desde: Primera fecha de snapshot (opcional)
+        hasta: Última fecha de snapshot (opcional)
+        using: Alias de la base de datos
+
+    Returns:
+        Diccionario con una lista por columna (fechas y COLUMNAS_SERIE, en el
+        mismo orden), o None si el vehículo no tiene histórico en el rango.
+        Cada fecha aparece una vez: si el vehículo se archivó dos veces ese
+        día vale la última fila
+    """
+    filas = StockHistorico.objects.using(using).filter(bastidor=bastidor)
+    if desde:
+        filas = filas.filter(fecha_snapshot__gte=desde)
+    if hasta:
+        filas = filas.filter(fecha_snapshot__lte=hasta)
+    puntos = {
+        fila[0]: fila for fila in
+        filas.order_by('fecha_snapshot', '-id').distinct('fecha_snapshot')
+        .values_list('fecha_snapshot', *COLUMNAS_SERIE)
+    }
+
+    # Versiones que se solapan con el rango, por el índice único (bastidor, valid_from)
+    versiones = StockVersion.objects.using(using).filter(bastidor=bastidor)
+    if desde:
+        versiones = versiones.filter(Q(valid_to__isnull=True) | Q(valid_to__gt=desde))
+    if hasta:
+        versiones = versiones.filter(valid_from__lte=hasta)
+    for valid_from, *valores in versiones.values_list('valid_from', *COLUMNAS_SERIE):
+        fecha = max(valid_from, desde) if desde else valid_from
+        puntos.setdefault(fecha, (fecha, *valores))
+
+    if not puntos:
+        return None
+    filas = [puntos[fecha] for fecha in sorted(puntos)]
+
+    columnas = list(zip(*filas))
+    serie = {'bastidor': bastidor, 'fechas': list(columnas[0])}
+    for nombre, valores in zip(COLUMNAS_SERIE, columnas[1:]):
+        serie[nombre] = list(valores)
+    # Precios como números: la serie es para gráficas, no para contabilidad
+    serie['precio_venta'] = [float(p) if p is not None else None for p in serie['precio_venta']]
+    return serie
+
+
+def _sql_inventario_del_dia(origen: str, fecha: date, qn) -> Tuple[str, list]:
+    """SQL (y parámetros) del inventario de un día del origen indicado, un vehículo por fila"""
+    if origen == ORIGEN_VERSIONES:
+        return (
+            f'SELECT v.* FROM {qn(StockVersion._meta.db_table)} v '
+            f'WHERE v.valid_from <= %s AND (v.valid_to IS NULL OR v.valid_to > %s)',
+            [fecha, fecha],
+        )
+    # Si un vehículo se archivó dos veces el mismo día vale la última
+    return (
+        f'SELECT DISTINCT ON (h.bastidor) h.* FROM {qn(StockHistorico._meta.db_table)} h '
+        f'WHERE h.fecha_snapshot = %s ORDER BY h.bastidor, h.id DESC',
+        [fecha],
+    )
+
+
+def diferencias_snapshots(desde: date, hasta: date, origen_desde: str = ORIGEN_SNAPSHOT,
+                          origen_hasta: str = ORIGEN_SNAPSHOT, using: str = 'default') -> Iterator[Dict]:
+    """
+    Vehículos dados de alta, de baja o modificados entre dos snapshots.
+
+    La comparación es una única consulta (FULL JOIN por bastidor de los dos
+    días) que se lee por páginas de un cursor del servidor, así que el
+    resultado nunca está entero en memoria. Se comparan las mismas columnas
+    que abren versión en el histórico SCD: los contadores que avanzan solos
+    cada día no cuentan como cambio.
+
+    Args:
+        desde: Fecha del snapshot de partida
+        hasta: Fecha del snapshot final
+        origen_desde, origen_hasta: De dónde sale el inventario de cada día
+            (ver origen_del_dia): el snapshot o las versiones vigentes
+        using: Alias de la base de datos
+
+    Yields:
+        Un diccionario por vehículo, ordenados por bastidor, con el tipo de
+        cambio y, en las modificaciones, {columna: [antes, después]}
+    """
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    antes, parametros_antes = _sql_inventario_del_dia(origen_desde, desde, qn)
+    despues, parametros_despues = _sql_inventario_del_dia(origen_hasta, hasta, qn)
+
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH antes AS ({antes}), despues AS ({despues})
+            SELECT COALESCE(d.bastidor, a.bastidor),
+                   CASE WHEN a.bastidor IS NULL THEN %s WHEN d.bastidor IS NULL THEN %s ELSE %s END,
+                   COALESCE(d.marca, a.marca),
+                   COALESCE(d.modelo, a.modelo),
+                   COALESCE(d.precio_venta, a.precio_venta),
+                   c.campos
+            FROM antes a
+            FULL JOIN despues d ON d.bastidor = a.bastidor
+            LEFT JOIN LATERAL (
+                SELECT jsonb_object_agg(e.key, jsonb_build_array(to_jsonb(a) -> e.key, e.value)) AS campos
+                FROM jsonb_each(to_jsonb(d)) e
+                WHERE e.key = ANY(%s) AND e.value IS DISTINCT FROM to_jsonb(a) -> e.key
+            ) c ON a.bastidor IS NOT NULL AND d.bastidor IS NOT NULL
+            WHERE a.bastidor IS NULL OR d.bastidor IS NULL OR c.campos IS NOT NULL
+            ORDER BY 1
+            """,
+            [*parametros_antes, *parametros_despues,
+             CAMBIO_ALTA, CAMBIO_BAJA, CAMBIO_MODIFICACION, columnas_versionadas()],
+        )
+        while True:
+            filas = cursor.fetchmany(FILAS_POR_PAGINA_DIFERENCIAS)
+            if not filas:
+                break
+            for bastidor, cambio, marca, modelo, precio_venta, campos in filas:
+                yield {
+                    'bastidor': bastidor,
+                    'cambio': cambio,
+                    'marca': marca,
+                    'modelo': modelo,
+                    'precio_venta': float(precio_venta) if precio_venta is not None else None,
+                    'campos': campos or {},
+                }
@@ -0,0 +1,233 @@
+"""
+Ejecución de un grafo de etapas independientes en procesos separados.
+
+Cada etapa declara de qué otras depende y un timeout propio. Las etapas sin
+dependencias pendientes se lanzan en paralelo, cada una en su propio proceso
+(contexto spawn, con Django inicializado desde cero y su propia conexión a
+la base de datos), hasta el máximo de procesos indicado. Si una etapa falla
+o supera su timeout solo se pierden ella y las que dependen de ella.
+"""
+import importlib
+import logging
+import multiprocessing
+import os
+import time
+import traceback
+from multiprocessing.connection import wait
+from typing import Dict, Iterable, List, Sequence
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+ESTADO_OK = 'ok'
+ESTADO_ERROR = 'error'
+ESTADO_TIMEOUT = 'timeout'
+ESTADO_OMITIDA = 'omitida'
+
+
+class Etapa:
+    """
+    Etapa del grafo.
+
+    Args:
+        nombre: Identificador único de la etapa
+        funcion: Ruta importable 'modulo.funcion' (se importa en el proceso hijo)
+        depende_de: Nombres de las etapas que deben terminar bien antes
+        timeout: Segundos máximos de ejecución; al superarlos se termina el proceso
+        argumentos: Argumentos posicionales para la función
+    """
+
+    def __init__(self, nombre: str, funcion: str, depende_de: Sequence[str] = (),
+                 timeout: float = 300.0, argumentos: Sequence = ()):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.depende_de = tuple(depende_de)
+        self.timeout = timeout
+        self.argumentos = tuple(argumentos)
+
+    def __repr__(self):
+        return f"Etapa({self.nombre!r})"
+
+
+def validar_grafo(etapas: Iterable[Etapa]) -> List[Etapa]:
+    """
+    Comprueba nombres únicos, dependencias existentes y ausencia de ciclos.
+
+    Returns:
+        Las etapas en un orden topológico
+
+    Raises:
+        ValueError: Si el grafo no es válido
+    """
+    por_nombre = {}
+    for etapa in etapas:
+        if etapa.nombre in por_nombre:
+            raise ValueError(f"Etapa duplicada: {etapa.nombre}")
+        por_nombre[etapa.nombre] = etapa
+
+    for etapa in por_nombre.values():
+        desconocidas = set(etapa.depende_de) - set(por_nombre)
+        if desconocidas:
+            raise ValueError(f"La etapa {etapa.nombre} depende de etapas inexistentes: {sorted(desconocidas)}")
+
+    ordenadas, pendientes = [], dict(por_nombre)
+    while pendientes:
+        listas = [
+            etapa for etapa in pendientes.values()
+            if not any(dependencia in pendientes for dependencia in etapa.depende_de)
+        ]
+        if not listas:
+            raise ValueError(f"Dependencias circulares entre: {sorted(pendientes)}")
+        for etapa in listas:
+            ordenadas.append(pendientes.pop(etapa.nombre))
+    return ordenadas
+
+
+def _importar(ruta: str):
+    modulo, funcion = ruta.rsplit('.', 1)
+    return getattr(importlib.import_module(modulo), funcion)
+
+
+def _ejecutar_en_proceso(ruta: str, argumentos: tuple, emisor):
+    """Punto de entrada del proceso hijo: inicializa Django, ejecuta la etapa y envía el resultado"""
+    try:
+        import django
+        django.setup()
+        resultado = _importar(ruta)(*argumentos)
+        emisor.send((ESTADO_OK, resultado, ''))
+    except BaseException:
+        emisor.send((ESTADO_ERROR, None, traceback.format_exc()))
+    finally:
+        from django.db import connections
+        connections.close_all()
+        emisor.close()
+
+
+def _resultado(estado: str, segundos: float = 0.0, resultado=None, error: str = '') -> Dict:
+    return {'estado': estado, 'segundos': round(segundos, 3), 'resultado': resultado, 'error': error}
+
+
+def _omitir_dependientes(etapas, resultados):
+    """Marca como omitidas las etapas con alguna dependencia que no terminó bien"""
+    for etapa in etapas:
+        if etapa.nombre in resultados:
+            continue
+        fallidas = [d for d in etapa.depende_de if d in resultados and resultados[d]['estado'] != ESTADO_OK]
+        if fallidas:
+            resultados[etapa.nombre] = _resultado(ESTADO_OMITIDA, error=f"Dependencias fallidas: {', '.join(fallidas)}")
+            logger.warning(f"Etapa {etapa.nombre} omitida: dependencias fallidas {fallidas}")
+
+
+def ejecutar_en_linea(etapas: Iterable[Etapa]) -> Dict[str, Dict]:
+    """
+    Ejecuta las etapas una tras otra en el proceso actual, en orden topológico.
+
+    Se usa dentro de una transacción (los procesos hijos no verían los datos
+    sin confirmar) y para depurar. Los fallos siguen aislados, pero los
+    timeouts no se aplican.
+    """
+    ordenadas = validar_grafo(etapas)
+    resultados = {}
+    for etapa in ordenadas:
+        _omitir_dependientes(ordenadas, resultados)
+        if etapa.nombre in resultados:
+            continue
+        inicio = time.perf_counter()
+        try:
+            valor = _importar(etapa.funcion)(*etapa.argumentos)
+            resultados[etapa.nombre] = _resultado(ESTADO_OK, time.perf_counter() - inicio, valor)
+        except Exception:
+            resultados[etapa.nombre] = _resultado(
+                ESTADO_ERROR, time.perf_counter() - inicio, error=traceback.format_exc()
+            )
+            logger.error(f"Etapa {etapa.nombre} fallida:\n{resultados[etapa.nombre]['error']}")
+    return resultados
+
+
+def ejecutar_dag(etapas: Iterable[Etapa], procesos: int = 4) -> Dict[str, Dict]:
+    """
+    Ejecuta el grafo de etapas en procesos separados respetando dependencias.
+
+    Args:
+        etapas: Etapas a ejecutar
+        procesos: Máximo de etapas simultáneas (0 ejecuta en línea en este proceso)
+
+    Returns:
+        Por nombre de etapa: estado (ok, error, timeout u omitida), segundos,
+        resultado devuelto por la función y traza del error
+    """
+    etapas = validar_grafo(etapas)
+    if procesos <= 0 or connection.in_atomic_block:
+        return ejecutar_en_linea(etapas)
+
+    # Los hijos heredan el entorno (DJANGO_SETTINGS_MODULE incluido) pero no las conexiones
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dealaai.settings.development')
+    contexto = multiprocessing.get_context('spawn')
+    resultados = {}
+    en_curso = {}
+
+    while len(resultados) < len(etapas):
+        _omitir_dependientes(etapas, resultados)
+
+        for etapa in etapas:
+            if len(en_curso) >= procesos:
+                break
+            if etapa.nombre in resultados or etapa.nombre in en_curso:
+                continue
+            if all(resultados.get(d, {}).get('estado') == ESTADO_OK for d in etapa.depende_de):
+                receptor, emisor = contexto.Pipe(duplex=False)
+                proceso = contexto.Process(
+                    target=_ejecutar_en_proceso,
+                    args=(etapa.funcion, etapa.argumentos, emisor),
+                    name=f'etapa-{etapa.nombre}',
+                    daemon=True,
+                )
+                proceso.start()
+                emisor.close()
+                en_curso[etapa.nombre] = {
+                    'etapa': etapa, 'proceso': proceso, 'receptor': receptor,
+                    'inicio': time.perf_counter(), 'mensaje': None,
+                }
+                logger.info(f"Etapa {etapa.nombre} iniciada (pid {proceso.pid})")
+
+        if not en_curso:
+            break
+
+        ahora = time.perf_counter()
+        espera = min(info['inicio'] + info['etapa'].timeout - ahora for info in en_curso.values())
+        objetos = [info['proceso'].sentinel for info in en_curso.values()]
+        objetos += [info['receptor'] for info in en_curso.values() if info['mensaje'] is None]
+        wait(objetos, timeout=max(0.0, espera))
+
+        for nombre, info in list(en_curso.items()):
+            segundos = time.perf_counter() - info['inicio']
+            if info['mensaje'] is None and info['receptor'].poll():
+                try:
+                    info['mensaje'] = info['receptor'].recv()
+                except EOFError:
+                    info['mensaje'] = (ESTADO_ERROR, None, 'El proceso terminó sin enviar resultado')
+
+            if info['mensaje'] is not None or not info['proceso'].is_alive():
+                info['proceso'].join()
+                estado, valor, error = info['mensaje'] or (
+                    ESTADO_ERROR, None, f"El proceso terminó con código {info['proceso'].exitcode}"
+                )
+                resultados[nombre] = _resultado(estado, segundos, valor, error)
+            elif segundos >= info['etapa'].timeout:
+                info['proceso'].terminate()
+                info['proceso'].join()
+                resultados[nombre] = _resultado(
+                    ESTADO_TIMEOUT, segundos, error=f"Superado el timeout de {info['etapa'].timeout}s"
+                )
+            else:
+                continue
+
+            info['receptor'].close()
+            del en_curso[nombre]
+            if resultados[nombre]['estado'] == ESTADO_OK:
+                logger.info(f"Etapa {nombre} completada en {segundos:.2f}s")
+            else:
+                logger.error(f"Etapa {nombre} {resultados[nombre]['estado']}: {resultados[nombre]['error']}")
+
+    return resultados
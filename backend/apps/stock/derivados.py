@@ -0,0 +1,222 @@
+"""
+Datos derivados de Stock precalculados al terminar la carga nocturna.
+
+Los resúmenes del chat, las estadísticas de la API y el contexto de la IA se
+guardan en la caché bajo una versión del stock. Cada carga que modifica Stock
+incrementa la versión con invalidar_derivados(), de modo que las claves
+anteriores dejan de leerse sin tener que borrarlas una a una, y a
+continuación la etapa 5 de migrate_stock_and_scrape las vuelve a calcular
+con el grafo ETAPAS_POST_CARGA (apps.stock.dag) antes de que llegue la
+primera petición.
+
+Si una etapa falla, la petición calcula su valor al vuelo como antes
+(obtener_derivado hace de caché de lectura). Para que lo calculado en los
+procesos de las etapas llegue al servidor web la caché debe ser compartida
+(Redis con REDIS_URL, o la caché en base de datos de producción).
+"""
+import logging
+import time
+from decimal import Decimal
+from typing import Any, Callable, List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection
+from django.db.models import Count, Q, Sum
+
+from apps.stock.dag import Etapa
+
+logger = logging.getLogger(__name__)
+
+CLAVE_VERSION = 'stock:derivados:version'
+
+
+def cache_compartida() -> bool:
+    """Indica si la caché por defecto es visible desde otros procesos"""
+    return not isinstance(cache, LocMemCache)
+
+
+def version_stock() -> int:
+    """Versión actual del stock; si la caché la perdió, empieza una nueva"""
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        # Basada en el reloj para no reutilizar versiones de las que aún queden claves
+        cache.add(CLAVE_VERSION, int(time.time() * 1000), None)
+        version = cache.get(CLAVE_VERSION)
+    return version
+
+
+def invalidar_derivados() -> int:
+    """Descarta todos los derivados calculados para el stock anterior"""
+    try:
+        version = cache.incr(CLAVE_VERSION)
+    except ValueError:
+        version = int(time.time() * 1000)
+        cache.set(CLAVE_VERSION, version, None)
+    logger.info(f"Derivados de stock invalidados (versión {version})")
+    return version
+
+
+def clave_derivado(nombre: str, *partes) -> str:
+    """Clave de caché de un derivado para la versión actual del stock"""
+    sufijo = ''.join(f':{parte}' for parte in partes)
+    return f'stock:derivado:{version_stock()}:{nombre}{sufijo}'
+
+
+def obtener_derivado(nombre: str, calcular: Callable[[], Any], *partes) -> Any:
+    """
+    Devuelve el derivado de la caché o lo calcula y lo guarda.
+
+    Args:
+        nombre: Nombre del derivado
+        calcular: Función sin argumentos que calcula el valor
+        partes: Parámetros que distinguen variantes del derivado (p. ej. la marca)
+    """
+    clave = clave_derivado(nombre, *partes)
+    valor = cache.get(clave)
+    if valor is None:
+        valor = calcular()
+        cache.set(clave, valor, settings.STOCK_DERIVADOS_TTL)
+    return valor
+
+
+def precalcular(nombre: str, calcular: Callable[[], Any], *partes) -> Any:
+    """Calcula el derivado y lo guarda en la caché, sustituyendo el que hubiera"""
+    valor = calcular()
+    cache.set(clave_derivado(nombre, *partes), valor, settings.STOCK_DERIVADOS_TTL)
+    return valor
+
+
+def calcular_estadisticas_api() -> dict:
+    """
+    Indicadores que devuelve GET /api/stock/stats/, de una sola pasada sobre Stock.
+
+    Agrupa por estado con agregados condicionales y suma los grupos en
+    Python, así que los conteos, el valor a coste, los días medios en stock y
+    el reparto por estado salen de la misma consulta.
+    """
+    from apps.stock.models import Stock
+
+    grupos = Stock.objects.order_by().values('descripcion_estado').annotate(
+        total=Count('pk'),
+        disponibles=Count('pk', filter=Q(reservado=False)),
+        publicados=Count('pk', filter=Q(publicado=True)),
+        valor_costo=Sum('importe_costo'),
+        suma_dias=Sum('dias_stock'),
+        con_dias=Count('dias_stock'),
+    )
+
+    total = disponibles = publicados = suma_dias = con_dias = 0
+    valor_costo = Decimal('0')
+    por_estado = []
+    for grupo in grupos:
+        total += grupo['total']
+        disponibles += grupo['disponibles']
+        publicados += grupo['publicados']
+        valor_costo += grupo['valor_costo'] or 0
+        suma_dias += grupo['suma_dias'] or 0
+        con_dias += grupo['con_dias']
+        por_estado.append({'estado': grupo['descripcion_estado'], 'total': grupo['total']})
+    por_estado.sort(key=lambda e: (-e['total'], e['estado'] is None, e['estado'] or ''))
+
+    return {
+        'total_vehiculos': total,
+        'vehiculos_disponibles': disponibles,
+        'vehiculos_reservados': total - disponibles,
+        'vehiculos_publicados': publicados,
+        'ratio_publicados': round(publicados / total, 4) if total else 0.0,
+        'valor_stock_costo': float(valor_costo),
+        'dias_stock_medio': round(suma_dias / con_dias, 1) if con_dias else None,
+        'por_estado': por_estado,
+    }
+
+
+# Etapas del grafo: se ejecutan en procesos separados y devuelven un resumen serializable
+
+def etapa_analizar_stock() -> str:
+    """Actualiza las estadísticas del planificador para la tabla recién cargada"""
+    from apps.stock.models import Stock
+
+    tabla = Stock._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f'ANALYZE {connection.ops.quote_name(tabla)}')
+    return tabla
+
+
+def etapa_resumen_stock() -> dict:
+    from apps.ai_chat.services import StockQueryService
+
+    return precalcular('resumen_stock', StockQueryService.calculate_stock_summary)
+
+
+def etapa_resumen_marcas() -> int:
+    from apps.ai_chat.services import StockQueryService
+
+    return len(precalcular('resumen_marcas', StockQueryService.calculate_brands_summary))
+
+
+def etapa_resumen_modelos() -> int:
+    from apps.ai_chat.services import StockQueryService
+
+    return len(precalcular('resumen_modelos', StockQueryService.calculate_models_summary, ''))
+
+
+def etapa_rangos_precio() -> int:
+    from apps.ai_chat.services import StockQueryService
+
+    return len(precalcular('rangos_precio', StockQueryService.calculate_price_range_summary))
+
+
+def etapa_contexto_chat() -> int:
+    """Contexto de la IA; se construye con los resúmenes ya precalculados"""
+    from apps.ai_chat.services import StockQueryService
+
+    return len(precalcular('contexto_chat', StockQueryService.build_context_for_ai))
+
+
+def etapa_estadisticas_api() -> dict:
+    return precalcular('estadisticas_api', calcular_estadisticas_api)
+
+
+def etapa_facetas() -> int:
+    """Facetas del listado sin filtros, las que pide la barra de filtros al abrirse"""
+    from django.http import QueryDict
+
+    from apps.stock.facetas import clave_filtros, contar_facetas
+    from apps.stock.models import Stock
+
+    facetas = precalcular('facetas', lambda: contar_facetas(Stock.objects.all()), clave_filtros(QueryDict()))
+    return facetas['total']
+
+
+def etapa_calentar_stock() -> int:
+    """Lee la primera página del listado por defecto de la API para dejarla en memoria"""
+    from apps.stock.models import Stock
+    from apps.stock.views import StandardResultsSetPagination, StockViewSet
+
+    pagina = StandardResultsSetPagination.page_size
+    return len(list(Stock.objects.order_by(*StockViewSet.ordering)[:pagina]))
+
+
+def etapas_post_carga() -> List[Etapa]:
+    """Grafo de derivados que se recalcula al publicar una carga de Stock"""
+    timeout = settings.STOCK_DERIVADOS_TIMEOUT
+    modulo = __name__
+    return [
+        Etapa('analizar_stock', f'{modulo}.etapa_analizar_stock', timeout=timeout),
+        Etapa('resumen_stock', f'{modulo}.etapa_resumen_stock', timeout=timeout),
+        Etapa('resumen_marcas', f'{modulo}.etapa_resumen_marcas', timeout=timeout),
+        Etapa('resumen_modelos', f'{modulo}.etapa_resumen_modelos', timeout=timeout),
+        Etapa('rangos_precio', f'{modulo}.etapa_rangos_precio', timeout=timeout),
+        Etapa('estadisticas_api', f'{modulo}.etapa_estadisticas_api', timeout=timeout),
+        Etapa(
+            'contexto_chat', f'{modulo}.etapa_contexto_chat',
+            depende_de=('resumen_stock', 'resumen_marcas', 'rangos_precio'), timeout=timeout,
+        ),
+        Etapa('facetas', f'{modulo}.etapa_facetas', depende_de=('analizar_stock',), timeout=timeout),
+        Etapa(
+            'calentar_stock', f'{modulo}.etapa_calentar_stock',
+            depende_de=('analizar_stock',), timeout=timeout,
+        ),
+    ]
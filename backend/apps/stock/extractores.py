@@ -0,0 +1,206 @@
+"""
+Extractores de vehículos a partir del HTML de los listados de coches.net.
+
+El backend es intercambiable: "bs4" usa BeautifulSoup con html.parser (el
+comportamiento original) y "lxml" usa el parser en C de libxml2 con
+expresiones XPath precompiladas, bastante más rápido. Ambos devuelven
+exactamente los mismos campos. Las páginas se pueden repartir entre varios
+procesos para aprovechar más de un núcleo, ya que el parseo es CPU-bound.
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, InvalidOperation
+from functools import partial
+from typing import Dict, List, Optional, Sequence, Union
+
+from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
+
+logger = logging.getLogger(__name__)
+
+# Contenedores de vehículo, en orden de preferencia: se usa el primero que tenga resultados
+SELECTORES_VEHICULO = [('div', 'vehicle-item'), ('div', 'advert'), ('article', 'car')]
+
+# Clase CSS del elemento -> campo extraído
+CLASES_CAMPOS = {'price': 'precio_venta', 'km': 'kilometros', 'year': 'anio_matricula'}
+
+# Atributo del contenedor con el identificador del anuncio en coches.net
+ATRIBUTO_ID_ANUNCIO = 'data-ad-id'
+
+Contenido = Union[bytes, str]
+
+
+def parsear_precio(texto: str) -> Optional[Decimal]:
+    """Convierte un precio con formato español ("12.500,50 €") en Decimal"""
+    try:
+        return Decimal(texto.replace('€', '').replace('.', '').replace(',', '.'))
+    except InvalidOperation:
+        return None
+
+
+def parsear_kilometros(texto: str) -> Optional[int]:
+    try:
+        return int(texto.replace('km', '').replace('.', ''))
+    except ValueError:
+        return None
+
+
+def parsear_anio(texto: str) -> Optional[int]:
+    try:
+        return int(texto)
+    except ValueError:
+        return None
+
+
+PARSEADORES = {
+    'precio_venta': parsear_precio,
+    'kilometros': parsear_kilometros,
+    'anio_matricula': parsear_anio,
+}
+
+
+def datos_desde_textos(textos: Dict[str, str], id_anuncio: Optional[str] = None,
+                       url_anuncio: Optional[str] = None) -> Dict:
+    """
+    Convierte los textos encontrados por campo en valores tipados, omitiendo los no válidos.
+
+    El identificador y el enlace del anuncio se conservan para reconocer el
+    mismo vehículo en cargas sucesivas.
+    """
+    datos = {}
+    for campo, texto in textos.items():
+        valor = PARSEADORES[campo](texto)
+        if valor is not None:
+            datos[campo] = valor
+    if id_anuncio and id_anuncio.strip():
+        datos['id_anuncio'] = id_anuncio.strip()
+    if url_anuncio and url_anuncio.strip():
+        datos['url_anuncio'] = url_anuncio.strip()
+    return datos
+
+
+class ExtractorBeautifulSoup:
+    """Extractor con BeautifulSoup y html.parser (Python puro)"""
+
+    nombre = 'bs4'
+
+    def elementos(self, contenido: Contenido) -> list:
+        soup = BeautifulSoup(contenido, 'html.parser')
+        for etiqueta, clase in SELECTORES_VEHICULO:
+            elementos = soup.find_all(etiqueta, class_=clase)
+            if elementos:
+                return elementos
+        return []
+
+    def extraer_elemento(self, elemento) -> Dict:
+        textos = {}
+        for clase, campo in CLASES_CAMPOS.items():
+            encontrado = elemento.find(class_=clase)
+            if encontrado:
+                textos[campo] = encontrado.get_text(strip=True)
+        enlace = elemento.find('a', href=True)
+        return datos_desde_textos(
+            textos, elemento.get(ATRIBUTO_ID_ANUNCIO), enlace['href'] if enlace else None
+        )
+
+    def extraer(self, contenido: Contenido) -> List[Dict]:
+        return [self.extraer_elemento(elemento) for elemento in self.elementos(contenido)]
+
+
+def _xpath_clase(clase: str, etiqueta: str = '*', prefijo: str = '//') -> etree.XPath:
+    """XPath precompilado equivalente al selector CSS etiqueta.clase"""
+    return etree.XPath(
+        f"{prefijo}{etiqueta}[contains(concat(' ', normalize-space(@class), ' '), ' {clase} ')]"
+    )
+
+
+class ExtractorLxml:
+    """Extractor con lxml (libxml2) y XPath precompilados"""
+
+    nombre = 'lxml'
+
+    _xpaths_vehiculo = [_xpath_clase(clase, etiqueta) for etiqueta, clase in SELECTORES_VEHICULO]
+    _xpaths_campos = {
+        campo: _xpath_clase(clase, prefijo='.//') for clase, campo in CLASES_CAMPOS.items()
+    }
+    _xpath_enlace = etree.XPath('.//a/@href')
+
+    @staticmethod
+    def _documento(contenido: Contenido):
+        if isinstance(contenido, bytes):
+            try:
+                contenido = contenido.decode('utf-8')
+            except UnicodeDecodeError:
+                contenido = contenido.decode('latin-1')
+        if not contenido.strip():
+            return None
+        return lxml_html.document_fromstring(contenido)
+
+    def elementos(self, contenido: Contenido) -> list:
+        documento = self._documento(contenido)
+        if documento is None:
+            return []
+        for xpath in self._xpaths_vehiculo:
+            elementos = xpath(documento)
+            if elementos:
+                return elementos
+        return []
+
+    def extraer_elemento(self, elemento) -> Dict:
+        textos = {}
+        for campo, xpath in self._xpaths_campos.items():
+            encontrados = xpath(elemento)
+            if encontrados:
+                textos[campo] = ''.join(texto.strip() for texto in encontrados[0].itertext())
+        enlaces = self._xpath_enlace(elemento)
+        return datos_desde_textos(
+            textos, elemento.get(ATRIBUTO_ID_ANUNCIO), str(enlaces[0]) if enlaces else None
+        )
+
+    def extraer(self, contenido: Contenido) -> List[Dict]:
+        return [self.extraer_elemento(elemento) for elemento in self.elementos(contenido)]
+
+
+EXTRACTORES = {
+    ExtractorBeautifulSoup.nombre: ExtractorBeautifulSoup,
+    ExtractorLxml.nombre: ExtractorLxml,
+}
+
+
+def obtener_extractor(nombre: str):
+    """Instancia el extractor por nombre ("bs4" o "lxml")"""
+    try:
+        return EXTRACTORES[nombre]()
+    except KeyError:
+        raise ValueError(f"Extractor desconocido: {nombre}. Opciones: {', '.join(EXTRACTORES)}")
+
+
+def _extraer_pagina(nombre: str, contenido: Contenido) -> List[Dict]:
+    """Punto de entrada de los procesos del pool (debe ser una función de módulo)"""
+    return obtener_extractor(nombre).extraer(contenido)
+
+
+def extraer_paginas(contenidos: Sequence[Contenido], extractor: str = 'lxml',
+                    procesos: int = 1) -> List[List[Dict]]:
+    """
+    Extrae los datos de vehículos de varias páginas de listado.
+
+    Args:
+        contenidos: HTML de cada página
+        extractor: Nombre del backend ("bs4" o "lxml")
+        procesos: Si es mayor que 1, las páginas se reparten entre un pool de procesos
+
+    Returns:
+        Una lista de diccionarios de vehículo por página, en el mismo orden
+    """
+    if procesos <= 1 or len(contenidos) <= 1:
+        backend = obtener_extractor(extractor)
+        return [backend.extraer(contenido) for contenido in contenidos]
+
+    procesos = min(procesos, len(contenidos))
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        return list(pool.map(
+            partial(_extraer_pagina, extractor),
+            contenidos,
+            chunksize=max(1, len(contenidos) // (procesos * 4)),
+        ))
@@ -0,0 +1,101 @@
+"""
+Conteos por faceta para los filtros del listado de stock.
+
+Todas las facetas salen de una única consulta con GROUPING SETS sobre el
+stock filtrado: cada conjunto agrupa por una columna y GROUPING() indica a
+qué faceta pertenece cada fila del resultado. El conjunto vacío () da el
+total.
+
+El resultado se guarda en la caché de derivados (apps.stock.derivados) bajo
+la versión actual del stock y un hash de los filtros, así que cada carga
+nocturna lo invalida sin borrar claves.
+"""
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+from django.db import connections
+from django.db.models import Case, CharField, Q, Value, When
+
+# Columnas de Stock con faceta, en el orden en que se devuelven
+CAMPOS_FACETAS = ['marca', 'modelo', 'provincia', 'color', 'tipo_vehiculo']
+
+# Faceta calculada de tramos de precio: (desde, hasta, etiqueta), hasta excluido
+FACETA_PRECIO = 'tramo_precio'
+TRAMOS_PRECIO: List[Tuple[int, Optional[int], str]] = [
+    (0, 10000, '0-10k'),
+    (10000, 20000, '10k-20k'),
+    (20000, 30000, '20k-30k'),
+    (30000, 50000, '30k-50k'),
+    (50000, None, '50k+'),
+]
+
+# Parámetros de la petición que no cambian el conjunto filtrado
+PARAMETROS_SIN_FILTRO = {'page', 'page_size', 'ordering', 'cursor', 'paginacion'}
+
+
+def clave_filtros(parametros) -> str:
+    """Hash estable de los filtros de una petición (QueryDict), sin paginación ni orden"""
+    filtros = sorted(
+        (nombre, sorted(valores)) for nombre, valores in parametros.lists()
+        if nombre not in PARAMETROS_SIN_FILTRO
+    )
+    return hashlib.md5(repr(filtros).encode('utf-8')).hexdigest()
+
+
+def _tramo_precio():
+    """Expresión con la etiqueta del tramo de precio de cada vehículo"""
+    casos = []
+    for desde, hasta, etiqueta in TRAMOS_PRECIO:
+        condicion = Q(precio_venta__gte=desde)
+        if hasta is not None:
+            condicion &= Q(precio_venta__lt=hasta)
+        casos.append(When(condicion, then=Value(etiqueta)))
+    return Case(*casos, default=Value(None), output_field=CharField())
+
+
+def contar_facetas(queryset) -> Dict:
+    """
+    Cuenta los vehículos del queryset por cada faceta con una sola consulta.
+
+    Args:
+        queryset: Stock ya filtrado con los filtros del listado
+
+    Returns:
+        Diccionario con el total y, por faceta, una lista de {valor, total}
+        ordenada de más a menos vehículos (valor None agrupa los vacíos)
+    """
+    columnas = CAMPOS_FACETAS + [FACETA_PRECIO]
+    filas = queryset.order_by().annotate(**{FACETA_PRECIO: _tramo_precio()}).values(*columnas)
+    sql, parametros = filas.query.sql_with_params()
+
+    connection = connections[queryset.db]
+    qn = connection.ops.quote_name
+    lista = ', '.join(qn(c) for c in columnas)
+    conjuntos = ', '.join(f'({qn(c)})' for c in columnas)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT {lista}, GROUPING({lista}), COUNT(*) FROM ({sql}) filas '
+            f'GROUP BY GROUPING SETS ({conjuntos}, ())',
+            parametros,
+        )
+        resultado = cursor.fetchall()
+
+    # GROUPING() devuelve un bit por columna (la primera es el más alto) a 1
+    # si la columna no forma parte del conjunto de esa fila
+    todas = (1 << len(columnas)) - 1
+    facetas = {columna: [] for columna in columnas}
+    total = 0
+    for fila in resultado:
+        agrupacion, cuenta = fila[-2], fila[-1]
+        if agrupacion == todas:
+            total = cuenta
+            continue
+        for posicion, columna in enumerate(columnas):
+            if not agrupacion & (1 << (len(columnas) - 1 - posicion)):
+                facetas[columna].append({'valor': fila[posicion], 'total': cuenta})
+                break
+
+    for valores in facetas.values():
+        valores.sort(key=lambda v: (-v['total'], v['valor'] is None, v['valor'] or ''))
+    return {'total': total, 'facetas': facetas}
@@ -0,0 +1,149 @@
+"""
+Motor de descarga asíncrono para el scraping.
+
+Usa un único cliente httpx con pool de conexiones persistentes, limita el
+número de peticiones en vuelo y aplica un limitador token-bucket por host
+en lugar de un retraso fijo entre páginas. Los errores transitorios
+(conexión, 429, 5xx) se reintentan con backoff exponencial con jitter.
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import urlsplit
+
+import httpx
+
+from apps.stock.cache_http import CacheHTTP
+
+logger = logging.getLogger(__name__)
+
+CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Limitador de tasa token-bucket.
+
+    Se reponen `tasa` tokens por segundo hasta un máximo de `capacidad`;
+    cada petición consume un token y espera si no hay ninguno disponible.
+    """
+
+    def __init__(self, tasa: float, capacidad: int = 1):
+        if tasa <= 0:
+            raise ValueError("La tasa del token bucket debe ser positiva")
+        self.tasa = tasa
+        self.capacidad = max(1, capacidad)
+        self._tokens = float(self.capacidad)
+        self._ultima = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _reponer(self):
+        ahora = time.monotonic()
+        self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultima) * self.tasa)
+        self._ultima = ahora
+
+    async def adquirir(self):
+        """Espera hasta disponer de un token y lo consume"""
+        async with self._lock:
+            self._reponer()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.tasa)
+                self._reponer()
+            self._tokens -= 1
+
+
+class Fetcher:
+    """
+    Descargador concurrente con pool de conexiones y límite de tasa por host.
+
+    Args:
+        concurrencia: Número máximo de peticiones en vuelo
+        peticiones_por_segundo: Tasa máxima sostenida por host
+        rafaga: Peticiones que se pueden lanzar de golpe por host
+        reintentos: Reintentos ante errores transitorios
+        backoff_base: Base en segundos del backoff exponencial
+        timeout: Timeout de cada petición en segundos
+        headers: Cabeceras enviadas en todas las peticiones
+        cache: Caché HTTP de la que se toman las cabeceras condicionales
+            (ver apps.stock.cache_http); las respuestas 304 se devuelven tal cual
+    """
+
+    def __init__(self, concurrencia: int = 4, peticiones_por_segundo: float = 4.0, rafaga: Optional[int] = None,
+                 reintentos: int = 3, backoff_base: float = 0.5, timeout: float = 10.0,
+                 headers: Optional[Dict[str, str]] = None, cache: Optional[CacheHTTP] = None):
+        self.concurrencia = max(1, concurrencia)
+        self.peticiones_por_segundo = peticiones_por_segundo
+        self.rafaga = rafaga or self.concurrencia
+        self.reintentos = reintentos
+        self.backoff_base = backoff_base
+        self.timeout = timeout
+        self.headers = headers or {}
+        self.cache = cache
+        self._limitadores: Dict[str, TokenBucket] = {}
+
+    def _limitador(self, url: str) -> TokenBucket:
+        host = urlsplit(url).netloc
+        if host not in self._limitadores:
+            self._limitadores[host] = TokenBucket(self.peticiones_por_segundo, self.rafaga)
+        return self._limitadores[host]
+
+    def _espera_reintento(self, intento: int, respuesta: Optional[httpx.Response] = None) -> float:
+        """Backoff exponencial con jitter completo; respeta Retry-After si viene en la respuesta"""
+        if respuesta is not None:
+            retry_after = respuesta.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+        return random.uniform(0, self.backoff_base * (2 ** intento))
+
+    async def _descargar(self, cliente: httpx.AsyncClient, semaforo: asyncio.Semaphore,
+                         url: str) -> Optional[httpx.Response]:
+        for intento in range(self.reintentos + 1):
+            await self._limitador(url).adquirir()
+            respuesta = None
+            try:
+                async with semaforo:
+                    respuesta = await cliente.get(
+                        url, headers=self.cache.cabeceras_condicionales(url) if self.cache else None
+                    )
+                if respuesta.status_code == 304:
+                    return respuesta
+                if respuesta.status_code not in CODIGOS_REINTENTABLES:
+                    respuesta.raise_for_status()
+                    return respuesta
+                logger.warning(f"HTTP {respuesta.status_code} en {url} (intento {intento + 1})")
+            except httpx.HTTPStatusError as e:
+                logger.warning(f"Error al descargar {url}: {str(e)}")
+                return None
+            except httpx.TransportError as e:
+                logger.warning(f"Error de conexión en {url} (intento {intento + 1}): {str(e)}")
+
+            if intento < self.reintentos:
+                await asyncio.sleep(self._espera_reintento(intento, respuesta))
+
+        logger.warning(f"Descarga de {url} abandonada tras {self.reintentos + 1} intentos")
+        return None
+
+    def _crear_cliente(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            headers=self.headers,
+            timeout=self.timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=self.concurrencia,
+                max_keepalive_connections=self.concurrencia,
+            ),
+        )
+
+    async def descargar_todas(self, urls: Sequence[str]) -> List[Optional[httpx.Response]]:
+        """Descarga las URLs concurrentemente; devuelve las respuestas en el mismo orden (None si fallan)"""
+        semaforo = asyncio.Semaphore(self.concurrencia)
+        # Los limitadores usan primitivas asyncio ligadas al bucle de eventos actual
+        self._limitadores = {}
+        async with self._crear_cliente() as cliente:
+            return await asyncio.gather(*(self._descargar(cliente, semaforo, url) for url in urls))
+
+    def descargar(self, urls: Sequence[str]) -> List[Optional[httpx.Response]]:
+        """Versión síncrona de descargar_todas, para usar desde código Django síncrono"""
+        return asyncio.run(self.descargar_todas(urls))
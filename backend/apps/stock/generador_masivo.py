@@ -0,0 +1,339 @@
+"""
+Generador vectorizado de inventario sintético.
+
+Produce columnas completas de vehículos con NumPy (un array por campo de
+Stock) en lugar de construir un diccionario por vehículo con llamadas a
+random, y las carga en PostgreSQL con COPY. Con la misma semilla se obtienen
+siempre los mismos datos, lo que permite reproducir volúmenes de producción
+en local.
+"""
+import csv
+import io
+import logging
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from django.db import connections
+
+from apps.stock.models import Stock
+from apps.stock.scrapers import (
+    COLORES, CONCESIONARIOS_PRINCIPALES, MARCAS_COMUNES, MODELOS_POR_MARCA, PROVINCIAS,
+)
+
+logger = logging.getLogger(__name__)
+
+ALFABETO_BASTIDOR = 'ABCDEFGHJKLMNPRSTUVWXYZ0123456789'
+LETRAS_MATRICULA = 'BCDFGHJKLMNPRSTVWXYZ'
+HEXADECIMAL = '0123456789abcdef'
+
+# Marcas con precio de partida más alto
+MARCAS_PREMIUM = {'BMW', 'Mercedes-Benz', 'Audi'}
+
+# Caracteres del bastidor que codifican la posición del vehículo: 33**12 valores únicos
+LONGITUD_SECUENCIA_BASTIDOR = 12
+
+Columnas = Dict[str, np.ndarray]
+
+
+def _elegir(rng: np.random.Generator, opciones: List, n: int) -> np.ndarray:
+    return np.asarray(opciones, dtype=object)[rng.integers(0, len(opciones), n)]
+
+
+def _con_prefijo(prefijo: str, numeros: np.ndarray) -> np.ndarray:
+    return np.char.add(prefijo, numeros.astype(str)).astype(object)
+
+
+def _caracteres(rng: np.random.Generator, alfabeto: str, longitud: int, n: int) -> np.ndarray:
+    """Cadenas aleatorias de longitud fija, generadas como una matriz n x longitud"""
+    letras = np.array(list(alfabeto))[rng.integers(0, len(alfabeto), (n, longitud))]
+    return np.ascontiguousarray(letras).view(f'<U{longitud}').ravel()
+
+
+def _codificar(indices: np.ndarray, alfabeto: str, longitud: int) -> np.ndarray:
+    """Codifica enteros en base len(alfabeto) con longitud fija (sin colisiones)"""
+    base = len(alfabeto)
+    potencias = base ** np.arange(longitud - 1, -1, -1, dtype=np.int64)
+    digitos = (indices.astype(np.int64)[:, None] // potencias) % base
+    letras = np.array(list(alfabeto))[digitos]
+    return np.ascontiguousarray(letras).view(f'<U{longitud}').ravel()
+
+
+def _identificadores(rng: np.random.Generator, n: int) -> np.ndarray:
+    """Identificadores aleatorios con formato UUID (36 caracteres)"""
+    hexadecimal = np.array(list(HEXADECIMAL))[rng.integers(0, 16, (n, 32))]
+    guion = np.full((n, 1), '-')
+    partes = [hexadecimal[:, 0:8], guion, hexadecimal[:, 8:12], guion, hexadecimal[:, 12:16],
+              guion, hexadecimal[:, 16:20], guion, hexadecimal[:, 20:32]]
+    return np.ascontiguousarray(np.hstack(partes)).view('<U36').ravel().astype(object)
+
+
+def _intervalos(rng: np.random.Generator, n: int) -> np.ndarray:
+    return _con_prefijo('0-', rng.integers(30, 91, n))
+
+
+def generar_bastidores(rng: np.random.Generator, indices: np.ndarray) -> np.ndarray:
+    """Bastidores de 17 caracteres; los últimos codifican el índice, de modo que no se repiten"""
+    prefijos = _caracteres(rng, ALFABETO_BASTIDOR, 17 - LONGITUD_SECUENCIA_BASTIDOR, len(indices))
+    secuencia = _codificar(indices, ALFABETO_BASTIDOR, LONGITUD_SECUENCIA_BASTIDOR)
+    return np.char.add(prefijos, secuencia).astype(object)
+
+
+def generar_lote(n: int, rng: np.random.Generator, inicio: int = 0,
+                 hoy: Optional[date] = None) -> Columnas:
+    """
+    Genera n vehículos como columnas, una por cada campo concreto de Stock.
+
+    Args:
+        n: Número de vehículos
+        rng: Generador de NumPy (np.random.default_rng(semilla)) del que salen todos los valores
+        inicio: Índice del primer vehículo; los bastidores son únicos para índices distintos
+        hoy: Fecha de referencia para fechas, antigüedades y fecha_snapshot
+
+    Returns:
+        Diccionario columna -> array de n elementos
+    """
+    hoy = hoy or date.today()
+    dia = np.datetime64(hoy, 'D')
+    ahora = np.datetime64(datetime.combine(hoy, datetime.min.time()), 's')
+
+    # Marca, modelo y antigüedad: el resto de campos económicos se derivan de ellos
+    marcas = _elegir(rng, MARCAS_COMUNES, n)
+    modelos = np.full(n, 'Modelo Genérico', dtype=object)
+    for marca, opciones in MODELOS_POR_MARCA.items():
+        mascara = marcas == marca
+        modelos[mascara] = _elegir(rng, opciones, int(mascara.sum()))
+
+    dias_matricula = rng.integers(30, 3651, n)
+    fecha_matriculacion = dia - dias_matricula.astype('timedelta64[D]')
+    anios = dias_matricula / 365.0
+    kilometros = np.clip(anios * rng.normal(15000, 5000, n), 1000, 250000).astype(np.int64)
+
+    premium = np.isin(marcas, list(MARCAS_PREMIUM))
+    precio_nuevo = np.where(premium, rng.uniform(35000, 150000, n), rng.uniform(15000, 60000, n))
+    precio_venta = np.round(np.maximum(precio_nuevo * 0.87 ** anios, 3000), 0)
+    importe_compra = np.round(precio_venta * rng.uniform(0.90, 1.00, n), 2)
+    importe_costo = np.round(importe_compra * rng.uniform(0.98, 1.02, n), 2)
+    cero = np.zeros(n)
+
+    dias_stock = rng.integers(1, 366, n)
+    concesionarios = rng.integers(0, len(CONCESIONARIOS_PRINCIPALES), n)
+    id_concesionario = np.array([c['id'] for c in CONCESIONARIOS_PRINCIPALES], dtype=object)[concesionarios]
+    nom_concesionario = np.array([c['nombre'] for c in CONCESIONARIOS_PRINCIPALES], dtype=object)[concesionarios]
+    bastidores = generar_bastidores(rng, np.arange(inicio, inicio + n))
+    estado = rng.integers(0, 3, n)
+
+    def dias_atras(bajo, alto):
+        return dia - rng.integers(bajo, alto + 1, n).astype('timedelta64[D]')
+
+    tipo_proveedor = _elegir(rng, ['Nacional', 'Importado', 'Premium'], n).astype(str)
+
+    columnas = {
+        'idv': rng.integers(1000000, 10000000, n),
+        'fecha_informe': np.full(n, int(hoy.strftime('%Y%m%d'))),
+        'bastidor': bastidores,
+        'vehicle_key': generar_bastidores(rng, rng.integers(0, 33 ** LONGITUD_SECUENCIA_BASTIDOR, n)),
+        'vehicle_key2': generar_bastidores(rng, rng.integers(0, 33 ** LONGITUD_SECUENCIA_BASTIDOR, n)),
+        'id_concesionario': id_concesionario,
+        'nom_concesionario': nom_concesionario,
+        'id_proveedor': _con_prefijo('PROV', rng.integers(1000, 10000, n)),
+        'nom_proveedor': np.char.add('Proveedor ', tipo_proveedor).astype(object),
+        'dealer_corto': np.array([nombre[:15] for nombre in nom_concesionario], dtype=object),
+        'provincia': _elegir(rng, PROVINCIAS, n),
+        'matricula': np.char.add(
+            _caracteres(rng, '0123456789', 4, n), _caracteres(rng, LETRAS_MATRICULA, 3, n)
+        ).astype(object),
+        'fecha_matriculacion': fecha_matriculacion,
+        'fecha_recepcion': fecha_matriculacion + rng.integers(0, 31, n).astype('timedelta64[D]'),
+        'marca': marcas,
+        'modelo': modelos,
+        'modelo_comercial': modelos,
+        'id_modelo': _con_prefijo('MOD', rng.integers(100000, 1000000, n)),
+        'modelo_qbi': modelos,
+        'descripcion_modelo_qbi': np.char.add(np.char.add(marcas.astype(str), ' '), modelos.astype(str)).astype(object),
+        'modelo_bastidor': _con_prefijo('MB', rng.integers(1000, 10000, n)),
+        'anio_matricula': fecha_matriculacion.astype('datetime64[Y]').astype(np.int64) + 1970,
+        'color': _elegir(rng, COLORES, n),
+        'color_secundario': _elegir(rng, COLORES, n),
+        'cod_color': _con_prefijo('COL', rng.integers(100, 1000, n)),
+        'id_color': _con_prefijo('IDCOL', rng.integers(100, 1000, n)),
+        'kilometros': kilometros,
+        'ubicacion': _elegir(rng, PROVINCIAS, n),
+        'id_tipo_vo': np.full(n, 'VO001', dtype=object),
+        'descripcion_tipo_vo': np.full(n, 'Vehículo de Ocasión', dtype=object),
+        'tipo_vehiculo': _elegir(rng, ['Berlina', 'SUV', 'Coupé', 'Monovolumen', 'Pickup', 'Furgoneta'], n),
+        'id_estado': np.array(['DISP', 'RESERV', 'VEND'], dtype=object)[estado],
+        'descripcion_estado': np.array(['Disponible', 'Reservado', 'Vendido'], dtype=object)[estado],
+        'tipo_stock': _elegir(rng, ['STOCK', 'SPECIAL', 'PROMOCION'], n),
+        'reservado': estado == 1,
+        'dias_stock': dias_stock,
+        'intervalo_dias': _intervalos(rng, n),
+        'meses_en_stock': np.round(np.minimum(dias_stock / 30.0, 999), 2),
+        'dias_stock_fin_mes': rng.integers(1, 366, n),
+        'intervalo_dias_fin_mes': _intervalos(rng, n),
+        'intervalo_dias_vo': _intervalos(rng, n),
+        'intervalo_dias_vo_new': _intervalos(rng, n),
+        'intervalo_km': np.full(n, '0-100000', dtype=object),
+        'interv_km_id': _con_prefijo('KM', np.minimum(kilometros // 50000 + 1, 5)),
+        'uds_disponibles_stock': rng.integers(1, 51, n),
+        'uds_reservadas_stock': rng.integers(0, 11, n),
+        'stock_uds': rng.integers(1, 51, n),
+        'pedido': _con_prefijo('PED', rng.integers(100000, 1000000, n)),
+        'categoria': _elegir(rng, ['SUV', 'Berlina', 'Familiar', 'Coupé', 'Monovolumen'], n),
+        'canal_entrada_vo': _elegir(rng, ['DIRECTO', 'SUBASTA', 'PERMUTA'], n),
+        'concepto_compra': _elegir(rng, ['COMPRA', 'TRUEQUE', 'ALMONEDA'], n),
+        'importe_compra': importe_compra,
+        'importe_rectificativas': cero,
+        'importe_reacon': cero,
+        'importe_vales': cero,
+        'importe_costo': importe_costo,
+        'importe_coste_total': importe_costo,
+        'precio_venta': precio_venta,
+        'precio_anterior': precio_venta,
+        'precio_nuevo': np.round(precio_nuevo, 0),
+        'diferencia_precios': cero,
+        'stock_benef_estimado': np.round(precio_venta - importe_costo, 2),
+        'publicado': rng.random(n) < 0.8,
+        'id_internet': _con_prefijo('INT', rng.integers(100000, 1000000, n)),
+        'link_internet': np.char.add(
+            np.char.add('https://www.coches.net/vehiculo/', rng.integers(100000, 1000000, n).astype(str)), '.html'
+        ).astype(object),
+        'internet_eurotax_compra': np.round(importe_compra * 0.95, 2),
+        'internet_eurotax_venta': np.round(precio_venta * 1.05, 2),
+        'internet_anuncios': rng.integers(1, 11, n),
+        'internet_precio_min': np.round(precio_venta * 0.9, 2),
+        'internet_precio_max': np.round(precio_venta * 1.1, 2),
+        'precio_internet': precio_venta,
+        'internet_fotos': rng.integers(5, 51, n),
+        'internet_autorizado': rng.random(n) < 0.5,
+        'status_imaweb': _elegir(rng, ['ACTIVO', 'INACTIVO', 'PENDIENTE'], n),
+        'status_car_imaweb': _elegir(rng, ['OK', 'FALTA_DATOS', 'ERROR'], n),
+        'fecha_primera_publicacion': dias_atras(1, 365),
+        'fecha_ultima_publicacion': np.full(n, dia),
+        'antiguedad_anuncio': rng.integers(1, 366, n),
+        'dias_primera_public': rng.integers(1, 366, n),
+        'uc_dias': rng.integers(1, 366, n),
+        'internet_dias_public': rng.integers(1, 366, n),
+        'tmaimg': np.full(n, 'FULL_HD', dtype=object),
+        'tiene_video': rng.random(n) < 0.3,
+        'visitas_totales': rng.integers(10, 10001, n),
+        'llamadas_recibidas': rng.integers(0, 101, n),
+        'emails_recibidos': rng.integers(0, 101, n),
+        'visitas_cambio': rng.integers(0, 1001, n),
+        'leads_cambio': rng.integers(0, 51, n),
+        'visitas_cambio_dias': rng.integers(0, 101, n),
+        'leads_cambio_dias': rng.integers(0, 11, n),
+        'flag_lead': rng.random(n) < 0.5,
+        'stock_leads': rng.integers(0, 51, n),
+        'prediction': _elegir(rng, ['VENTA_PROXIMA', 'LENTA', 'MEDIA', 'RAPIDA'], n),
+        'uds_mes': rng.integers(0, 11, n),
+        'uds_3mes': rng.integers(0, 31, n),
+        'uds_ano': rng.integers(0, 101, n),
+        'ultimo_cambio': _con_prefijo('CAMBIO', rng.integers(1, 101, n)),
+        'ult_cambio': _con_prefijo('CAMBIO', rng.integers(1, 101, n)),
+        'fecha_ultimo_cambio': dias_atras(0, 30),
+        'fecha_ultimo_cambio_2': dias_atras(0, 30),
+        'fecha_ult_cambio': dias_atras(0, 30),
+        'dias_desde_ult_cambio': rng.integers(0, 31, n),
+        'bastidor_qbi': bastidores,
+        'id_calidad_marca': _identificadores(rng, n),
+        'fecha_ultima_foto_optipix': ahora - rng.integers(0, 30 * 86400, n).astype('timedelta64[s]'),
+        'id_vehiculo_foto_optipix': _identificadores(rng, n),
+        'dias_desde_foto_optipix': rng.integers(0, 31, n),
+        'status_foto': _elegir(rng, ['OK', 'INCOMPLETA', 'PENDIENTE'], n),
+        'id_veces_pospuesto': _identificadores(rng, n),
+        'veces_pospuesto': rng.integers(0, 6, n),
+        'xxx': np.full(n, 'DATO_ADICIONAL', dtype=object),
+        'fecha_snapshot': np.full(n, dia),
+        'fecha_insert': np.full(n, ahora),
+        'fecha_actualizacion': np.full(n, ahora),
+    }
+
+    # Las columnas que comparten array se copian para poder modificarlas por separado
+    vistas = set()
+    for columna, valores in columnas.items():
+        if id(valores) in vistas:
+            columnas[columna] = valores.copy()
+        vistas.add(id(valores))
+    return columnas
+
+
+def avanzar_dia(columnas: Columnas, rng: np.random.Generator, hoy: date,
+                rotacion: float, inicio_nuevos: int) -> int:
+    """
+    Simula un día de actividad sobre el inventario, modificando las columnas in situ.
+
+    Una fracción `rotacion` de vehículos se vende y se sustituye por vehículos
+    nuevos, un 5% baja de precio y el resto suma un día en stock.
+
+    Returns:
+        Número de vehículos nuevos (consumen índices desde `inicio_nuevos`)
+    """
+    n = len(columnas['bastidor'])
+    dia = np.datetime64(hoy, 'D')
+
+    columnas['dias_stock'] = columnas['dias_stock'] + 1
+    columnas['fecha_snapshot'] = np.full(n, dia)
+    columnas['fecha_informe'] = np.full(n, int(hoy.strftime('%Y%m%d')))
+
+    rebajados = rng.random(n) < 0.05
+    columnas['precio_anterior'] = np.where(rebajados, columnas['precio_venta'], columnas['precio_anterior'])
+    columnas['precio_venta'] = np.where(
+        rebajados, np.round(columnas['precio_venta'] * rng.uniform(0.95, 0.99, n), 0), columnas['precio_venta']
+    )
+    columnas['diferencia_precios'] = np.round(columnas['precio_venta'] - columnas['precio_anterior'], 2)
+
+    nuevos = int(round(n * rotacion))
+    if nuevos:
+        vendidos = rng.choice(n, nuevos, replace=False)
+        lote = generar_lote(nuevos, rng, inicio=inicio_nuevos, hoy=hoy)
+        for columna, valores in lote.items():
+            columnas[columna][vendidos] = valores
+    return nuevos
+
+
+def _a_texto(valores: np.ndarray) -> list:
+    """Valores de una columna en el formato de texto que espera COPY"""
+    if np.issubdtype(valores.dtype, np.datetime64):
+        if np.datetime_data(valores.dtype)[0] == 'D':
+            return valores.astype(str).tolist()
+        return np.char.add(valores.astype('datetime64[s]').astype(str), '+00:00').tolist()
+    return valores.tolist()
+
+
+def filas_csv(columnas: Columnas, nombres: Iterable[str]) -> io.StringIO:
+    """Serializa las columnas indicadas como CSV listo para COPY FROM STDIN"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(zip(*(_a_texto(columnas[nombre]) for nombre in nombres)))
+    buffer.seek(0)
+    return buffer
+
+
+def copiar_a_tabla(tabla: str, columnas: Columnas, nombres: Optional[List[str]] = None,
+                   using: str = 'default') -> int:
+    """
+    Carga las columnas en la tabla con COPY ... FROM STDIN (formato CSV).
+
+    Args:
+        tabla: Tabla destino
+        columnas: Diccionario columna -> array, todos de la misma longitud
+        nombres: Columnas a cargar (default: todas las del diccionario)
+
+    Returns:
+        Número de filas cargadas
+    """
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    nombres = nombres or list(columnas)
+    sql = (
+        f'COPY {qn(tabla)} ({", ".join(qn(nombre) for nombre in nombres)}) '
+        f'FROM STDIN WITH (FORMAT csv)'
+    )
+    with connection.cursor() as cursor:
+        cursor.cursor.copy_expert(sql, filas_csv(columnas, nombres))
+    return len(columnas[nombres[0]])
+
+
+def columnas_stock() -> List[str]:
+    """Columnas de datos de stock, en el orden del modelo (sin el vector de búsqueda, que es calculado)"""
+    return [campo.column for campo in Stock._meta.concrete_fields if campo.column != 'busqueda']
@@ -0,0 +1,100 @@
+"""
+Carga incremental del stock por bastidor.
+
+En lugar de vaciar y recargar la tabla stock, el inventario entrante se
+vuelca en una tabla temporal y se compara con el actual. Cada vehículo se
+clasifica como insertado, actualizado, sin cambios o eliminado, y solo se
+escriben las filas que cambian, de modo que el volumen de escritura (WAL,
+índices) depende de la cantidad de cambios y no del tamaño del inventario.
+"""
+import logging
+from typing import Dict, Iterable, List
+
+from django.db import connections, transaction
+
+from apps.stock.models import Stock
+from apps.stock.staging import insertar_en_tabla
+
+logger = logging.getLogger(__name__)
+
+TABLA_ENTRANTE = 'stock_entrante'
+
+# Columnas que no cuentan como cambio del vehículo: la clave, los metadatos de la
+# carga y el vector de búsqueda (se recalcula a partir de las demás)
+COLUMNAS_NO_COMPARADAS = {
+    'bastidor', 'fecha_informe', 'fecha_snapshot', 'fecha_insert', 'fecha_actualizacion', 'busqueda',
+}
+
+
+def columnas_comparadas() -> List[str]:
+    """Columnas de stock cuya diferencia marca un vehículo como actualizado"""
+    return [
+        campo.column for campo in Stock._meta.concrete_fields
+        if campo.column not in COLUMNAS_NO_COMPARADAS
+    ]
+
+
+def aplicar_incremental(objetos: Iterable[Stock], using: str = 'default') -> Dict[str, int]:
+    """
+    Aplica sobre stock el inventario entrante escribiendo solo las diferencias.
+
+    Args:
+        objetos: Instancias de Stock (sin guardar) con el inventario completo entrante
+        using: Alias de la base de datos
+
+    Returns:
+        Diccionario con los contadores insertados, actualizados, sin_cambios y eliminados
+    """
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    tabla = qn(Stock._meta.db_table)
+    entrante = qn(TABLA_ENTRANTE)
+    pk = qn(Stock._meta.pk.column)
+
+    comparadas = columnas_comparadas()
+    todas = [campo.column for campo in Stock._meta.concrete_fields]
+    fila_actual = ', '.join(f's.{qn(c)}' for c in comparadas)
+    fila_entrante = ', '.join(f'e.{qn(c)}' for c in comparadas)
+    asignaciones = ', '.join(
+        f'{qn(c)} = e.{qn(c)}'
+        for c in todas if c not in (Stock._meta.pk.column, 'fecha_insert', 'fecha_actualizacion')
+    )
+    columnas = ', '.join(qn(c) for c in todas)
+
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {entrante}')
+        cursor.execute(f'CREATE TEMP TABLE {entrante} (LIKE {tabla} INCLUDING DEFAULTS)')
+        cursor.execute(f'ALTER TABLE {entrante} ADD PRIMARY KEY ({pk})')
+        total = insertar_en_tabla(TABLA_ENTRANTE, objetos, using=using)
+        cursor.execute(f'ANALYZE {entrante}')
+
+        cursor.execute(
+            f'DELETE FROM {tabla} s '
+            f'WHERE NOT EXISTS (SELECT 1 FROM {entrante} e WHERE e.{pk} = s.{pk})'
+        )
+        eliminados = cursor.rowcount
+
+        cursor.execute(
+            f'UPDATE {tabla} s SET {asignaciones}, {qn("fecha_actualizacion")} = NOW() '
+            f'FROM {entrante} e '
+            f'WHERE e.{pk} = s.{pk} AND ({fila_actual}) IS DISTINCT FROM ({fila_entrante})'
+        )
+        actualizados = cursor.rowcount
+
+        cursor.execute(
+            f'INSERT INTO {tabla} ({columnas}) '
+            f'SELECT {columnas} FROM {entrante} e '
+            f'WHERE NOT EXISTS (SELECT 1 FROM {tabla} s WHERE s.{pk} = e.{pk})'
+        )
+        insertados = cursor.rowcount
+
+        cursor.execute(f'DROP TABLE {entrante}')
+
+    resultado = {
+        'insertados': insertados,
+        'actualizados': actualizados,
+        'sin_cambios': total - insertados - actualizados,
+        'eliminados': eliminados,
+    }
+    logger.info(f"Carga incremental de stock: {resultado}")
+    return resultado
@@ -0,0 +1,81 @@
+"""
+Comando Django para comparar el rendimiento de los extractores de HTML
+sobre páginas de listado grabadas
+"""
+import json
+import os
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.stock.extractores import EXTRACTORES, extraer_paginas
+
+DIRECTORIO_FIXTURES = Path(__file__).resolve().parents[2] / 'fixtures' / 'html'
+
+
+class Command(BaseCommand):
+    help = 'Mide las páginas por segundo de cada extractor de HTML sobre listados grabados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fixtures',
+            default=str(DIRECTORIO_FIXTURES),
+            help='Directorio con los ficheros .html grabados (default: apps/stock/fixtures/html)'
+        )
+        parser.add_argument(
+            '--paginas',
+            type=int,
+            default=200,
+            help='Páginas a procesar en cada medición, repitiendo los ficheros (default: 200)'
+        )
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Procesos para las mediciones en paralelo (default: número de CPUs)'
+        )
+        parser.add_argument(
+            '--salida',
+            help='Fichero JSON donde guardar los resultados'
+        )
+
+    def handle(self, *args, **options):
+        ficheros = sorted(Path(options['fixtures']).glob('*.html'))
+        if not ficheros:
+            raise CommandError(f"No hay ficheros .html en {options['fixtures']}")
+
+        grabadas = [fichero.read_bytes() for fichero in ficheros]
+        paginas = [grabadas[i % len(grabadas)] for i in range(options['paginas'])]
+        procesos = max(1, options['procesos'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'⏱️  Benchmark de extractores: {len(paginas)} páginas '
+                f'({len(ficheros)} ficheros grabados), hasta {procesos} procesos'
+            )
+        )
+
+        resultados = []
+        for extractor in EXTRACTORES:
+            for num_procesos in sorted({1, procesos}):
+                inicio = time.perf_counter()
+                extraidas = extraer_paginas(paginas, extractor=extractor, procesos=num_procesos)
+                segundos = time.perf_counter() - inicio
+                resultado = {
+                    'extractor': extractor,
+                    'procesos': num_procesos,
+                    'paginas': len(paginas),
+                    'vehiculos': sum(len(vehiculos) for vehiculos in extraidas),
+                    'segundos': round(segundos, 4),
+                    'paginas_por_segundo': round(len(paginas) / segundos, 1),
+                }
+                resultados.append(resultado)
+                self.stdout.write(
+                    f'   · {extractor:<5} x{num_procesos:<3} {resultado["paginas_por_segundo"]:>9} páginas/s '
+                    f'({resultado["vehiculos"]} vehículos en {resultado["segundos"]}s)'
+                )
+
+        if options.get('salida'):
+            Path(options['salida']).write_text(json.dumps(resultados, indent=2), encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f"✅ Resultados guardados en {options['salida']}"))
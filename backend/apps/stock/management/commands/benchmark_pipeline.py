@@ -0,0 +1,203 @@
+"""
+Comando Django para medir cada paso de migrate_stock_and_scrape con
+inventarios de distintos tamaños contra la base de datos local
+"""
+import gc
+import json
+import math
+import os
+import platform
+import subprocess
+from io import StringIO
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.stock.benchmark import UMBRAL_REGRESION, comparar, medir
+from apps.stock.busqueda import actualizar_vector_busqueda
+from apps.stock.generador_masivo import columnas_stock, copiar_a_tabla, generar_lote
+from apps.stock.management.commands.benchmark_extractores import DIRECTORIO_FIXTURES
+from apps.stock.management.commands.migrate_stock_and_scrape import Command as MigrateStockCommand
+from apps.stock.models import CargaStock, Stock, StockHistorico
+from apps.stock.particiones import asegurar_particiones_para_stock
+from apps.stock.scrapers import _procesar_paginas
+
+# Vehículos por bloque al preparar el inventario inicial
+LOTE_PREPARACION = 20_000
+
+
+class Command(BaseCommand):
+    help = ('Mide filas/s, pico de RSS y consultas de cada PASO del pipeline nocturno '
+            '(archivo, adquisición, limpieza, inserción). Vacía Stock y StockHistorico.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamanos',
+            default='10000,100000,1000000',
+            help='Tamaños de inventario separados por comas (default: 10000,100000,1000000)'
+        )
+        parser.add_argument(
+            '--salida',
+            default='benchmark_pipeline.json',
+            help='Fichero JSON de resultados (default: benchmark_pipeline.json)'
+        )
+        parser.add_argument(
+            '--comparar',
+            help='JSON de una ejecución anterior con el que comparar filas/s'
+        )
+        parser.add_argument(
+            '--umbral',
+            type=float,
+            default=UMBRAL_REGRESION,
+            help=f'Caída relativa de filas/s que se marca como regresión (default: {UMBRAL_REGRESION})'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Semilla del inventario inicial (default: 42)'
+        )
+        parser.add_argument(
+            '--confirmar',
+            action='store_true',
+            help='Obligatorio: confirma que se pueden vaciar Stock y StockHistorico de esta base de datos'
+        )
+
+    def handle(self, *args, **options):
+        if not options.get('confirmar'):
+            raise CommandError('El benchmark vacía Stock y StockHistorico; ejecútalo con --confirmar '
+                               'solo contra una base de datos local')
+        try:
+            tamanos = [int(tamano) for tamano in options['tamanos'].split(',')]
+        except ValueError:
+            raise CommandError('--tamanos debe ser una lista de enteros separados por comas')
+
+        paginas_grabadas = [fichero.read_bytes() for fichero in sorted(DIRECTORIO_FIXTURES.glob('*.html'))]
+        resultados = []
+
+        for tamano in tamanos:
+            self.stdout.write(self.style.SUCCESS(f'\n📏 Inventario de {tamano} vehículos'))
+            for resultado in self._medir_pipeline(tamano, paginas_grabadas, options['seed']):
+                resultado['tamano'] = tamano
+                resultados.append(resultado)
+                self.stdout.write(
+                    f'   ⏱️  {resultado["paso"]:<12} {resultado["filas_por_segundo"]:>12,.0f} filas/s  '
+                    f'{resultado["segundos"]:>9.2f}s  RSS {resultado["pico_rss_mb"]:>8.1f} MB  '
+                    f'{resultado["consultas"]:>6} consultas'
+                )
+
+        informe = {'metadatos': self._metadatos(), 'resultados': resultados}
+        Path(options['salida']).write_text(json.dumps(informe, indent=2), encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Resultados guardados en {options["salida"]}'))
+
+        if options.get('comparar'):
+            self._comparar(resultados, options['comparar'], options['umbral'])
+
+    def _preparar_stock(self, tamano, seed):
+        """Vacía las tablas y carga un inventario sintético con COPY (no se mide)"""
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'TRUNCATE {qn(Stock._meta.db_table)}, {qn(StockHistorico._meta.db_table)}'
+            )
+        rng = np.random.default_rng(seed)
+        for desde in range(0, tamano, LOTE_PREPARACION):
+            n = min(LOTE_PREPARACION, tamano - desde)
+            copiar_a_tabla(Stock._meta.db_table, generar_lote(n, rng, inicio=desde), columnas_stock())
+        asegurar_particiones_para_stock()
+
+    def _medir_pipeline(self, tamano, paginas_grabadas, seed):
+        """
+        Ejecuta los cuatro pasos del pipeline en el orden del comando real,
+        midiendo cada uno por separado: archivo, adquisición (con el punto de
+        control en VehiculoAdquirido), limpieza e inserción
+        """
+        self._preparar_stock(tamano, seed)
+        comando = MigrateStockCommand(stdout=StringIO(), stderr=StringIO())
+        carga = CargaStock.objects.create(modo=CargaStock.MODO_REEMPLAZO, fecha_snapshot=timezone.localdate())
+        mediciones = []
+
+        try:
+            gc.collect()
+            with medir('archivo') as resultado:
+                with transaction.atomic():
+                    resultado['filas'] = comando._migrar_stock_a_historico(modo='snapshot')
+                    comando._confirmar_paso(carga, CargaStock.PASO_ARCHIVO)
+            mediciones.append(resultado)
+
+            # Adquisición sin red: se procesan listados grabados hasta reunir el tamaño pedido
+            paginas = math.ceil(tamano / 30)
+            gc.collect()
+            with medir('adquisicion') as resultado:
+                contenidos = [paginas_grabadas[i % len(paginas_grabadas)] for i in range(paginas)]
+                por_pagina = _procesar_paginas(contenidos, list(range(1, paginas + 1)))
+                vehiculos = [vehiculo for pagina in por_pagina for vehiculo in pagina][:tamano]
+                with transaction.atomic():
+                    comando._guardar_vehiculos_adquiridos(carga, vehiculos)
+                    comando._confirmar_paso(carga, CargaStock.PASO_ADQUISICION)
+                resultado['filas'] = len(vehiculos)
+            mediciones.append(resultado)
+
+            # Limpieza e inserción comparten transacción, como en el modo de reemplazo
+            with transaction.atomic():
+                gc.collect()
+                with medir('limpieza') as resultado:
+                    resultado['filas'] = comando._limpiar_stock()
+                mediciones.append(resultado)
+
+                gc.collect()
+                with medir('insercion') as resultado:
+                    contadores = comando._insertar_nuevos_vehiculos(vehiculos, tamano)
+                    actualizar_vector_busqueda()
+                    carga.vehiculos_adquiridos.all().delete()
+                    comando._confirmar_paso(carga, CargaStock.PASO_PUBLICACION)
+                    resultado['filas'] = contadores['insertados']
+                mediciones.append(resultado)
+        finally:
+            carga.delete()
+
+        return mediciones
+
+    def _metadatos(self):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                cwd=Path(__file__).resolve().parent,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW server_version')
+            version_postgres = cursor.fetchone()[0]
+
+        return {
+            'commit': commit,
+            'fecha': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'postgres': version_postgres,
+            'cpus': os.cpu_count(),
+        }
+
+    def _comparar(self, resultados, fichero, umbral):
+        try:
+            anteriores = json.loads(Path(fichero).read_text(encoding='utf-8'))['resultados']
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f'No se pudo leer {fichero}: {str(e)}')
+
+        self.stdout.write(self.style.SUCCESS(f'\n📊 Comparación con {fichero}'))
+        regresiones = 0
+        for fila in comparar(resultados, anteriores, umbral):
+            linea = (f'   {fila["tamano"]:>9} {fila["paso"]:<12} {fila["antes"]:>12,.0f} → '
+                     f'{fila["ahora"]:>12,.0f} filas/s ({fila["variacion"]:+.0%})')
+            if fila['regresion']:
+                regresiones += 1
+                self.stdout.write(self.style.ERROR(f'{linea} ⚠️  regresión'))
+            else:
+                self.stdout.write(linea)
+
+        if regresiones:
+            self.stdout.write(self.style.WARNING(f'⚠️  {regresiones} pasos por debajo del umbral ({umbral:.0%})'))
@@ -2,7 +2,10 @@
 Comando Django para generar datos de provincias españolas sin IA
 """
 from django.core.management.base import BaseCommand
+from apps.stock.busqueda import actualizar_vector_busqueda
+from apps.stock.derivados import invalidar_derivados
 from apps.stock.models import Stock
+from apps.stock.perfilado import ComandoPerfilable
 from apps.stock.scrapers import generar_datos_faltantes
 
 PROVINCIAS_ESPAÑA = [
@@ -58,7 +61,7 @@ PROVINCIAS_ESPAÑA = [
 ]
 
 
-class Command(BaseCommand):
+class Command(ComandoPerfilable, BaseCommand):
     help = 'Genera datos de provincias españolas en la tabla de Stock'
 
     def add_arguments(self, parser):
@@ -90,14 +93,18 @@ class Command(BaseCommand):
             self.stdout.write(
                 self.style.WARNING('\n🗑️  Limpiando datos anteriores...')
             )
-            Stock.objects.all().delete()
+            with self.perfil.paso('limpieza') as medicion:
+                medicion['filas'], _ = Stock.objects.all().delete()
             self.stdout.write(
                 self.style.SUCCESS('✅ Datos limpiados')
             )
 
         # Generar datos de provincias
         vehiculos_por_provincia = options.get('vehiculos_por_provincia', 2)
-        self._generar_provincias(vehiculos_por_provincia)
+        with self.perfil.paso('generacion') as medicion:
+            medicion['filas'] = self._generar_provincias(vehiculos_por_provincia)
+        actualizar_vector_busqueda()
+        invalidar_derivados()
 
         self.stdout.write(
             self.style.SUCCESS('\n✅ Generación completada')
@@ -116,11 +123,12 @@ class Command(BaseCommand):
         for provincia in PROVINCIAS_ESPAÑA:
             try:
                 # Generar N vehículos por provincia usando datos aleatorios
+                vehiculos = []
                 for i in range(vehiculos_por_provincia):
                     datos_vehiculo = generar_datos_faltantes()
 
-                    Stock.objects.create(
-                        bastidor=datos_vehiculo.get('bastidor', f"{provincia.upper()[:3]}-{contador:05d}"),
+                    vehiculos.append(Stock(
+                        bastidor=datos_vehiculo.get('bastidor', f"{provincia.upper()[:3]}-{contador + i:05d}"),
                         marca=datos_vehiculo.get('marca', 'Desconocida'),
                         modelo=datos_vehiculo.get('modelo', 'Desconocido'),
                         provincia=provincia,
@@ -131,8 +139,11 @@ class Command(BaseCommand):
                         kilometros=datos_vehiculo.get('kilometros', 50000),
                         precio_venta=datos_vehiculo.get('precio_venta', 15000),
                         matricula=datos_vehiculo.get('matricula', ''),
-                    )
-                    contador += 1
+                    ))
+
+                # Una sola inserción por provincia
+                Stock.objects.bulk_create(vehiculos)
+                contador += len(vehiculos)
 
                 self.stdout.write(
                     f'✔️  {provincia}: {vehiculos_por_provincia} vehículos creados'
@@ -146,3 +157,4 @@ class Command(BaseCommand):
         self.stdout.write(
             self.style.SUCCESS(f'\n✅ {contador} vehículos generados en total')
         )
+        return contador
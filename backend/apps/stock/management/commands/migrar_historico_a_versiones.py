@@ -0,0 +1,93 @@
+"""
+Comando Django que construye StockVersion (SCD tipo 2) a partir de los
+snapshots diarios de StockHistorico.
+
+Recorre las fechas del histórico en orden y registra cada día como si fuera
+el archivo nocturno en modo versiones, cada una en su propia transacción.
+Si se interrumpe, al relanzarlo continúa tras la última fecha registrada.
+StockHistorico no se modifica: cuando las versiones estén verificadas se
+puede purgar con purgar_historico.
+"""
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.stock.models import StockHistorico, StockVersion
+from apps.stock.versiones import origen_historico, registrar_versiones, ultima_fecha_registrada
+
+
+class Command(BaseCommand):
+    help = 'Construye el histórico por versiones (StockVersion) a partir de los snapshots de StockHistorico'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--desde',
+            type=date.fromisoformat,
+            help='Primera fecha de snapshot a migrar (AAAA-MM-DD; por defecto la siguiente a la última registrada)'
+        )
+        parser.add_argument(
+            '--hasta',
+            type=date.fromisoformat,
+            help='Última fecha de snapshot a migrar (AAAA-MM-DD; por defecto la más reciente)'
+        )
+
+    def handle(self, *args, **options):
+        ultima = ultima_fecha_registrada()
+        desde = options.get('desde')
+        hasta = options.get('hasta')
+        if desde and ultima and desde <= ultima:
+            raise CommandError(f'Ya hay versiones registradas hasta {ultima}; usa una fecha posterior')
+
+        fechas = StockHistorico.objects.order_by('fecha_snapshot').values_list('fecha_snapshot', flat=True).distinct()
+        if desde or ultima:
+            fechas = fechas.filter(fecha_snapshot__gte=desde) if desde else fechas.filter(fecha_snapshot__gt=ultima)
+        if hasta:
+            fechas = fechas.filter(fecha_snapshot__lte=hasta)
+        fechas = list(fechas)
+
+        if not fechas:
+            self.stdout.write(self.style.WARNING('ℹ️  No hay fechas de StockHistorico pendientes de migrar'))
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(f'🗂️  Migrando {len(fechas)} días de StockHistorico ({fechas[0]} a {fechas[-1]})')
+        )
+
+        inicio = time.perf_counter()
+        abiertas = cerradas = 0
+        for numero, fecha in enumerate(fechas, start=1):
+            versiones = registrar_versiones(fecha, origen_historico(), [fecha])
+            abiertas += versiones['abiertas']
+            cerradas += versiones['cerradas']
+            self.stdout.write(
+                f'   · {fecha}: {versiones["abiertas"]} abiertas, {versiones["cerradas"]} cerradas '
+                f'({numero}/{len(fechas)}, {time.perf_counter() - inicio:.1f}s)'
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ {abiertas} versiones abiertas y {cerradas} cerradas')
+        )
+        self._comparar_tamanos()
+
+    def _comparar_tamanos(self):
+        """Muestra filas y tamaño en disco de ambos históricos"""
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            for modelo in (StockHistorico, StockVersion):
+                tabla = modelo._meta.db_table
+                # El histórico está particionado: su tamaño es la suma de las particiones
+                cursor.execute(
+                    """
+                    SELECT COALESCE(SUM(pg_total_relation_size(c.oid)), 0)
+                    FROM pg_class c
+                    WHERE c.oid = %s::regclass
+                       OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)
+                    """,
+                    [tabla, tabla],
+                )
+                tamano = cursor.fetchone()[0]
+                cursor.execute(f'SELECT COUNT(*) FROM {qn(tabla)}')
+                filas = cursor.fetchone()[0]
+                self.stdout.write(f'   {tabla}: {filas} filas, {tamano / 1024 / 1024:.1f} MB')
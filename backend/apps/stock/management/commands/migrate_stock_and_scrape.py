@@ -3,20 +3,39 @@ Comando Django para migrar stock a histórico y actualizar con nuevos datos de c
 Ejecuta a las 1:00 AM todos los días
 """
 import logging
+import time
+from contextlib import nullcontext
 from datetime import datetime, timedelta
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from django.db.models import Exists, Max, OuterRef, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
-from apps.stock.models import Stock, StockHistorico
+from apps.stock.bloqueos import CLAVE_MIGRACION_STOCK, bloqueo_exclusivo
+from apps.stock.busqueda import actualizar_vector_busqueda
+from apps.stock.cache_http import CacheHTTP
+from apps.stock.dag import ESTADO_OK, ejecutar_dag
+from apps.stock.derivados import cache_compartida, etapas_post_carga, invalidar_derivados
+from apps.stock.incremental import aplicar_incremental
+from apps.stock.models import CargaStock, Stock, StockHistorico, VehiculoAdquirido
+from apps.stock.particiones import asegurar_particiones_para_stock
+from apps.stock.perfilado import ComandoPerfilable
 from apps.stock.scrapers import scrape_coches_net, crear_registro_stock
-from apps.stock.ai_vehicle_generator import generar_vehiculos_con_ia
+from apps.stock.snapshot import snapshot_stock_a_historico
+from apps.stock.staging import (
+    TABLA_STAGING, crear_indices_staging, crear_tabla_staging, descartar_staging,
+    insertar_en_staging, publicar_staging,
+)
+from apps.stock.versiones import registrar_versiones
+from apps.stock.ai_vehicle_generator import generar_vehiculos_con_ia, generar_vehiculos_con_ia_en_streaming
 
 logger = logging.getLogger(__name__)
 
 
-class Command(BaseCommand):
+class Command(ComandoPerfilable, BaseCommand):
     help = 'Migra datos de stock a histórico y actualiza stock con nuevos vehículos de coches.net'
 
     def add_arguments(self, parser):
@@ -37,19 +56,85 @@ class Command(BaseCommand):
             action='store_true',
             help='Usar IA para generar datos de vehículos más realistas (requiere configuración OpenRouter)'
         )
+        parser.add_argument(
+            '--streaming',
+            action='store_true',
+            help='Con --usar-ia, recibe las respuestas del modelo en streaming y guarda cada vehículo '
+                 'en cuanto se completa (si la carga falla, el reintento solo genera los que faltan)'
+        )
+        parser.add_argument(
+            '--modo-historico',
+            choices=['snapshot', 'objetos', 'versiones'],
+            default='snapshot',
+            help='Cómo archivar Stock en StockHistorico: "snapshot" copia en la BD con INSERT ... SELECT, '
+                 '"objetos" crea instancias del modelo y usa bulk_create, "versiones" escribe solo los '
+                 'vehículos que cambian en StockVersion (SCD tipo 2) (default: snapshot)'
+        )
+        parser.add_argument(
+            '--modo-refresco',
+            choices=[modo for modo, _ in CargaStock.MODOS],
+            default=CargaStock.MODO_REEMPLAZO,
+            help='Cómo publicar el nuevo stock: "reemplazo" vacía y recarga stock en una transacción, '
+                 '"swap" lo construye en una tabla staging y la intercambia atómicamente, '
+                 '"incremental" escribe solo los vehículos que cambian por bastidor (default: reemplazo)'
+        )
+        parser.add_argument(
+            '--sin-cache',
+            action='store_true',
+            help='Descarga y procesa todas las páginas sin usar la caché HTTP del scraping'
+        )
+        parser.add_argument(
+            '--resume', '--reanudar',
+            dest='reanudar',
+            type=int,
+            metavar='RUN_ID',
+            help='Reanuda la ejecución indicada desde su último paso completado, con sus opciones originales'
+        )
+        parser.add_argument(
+            '--desde-cero',
+            action='store_true',
+            help='Empieza una ejecución nueva aunque la última de hoy no terminara (por defecto se reanuda)'
+        )
+        parser.add_argument(
+            '--sin-derivados',
+            action='store_true',
+            help='No precalcula los derivados del stock (resúmenes, estadísticas, contexto del chat) al terminar'
+        )
         parser.add_argument(
             '--debug',
             action='store_true',
             help='Habilita modo debug'
         )
 
-    @transaction.atomic
     def handle(self, *args, **options):
-        """Ejecuta la migración de stock"""
+        """Ejecuta la migración de stock si no hay otra en curso en el clúster"""
+        with bloqueo_exclusivo(CLAVE_MIGRACION_STOCK) as adquirido:
+            if not adquirido:
+                self.stdout.write(
+                    self.style.WARNING('⏭️  Ya hay una migración de Stock en curso; se omite esta ejecución')
+                )
+                logger.warning("Migración de stock omitida: otra ejecución tiene el bloqueo")
+                return
+            self._migrar(**options)
+
+    def _migrar(self, **options):
+        """
+        Ejecuta la migración de stock por pasos con puntos de control.
+
+        Cada paso confirma su resultado junto con el avance de la carga, así
+        que si uno falla el reintento continúa desde el último paso confirmado.
+        La limpieza y la inserción se confirman juntas para que Stock nunca
+        quede vacío, por eso la adquisición se hace antes de la limpieza.
+        """
         debug = options.get('debug', False)
-        paginas = options.get('paginas', 5)
-        cantidad = options.get('cantidad', 50)
-        usar_ia = options.get('usar_ia', False)
+        carga = self._obtener_carga(options)
+        opciones = carga.opciones
+        paginas = opciones['paginas']
+        cantidad = opciones['cantidad']
+        usar_ia = opciones['usar_ia']
+        modo_refresco = carga.modo
+        swap = modo_refresco == CargaStock.MODO_SWAP
+        incremental = modo_refresco == CargaStock.MODO_INCREMENTAL
 
         self.stdout.write(
             self.style.SUCCESS('=' * 60)
@@ -57,6 +142,16 @@ class Command(BaseCommand):
         self.stdout.write(
             self.style.SUCCESS(f'Iniciando migración de Stock - {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}')
         )
+        if carga.paso_completado > CargaStock.PASO_NINGUNO:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'♻️  Reanudando la ejecución {carga.pk} tras: {carga.get_paso_completado_display()}'
+                )
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f'🆔 Ejecución {carga.pk} (reanudable con --resume {carga.pk})')
+            )
         if usar_ia:
             self.stdout.write(
                 self.style.SUCCESS('🤖 Modo: Generación con IA (datos realistas)')
@@ -65,40 +160,131 @@ class Command(BaseCommand):
             self.stdout.write(
                 self.style.SUCCESS('📊 Modo: Scraping tradicional')
             )
-        self.stdout.write(
-            self.style.SUCCESS('=' * 60)
-        )
-
-        try:
-            # Paso 1: Migrar datos actuales de Stock a StockHistorico
+        if swap:
             self.stdout.write(
-                self.style.WARNING('\n📋 PASO 1: Migrando datos de Stock a StockHistorico...')
+                self.style.SUCCESS('🔀 Refresco: tabla staging + intercambio atómico')
             )
-            self._migrar_stock_a_historico(debug)
-
-            # Paso 2: Limpiar tabla de Stock
+        elif incremental:
             self.stdout.write(
-                self.style.WARNING('\n🧹 PASO 2: Limpiando tabla de Stock...')
+                self.style.SUCCESS('♻️  Refresco: incremental por bastidor')
             )
-            self._limpiar_stock(debug)
+        self.stdout.write(
+            self.style.SUCCESS('=' * 60)
+        )
 
-            # Paso 3: Scrapeiar nuevos datos de coches.net o generar con IA
-            if usar_ia:
+        try:
+            # Paso 1: Migrar datos actuales de Stock a StockHistorico (Stock no cambia)
+            if carga.paso_completado < CargaStock.PASO_ARCHIVO:
                 self.stdout.write(
-                    self.style.WARNING('\n🤖 PASO 3: Generando vehículos con IA...')
+                    self.style.WARNING('\n📋 PASO 1: Migrando datos de Stock a StockHistorico...')
                 )
-                vehiculos_scrapeados = self._generar_vehiculos_ia(cantidad, debug)
+                with self.perfil.paso('archivo') as medicion:
+                    inicio = time.perf_counter()
+                    with transaction.atomic():
+                        particiones = asegurar_particiones_para_stock()
+                        if particiones:
+                            self.stdout.write(f'🗂️  {particiones} particiones nuevas en StockHistorico')
+                        archivados = self._migrar_stock_a_historico(
+                            debug, modo=opciones['modo_historico'], fecha_snapshot=self._fecha_snapshot_stock_actual()
+                        )
+                        self._confirmar_paso(carga, CargaStock.PASO_ARCHIVO)
+                    medicion['filas'] = archivados
+                self._reportar_paso(1, inicio, archivados)
+            else:
+                self.stdout.write('⏭️  PASO 1: Stock ya archivado en esta ejecución')
+
+            # Paso 2: Scrapeiar nuevos datos de coches.net o generar con IA
+            if carga.paso_completado < CargaStock.PASO_ADQUISICION:
+                with self.perfil.paso('adquisicion') as medicion:
+                    inicio = time.perf_counter()
+                    if usar_ia and opciones.get('streaming', False):
+                        self.stdout.write(
+                            self.style.WARNING('\n🤖 PASO 2: Generando vehículos con IA en streaming...')
+                        )
+                        vehiculos_scrapeados = self._generar_vehiculos_ia_streaming(carga, cantidad, debug)
+                    elif usar_ia:
+                        self.stdout.write(
+                            self.style.WARNING('\n🤖 PASO 2: Generando vehículos con IA...')
+                        )
+                        vehiculos_scrapeados = self._generar_vehiculos_ia(cantidad, debug)
+                    else:
+                        self.stdout.write(
+                            self.style.WARNING('\n🔍 PASO 2: Scrapeando nuevos vehículos de coches.net...')
+                        )
+                        vehiculos_scrapeados = self._scrapeiar_vehiculos(
+                            paginas, debug, usar_cache=not opciones['sin_cache']
+                        )
+                    with transaction.atomic():
+                        # En streaming los vehículos ya se han ido guardando según llegaban
+                        if not (usar_ia and opciones.get('streaming', False)):
+                            self._guardar_vehiculos_adquiridos(carga, vehiculos_scrapeados)
+                        self._confirmar_paso(carga, CargaStock.PASO_ADQUISICION)
+                    medicion['filas'] = len(vehiculos_scrapeados)
+                self._reportar_paso(2, inicio, len(vehiculos_scrapeados))
             else:
+                vehiculos_scrapeados = self._cargar_vehiculos_adquiridos(carga)
                 self.stdout.write(
-                    self.style.WARNING('\n🔍 PASO 3: Scrapeando nuevos vehículos de coches.net...')
+                    f'⏭️  PASO 2: {len(vehiculos_scrapeados)} vehículos ya adquiridos en esta ejecución'
                 )
-                vehiculos_scrapeados = self._scrapeiar_vehiculos(paginas, debug)
 
-            # Paso 4: Insertar nuevos datos en Stock
-            self.stdout.write(
-                self.style.WARNING('\n➕ PASO 4: Insertando nuevos vehículos en Stock...')
-            )
-            self._insertar_nuevos_vehiculos(vehiculos_scrapeados, cantidad, debug)
+            # Pasos 3 y 4: Limpiar Stock e insertar los nuevos vehículos. En modo
+            # swap los lectores siguen usando stock mientras se construye la tabla
+            # staging, así que no se envuelven en una única transacción
+            with nullcontext() if swap else transaction.atomic():
+                with self.perfil.paso('limpieza') as medicion:
+                    inicio = time.perf_counter()
+                    if swap:
+                        self.stdout.write(
+                            self.style.WARNING('\n🧹 PASO 3: Preparando tabla staging...')
+                        )
+                        crear_tabla_staging()
+                        self._reportar_paso(3, inicio, 0)
+                    elif incremental:
+                        self.stdout.write(
+                            self.style.WARNING('\n🧹 PASO 3: Modo incremental, Stock no se vacía')
+                        )
+                        self._reportar_paso(3, inicio, 0)
+                    else:
+                        self.stdout.write(
+                            self.style.WARNING('\n🧹 PASO 3: Limpiando tabla de Stock...')
+                        )
+                        carga.eliminados = medicion['filas'] = self._limpiar_stock(debug)
+                        self._reportar_paso(3, inicio, carga.eliminados)
+
+                with self.perfil.paso('insercion') as medicion:
+                    self.stdout.write(
+                        self.style.WARNING('\n➕ PASO 4: Insertando nuevos vehículos en Stock...')
+                    )
+                    inicio = time.perf_counter()
+                    contadores = self._insertar_nuevos_vehiculos(
+                        vehiculos_scrapeados, cantidad, debug, modo_refresco=modo_refresco
+                    )
+                    # Vector de búsqueda en bloque; en swap antes de construir los índices de la staging
+                    vectores = actualizar_vector_busqueda(TABLA_STAGING if swap else None)
+                    self.stdout.write(f'🔎 Vector de búsqueda recalculado en {vectores} vehículos')
+                    if swap:
+                        crear_indices_staging()
+                        contadores['eliminados'] = publicar_staging()
+                        self.stdout.write(
+                            self.style.SUCCESS('✅ Tabla staging publicada como Stock')
+                        )
+                    self._reportar_paso(4, inicio, contadores['insertados'] + contadores['actualizados'])
+                    medicion['filas'] = contadores['insertados'] + contadores['actualizados']
+
+                for campo, valor in contadores.items():
+                    setattr(carga, campo, valor)
+                carga.estado = CargaStock.ESTADO_COMPLETADA
+                carga.error = ''
+                carga.fecha_fin = timezone.now()
+                carga.vehiculos_adquiridos.all().delete()
+                self._confirmar_paso(carga, CargaStock.PASO_PUBLICACION)
+                self.stdout.write(
+                    f'📈 Insertados: {carga.insertados} | Actualizados: {carga.actualizados} | '
+                    f'Sin cambios: {carga.sin_cambios} | Eliminados: {carga.eliminados}'
+                )
+
+            with self.perfil.paso('derivados') as medicion:
+                medicion['filas'] = self._recalcular_derivados(options.get('sin_derivados', False))
 
             self.stdout.write(
                 self.style.SUCCESS('\n✅ Migración completada exitosamente')
@@ -111,20 +297,198 @@ class Command(BaseCommand):
             self.stdout.write(
                 self.style.ERROR(f'\n❌ Error durante la migración: {str(e)}')
             )
-            logger.error(f"Error en migración de stock: {str(e)}", exc_info=True)
+            self.stdout.write(
+                self.style.WARNING(
+                    f'♻️  Reanudable desde "{carga.get_paso_completado_display()}" con --resume {carga.pk}'
+                )
+            )
+            logger.error(f"Error en migración de stock (ejecución {carga.pk}): {str(e)}", exc_info=True)
+            if swap:
+                descartar_staging()
+            CargaStock.objects.filter(pk=carga.pk).update(estado=CargaStock.ESTADO_FALLIDA, error=str(e))
             raise
 
-    def _migrar_stock_a_historico(self, debug=False):
-        """Migra todos los registros de Stock a StockHistorico"""
+    def _recalcular_derivados(self, omitir=False):
+        """
+        PASO 5: invalida los derivados del stock anterior y los precalcula en
+        paralelo. Un fallo aquí no revierte la carga: la etapa afectada se
+        calculará al vuelo en la primera petición que la necesite.
+
+        Returns:
+            Número de etapas completadas
+        """
+        inicio = time.perf_counter()
         try:
-            stock_actual = Stock.objects.all()
+            invalidar_derivados()
+            if omitir:
+                self.stdout.write('⏭️  PASO 5: Derivados omitidos; se calcularán en la primera petición')
+                return 0
+
+            self.stdout.write(
+                self.style.WARNING('\n🧮 PASO 5: Precalculando derivados del stock...')
+            )
+            if not cache_compartida():
+                self.stdout.write(
+                    self.style.WARNING('⚠️  La caché no es compartida (configura REDIS_URL): '
+                                       'el servidor web no verá los derivados')
+                )
+            resultados = ejecutar_dag(etapas_post_carga(), procesos=settings.STOCK_DERIVADOS_PROCESOS)
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'❌ No se pudieron precalcular los derivados: {str(e)}'))
+            logger.error(f"Error precalculando derivados de stock: {str(e)}", exc_info=True)
+            return 0
+
+        completadas = 0
+        for nombre, resultado in resultados.items():
+            if resultado['estado'] == ESTADO_OK:
+                completadas += 1
+                self.stdout.write(f"   ✓ {nombre} ({resultado['segundos']:.2f}s)")
+            else:
+                self.stdout.write(
+                    self.style.ERROR(f"   ✗ {nombre}: {resultado['estado']}")
+                )
+        self._reportar_paso(5, inicio, completadas)
+        return completadas
+
+    def _obtener_carga(self, options):
+        """
+        Devuelve la carga a ejecutar: la indicada con --resume, la última
+        de hoy que no terminó (salvo --desde-cero) o una nueva.
+
+        Al reanudar se usan las opciones con las que se lanzó la carga, para
+        que los pasos pendientes sean coherentes con los ya confirmados.
+        """
+        reanudar = options.get('reanudar')
+        if reanudar is not None:
+            try:
+                carga = CargaStock.objects.get(pk=reanudar)
+            except CargaStock.DoesNotExist:
+                raise CommandError(f'No existe la ejecución {reanudar}')
+            if carga.estado == CargaStock.ESTADO_COMPLETADA:
+                raise CommandError(f'La ejecución {reanudar} ya se completó')
+            return carga
+
+        if not options.get('desde_cero', False):
+            # Con el bloqueo de migración tomado, una carga "en curso" es de un proceso que murió
+            pendiente = CargaStock.objects.filter(
+                fecha_snapshot=datetime.now().date(),
+                estado__in=[CargaStock.ESTADO_EN_CURSO, CargaStock.ESTADO_FALLIDA],
+            ).first()
+            if pendiente:
+                return pendiente
+
+        return CargaStock.objects.create(
+            modo=options.get('modo_refresco', CargaStock.MODO_REEMPLAZO),
+            fecha_snapshot=datetime.now().date(),
+            opciones={
+                'paginas': options.get('paginas', 5),
+                'cantidad': options.get('cantidad', 50),
+                'usar_ia': options.get('usar_ia', False),
+                'modo_historico': options.get('modo_historico', 'snapshot'),
+                'sin_cache': options.get('sin_cache', False),
+                'streaming': options.get('streaming', False),
+            },
+        )
+
+    def _confirmar_paso(self, carga, paso):
+        """Guarda el avance de la carga (dentro de la transacción del paso)"""
+        carga.paso_completado = paso
+        carga.save()
+        logger.info(f"Ejecución {carga.pk} de migración de stock: {carga.get_paso_completado_display()}")
+
+    def _guardar_vehiculos_adquiridos(self, carga, vehiculos, lote=1000):
+        """Persiste los vehículos adquiridos como punto de control del paso 2"""
+        carga.vehiculos_adquiridos.all().delete()
+        for i in range(0, len(vehiculos), lote):
+            VehiculoAdquirido.objects.bulk_create([
+                VehiculoAdquirido(carga=carga, posicion=i + j, datos=vehiculo)
+                for j, vehiculo in enumerate(vehiculos[i:i + lote])
+            ])
+
+    def _cargar_vehiculos_adquiridos(self, carga):
+        """Recupera los vehículos adquiridos de una carga en su orden original"""
+        return list(
+            carga.vehiculos_adquiridos.order_by('posicion').values_list('datos', flat=True).iterator(chunk_size=2000)
+        )
+
+    def _reportar_paso(self, numero, inicio, filas):
+        """Muestra las filas procesadas y el tiempo transcurrido en un paso"""
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(
+            f'⏱️  PASO {numero}: {filas} filas en {duracion:.2f}s'
+        )
+        logger.info(f"PASO {numero} de migración de stock: {filas} filas en {duracion:.2f}s")
+
+    def _fecha_snapshot_stock_actual(self):
+        """
+        Fecha de snapshot con la que archivar el Stock actual.
+
+        Tras una carga incremental los vehículos sin cambios conservan la
+        fecha_snapshot de la carga en que se escribieron, así que se usa la
+        fecha de esa última carga. En otro caso se copia la de cada fila (None).
+        """
+        ultima_carga = CargaStock.objects.filter(estado=CargaStock.ESTADO_COMPLETADA).first()
+        if ultima_carga and ultima_carga.modo == CargaStock.MODO_INCREMENTAL:
+            return ultima_carga.fecha_snapshot
+        return None
+
+    def _migrar_stock_a_historico(self, debug=False, modo='snapshot', fecha_snapshot=None):
+        """
+        Migra todos los registros de Stock a StockHistorico
+
+        Args:
+            modo: 'snapshot' copia las filas en la BD con INSERT ... SELECT;
+                  'objetos' crea instancias de StockHistorico y usa bulk_create;
+                  'versiones' registra en StockVersion solo los vehículos que cambian
+            fecha_snapshot: Fecha a guardar en todas las filas (None copia la de cada vehículo)
+
+        Returns:
+            Número de registros archivados
+        """
+        try:
+            if modo == 'versiones':
+                fecha = (
+                    fecha_snapshot
+                    or Stock.objects.aggregate(fecha=Max('fecha_snapshot'))['fecha']
+                    or timezone.localdate()
+                )
+                versiones = registrar_versiones(fecha)
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f'✅ Versiones a {fecha}: {versiones["abiertas"]} abiertas, '
+                        f'{versiones["cerradas"]} cerradas'
+                    )
+                )
+                return versiones['abiertas'] + versiones['cerradas']
+
+            if modo == 'snapshot':
+                archivados = snapshot_stock_a_historico(fecha_snapshot=fecha_snapshot)
+                if archivados == 0:
+                    self.stdout.write(
+                        self.style.WARNING('ℹ️  No hay registros en Stock pendientes de migrar')
+                    )
+                else:
+                    self.stdout.write(
+                        self.style.SUCCESS(f'✅ {archivados} registros migrados a histórico (snapshot)')
+                    )
+                return archivados
+
+            # Igual que en modo snapshot, no se duplican vehículos ya archivados con esa fecha
+            fecha_archivo = Value(fecha_snapshot) if fecha_snapshot else Coalesce(
+                'fecha_snapshot', Value(datetime.now().date())
+            )
+            stock_actual = Stock.objects.alias(fecha_archivo=fecha_archivo).exclude(
+                Exists(StockHistorico.objects.filter(
+                    bastidor=OuterRef('bastidor'), fecha_snapshot=OuterRef('fecha_archivo')
+                ))
+            )
             cantidad_registros = stock_actual.count()
 
             if cantidad_registros == 0:
                 self.stdout.write(
-                    self.style.WARNING('ℹ️  No hay registros en Stock para migrar')
+                    self.style.WARNING('ℹ️  No hay registros en Stock pendientes de migrar')
                 )
-                return
+                return 0
 
             self.stdout.write(
                 f'📊 Encontrados {cantidad_registros} registros en Stock'
@@ -164,6 +528,7 @@ class Command(BaseCommand):
                     ubicacion=stock.ubicacion,
                     id_tipo_vo=stock.id_tipo_vo,
                     descripcion_tipo_vo=stock.descripcion_tipo_vo,
+                    tipo_vehiculo=stock.tipo_vehiculo,
                     id_estado=stock.id_estado,
                     descripcion_estado=stock.descripcion_estado,
                     tipo_stock=stock.tipo_stock,
@@ -244,7 +609,7 @@ class Command(BaseCommand):
                     id_veces_pospuesto=stock.id_veces_pospuesto,
                     veces_pospuesto=stock.veces_pospuesto,
                     xxx=stock.xxx,
-                    fecha_snapshot=stock.fecha_snapshot,
+                    fecha_snapshot=fecha_snapshot or stock.fecha_snapshot or datetime.now().date(),
                     fecha_insert=timezone.now(),
                 )
                 registros_historicos.append(historico)
@@ -263,33 +628,44 @@ class Command(BaseCommand):
             self.stdout.write(
                 self.style.SUCCESS(f'✅ {cantidad_registros} registros migrados a histórico')
             )
+            return cantidad_registros
 
         except Exception as e:
             logger.error(f"Error migrando stock a histórico: {str(e)}", exc_info=True)
             raise
 
     def _limpiar_stock(self, debug=False):
-        """Limpia la tabla de Stock"""
+        """Limpia la tabla de Stock y devuelve el número de registros eliminados"""
         try:
             cantidad = Stock.objects.all().count()
             Stock.objects.all().delete()
             self.stdout.write(
                 self.style.SUCCESS(f'✅ {cantidad} registros eliminados de Stock')
             )
+            return cantidad
         except Exception as e:
             logger.error(f"Error limpiando stock: {str(e)}", exc_info=True)
             raise
 
-    def _scrapeiar_vehiculos(self, paginas, debug=False):
+    def _scrapeiar_vehiculos(self, paginas, debug=False, usar_cache=True):
         """Scrapeía vehículos de coches.net"""
         try:
             self.stdout.write(
                 f'🌐 Scrapeando {paginas} páginas de coches.net...'
             )
-            vehiculos = scrape_coches_net(paginas=paginas, retraso_segundos=1.5)
+            cache = CacheHTTP(settings.SCRAPER_CACHE_DIR) if usar_cache and settings.SCRAPER_CACHE_DIR else None
+            vehiculos = scrape_coches_net(paginas=paginas, cache=cache)
             self.stdout.write(
                 self.style.SUCCESS(f'✅ {len(vehiculos)} vehículos scrapeados')
             )
+            if cache:
+                estadisticas = cache.estadisticas()
+                self.stdout.write(
+                    f'🗄️  Caché HTTP: {estadisticas["ratio_aciertos"]:.0%} de aciertos '
+                    f'({estadisticas["aciertos_304"]} no modificadas, '
+                    f'{estadisticas["aciertos_hash"]} con el mismo contenido), '
+                    f'{estadisticas["bytes_ahorrados"]} bytes ahorrados'
+                )
             return vehiculos
         except Exception as e:
             logger.warning(f"Error scrapeando coches.net: {str(e)}")
@@ -319,8 +695,78 @@ class Command(BaseCommand):
             )
             return []
 
-    def _insertar_nuevos_vehiculos(self, vehiculos_scrapeados, cantidad, debug=False):
-        """Inserta nuevos vehículos en Stock"""
+    def _generar_vehiculos_ia_streaming(self, carga, cantidad, debug=False):
+        """
+        Genera vehículos con IA en streaming y los guarda en lotes en cuanto llegan
+
+        Cada lote se confirma por separado como parte del punto de control de la
+        carga, así que si la ejecución se interrumpe el reintento conserva los
+        vehículos ya generados (y pagados) y solo pide los que faltan.
+
+        Returns:
+            Todos los vehículos adquiridos por la carga, en orden de llegada
+        """
+        posicion = carga.vehiculos_adquiridos.count()
+        pendientes = max(0, cantidad - posicion)
+        if posicion:
+            self.stdout.write(
+                f'♻️  {posicion} vehículos ya generados en esta ejecución; se piden {pendientes} más'
+            )
+
+        lote = []
+        tamano_lote = max(1, settings.AI_GENERATOR_LOTE_INSERCION)
+        inicio = time.perf_counter()
+        primer_lote = True
+
+        def guardar_lote():
+            nonlocal lote, primer_lote
+            VehiculoAdquirido.objects.bulk_create(lote)
+            if primer_lote:
+                primer_lote = False
+                self.stdout.write(
+                    f'⚡ Primeros {len(lote)} vehículos guardados en {time.perf_counter() - inicio:.2f}s'
+                )
+            lote = []
+
+        try:
+            self.stdout.write(
+                f'🤖 Generando {pendientes} vehículos con IA en streaming...'
+            )
+            for vehiculo in generar_vehiculos_con_ia_en_streaming(num_vehiculos=pendientes):
+                lote.append(VehiculoAdquirido(carga=carga, posicion=posicion, datos=vehiculo))
+                posicion += 1
+                if len(lote) >= tamano_lote:
+                    guardar_lote()
+            if lote:
+                guardar_lote()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'✅ {pendientes} vehículos generados con IA en {time.perf_counter() - inicio:.2f}s'
+                )
+            )
+        except Exception as e:
+            logger.error(f"Error generando vehículos con IA en streaming: {str(e)}", exc_info=True)
+            self.stdout.write(
+                self.style.ERROR(f'❌ Error generando con IA: {str(e)}')
+            )
+            self.stdout.write(
+                self.style.WARNING('⚠️  Se completará con generación aleatoria tradicional...')
+            )
+
+        return self._cargar_vehiculos_adquiridos(carga)
+
+    def _insertar_nuevos_vehiculos(self, vehiculos_scrapeados, cantidad, debug=False,
+                                   modo_refresco=CargaStock.MODO_REEMPLAZO):
+        """
+        Inserta nuevos vehículos en Stock
+
+        Args:
+            modo_refresco: 'reemplazo' inserta en Stock, 'swap' en la tabla staging
+                           e 'incremental' aplica solo las diferencias por bastidor
+
+        Returns:
+            Diccionario con los contadores insertados, actualizados, sin_cambios y eliminados
+        """
         try:
             # Si el scraping no obtuvo suficientes resultados, generar datos aleatorios
             if len(vehiculos_scrapeados) < cantidad:
@@ -337,13 +783,26 @@ class Command(BaseCommand):
                 stock = Stock(**crear_registro_stock(vehiculo))
                 nuevos_stock.append(stock)
 
+            if modo_refresco == CargaStock.MODO_INCREMENTAL:
+                contadores = aplicar_incremental(nuevos_stock)
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f'✅ Stock actualizado: {contadores["insertados"]} insertados, '
+                        f'{contadores["actualizados"]} actualizados, {contadores["eliminados"]} eliminados'
+                    )
+                )
+                return contadores
+
             # Insertar en lotes
             lote = 500
             for i in range(0, len(nuevos_stock), lote):
-                Stock.objects.bulk_create(
-                    nuevos_stock[i:i + lote],
-                    ignore_conflicts=True
-                )
+                if modo_refresco == CargaStock.MODO_SWAP:
+                    insertar_en_staging(nuevos_stock[i:i + lote])
+                else:
+                    Stock.objects.bulk_create(
+                        nuevos_stock[i:i + lote],
+                        ignore_conflicts=True
+                    )
                 self.stdout.write(
                     f'✔️  Insertados {min(i + lote, len(nuevos_stock))}/{len(nuevos_stock)} vehículos'
                 )
@@ -351,6 +810,7 @@ class Command(BaseCommand):
             self.stdout.write(
                 self.style.SUCCESS(f'✅ {len(nuevos_stock)} nuevos vehículos insertados en Stock')
             )
+            return {'insertados': len(nuevos_stock), 'actualizados': 0, 'sin_cambios': 0}
 
         except Exception as e:
             logger.error(f"Error insertando vehículos: {str(e)}", exc_info=True)
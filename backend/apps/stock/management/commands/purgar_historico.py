@@ -0,0 +1,71 @@
+"""
+Comando Django para aplicar la retención de StockHistorico eliminando
+(o desacoplando) particiones mensuales completas, y la de los eventos de
+cambio de stock
+"""
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.stock.cdc import purgar_cambios
+from apps.stock.particiones import listar_particiones, purgar_particiones, sumar_meses
+
+
+class Command(BaseCommand):
+    help = 'Elimina o desacopla las particiones de StockHistorico más antiguas que el periodo de retención'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meses',
+            type=int,
+            default=24,
+            help='Meses de histórico a conservar, incluido el actual (default: 24)'
+        )
+        parser.add_argument(
+            '--desacoplar',
+            action='store_true',
+            help='Desacopla las particiones (DETACH PARTITION) en lugar de eliminarlas'
+        )
+        parser.add_argument(
+            '--dias-cambios',
+            type=int,
+            default=30,
+            help='Días de eventos de cambio de stock (stock_cambio) a conservar (default: 30)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Muestra las particiones que se purgarían sin modificar nada'
+        )
+
+    def handle(self, *args, **options):
+        meses = options.get('meses', 24)
+        if meses < 1:
+            raise CommandError('--meses debe ser al menos 1')
+
+        limite = sumar_meses(date.today(), -(meses - 1))
+        accion = 'desacoplar' if options.get('desacoplar') else 'eliminar'
+
+        self.stdout.write(
+            self.style.SUCCESS(f'🗂️  Retención de StockHistorico: se conservan los datos desde {limite}')
+        )
+
+        if options.get('dry_run'):
+            candidatas = [nombre for nombre, mes in listar_particiones() if mes < limite]
+            for nombre in candidatas:
+                self.stdout.write(f'   · {nombre} (se va a {accion})')
+            self.stdout.write(
+                self.style.WARNING(f'ℹ️  Dry run: {len(candidatas)} particiones se purgarían')
+            )
+            return
+
+        purgadas = purgar_particiones(limite, desacoplar=options.get('desacoplar', False))
+        for nombre in purgadas:
+            self.stdout.write(f'✔️  {nombre}')
+
+        eventos = purgar_cambios(timezone.now() - timedelta(days=options.get('dias_cambios', 30)))
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ {len(purgadas)} particiones y {eventos} eventos de cambio purgados')
+        )
@@ -0,0 +1,74 @@
+"""
+Comando Django que ejecuta el scheduler de tareas de stock en un proceso dedicado
+
+Se pueden arrancar varias réplicas: solo la que obtiene el advisory lock de
+líder programa los trabajos; el resto queda en espera y toma el relevo si
+el líder cae.
+"""
+import logging
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from apps.stock.bloqueos import CLAVE_LIDER_SCHEDULER, Liderazgo
+from apps.stock.scheduler import crear_scheduler_stock
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta el scheduler de tareas de stock con elección de líder por advisory lock de PostgreSQL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=15.0,
+            help='Segundos entre intentos de liderazgo y comprobaciones del líder (default: 15)'
+        )
+
+    def handle(self, *args, **options):
+        intervalo = options.get('intervalo', 15.0)
+        parar = threading.Event()
+
+        def detener(signum, frame):
+            self.stdout.write(self.style.WARNING('\n🛑 Señal recibida, deteniendo el scheduler...'))
+            parar.set()
+
+        signal.signal(signal.SIGTERM, detener)
+        signal.signal(signal.SIGINT, detener)
+
+        liderazgo = Liderazgo(CLAVE_LIDER_SCHEDULER)
+        scheduler = None
+        en_espera = False
+
+        self.stdout.write(self.style.SUCCESS('⏰ Scheduler de stock iniciado'))
+
+        try:
+            while not parar.is_set():
+                if scheduler is None:
+                    if liderazgo.intentar():
+                        scheduler = crear_scheduler_stock()
+                        scheduler.start()
+                        en_espera = False
+                        self.stdout.write(
+                            self.style.SUCCESS('👑 Proceso líder: migración de Stock programada para 01:00 AM')
+                        )
+                        logger.info("Scheduler de stock: liderazgo obtenido")
+                    elif not en_espera:
+                        en_espera = True
+                        self.stdout.write('⏳ Otro proceso es el líder; en espera para tomar el relevo')
+                elif not liderazgo.sigue_siendo_lider():
+                    # Un trabajo en curso termina por su cuenta; el bloqueo de la migración evita duplicados
+                    scheduler.shutdown(wait=False)
+                    scheduler = None
+                    self.stdout.write(self.style.ERROR('⚠️  Liderazgo perdido; scheduler detenido'))
+                    logger.error("Scheduler de stock: liderazgo perdido")
+
+                parar.wait(intervalo)
+        finally:
+            if scheduler is not None:
+                scheduler.shutdown(wait=True)
+            liderazgo.liberar()
+            self.stdout.write(self.style.SUCCESS('✅ Scheduler de stock detenido'))
@@ -0,0 +1,129 @@
+"""
+Comando Django para generar un inventario sintético de tamaño producción
+(Stock y varios días de StockHistorico) cargado con COPY
+"""
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from apps.stock.busqueda import actualizar_vector_busqueda
+from apps.stock.derivados import invalidar_derivados
+from apps.stock.generador_masivo import avanzar_dia, columnas_stock, copiar_a_tabla, generar_lote
+from apps.stock.models import Stock, StockHistorico
+from apps.stock.particiones import asegurar_particiones
+
+# Vehículos en Stock por cada unidad de --scale
+VEHICULOS_POR_ESCALA = 10_000
+
+
+class Command(BaseCommand):
+    help = 'Genera un dataset sintético determinista de Stock e histórico y lo carga con COPY'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            type=float,
+            default=1,
+            help=f'Factor de escala: {VEHICULOS_POR_ESCALA} vehículos en Stock por unidad (default: 1)'
+        )
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=30,
+            help='Días de StockHistorico a generar antes de hoy (default: 30)'
+        )
+        parser.add_argument(
+            '--rotacion',
+            type=float,
+            default=0.03,
+            help='Fracción del inventario que se vende y se repone cada día (default: 0.03)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Semilla; con la misma semilla y parámetros se generan los mismos datos (default: 42)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=20_000,
+            help='Vehículos generados y cargados por bloque (default: 20000)'
+        )
+        parser.add_argument(
+            '--limpiar',
+            action='store_true',
+            help='Vacía Stock y StockHistorico antes de cargar'
+        )
+
+    def handle(self, *args, **options):
+        total = int(options['scale'] * VEHICULOS_POR_ESCALA)
+        dias = options['dias']
+        rotacion = options['rotacion']
+        lote = max(1, options['lote'])
+        hoy = date.today()
+
+        if total < 1 or dias < 0 or not 0 <= rotacion < 1:
+            raise CommandError('--scale debe generar al menos 1 vehículo, --dias >= 0 y 0 <= --rotacion < 1')
+
+        qn = connection.ops.quote_name
+        tabla_stock = Stock._meta.db_table
+        tabla_historico = StockHistorico._meta.db_table
+
+        if options.get('limpiar'):
+            with connection.cursor() as cursor:
+                cursor.execute(f'TRUNCATE {qn(tabla_stock)}, {qn(tabla_historico)}')
+            self.stdout.write(self.style.WARNING('🗑️  Stock y StockHistorico vaciados'))
+        elif Stock.objects.exists():
+            raise CommandError('Stock no está vacío; usa --limpiar para regenerar el dataset')
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'🌱 Generando {total} vehículos y {dias} días de histórico '
+                f'(rotación {rotacion:.0%}, semilla {options["seed"]})'
+            )
+        )
+
+        inicio_dias = hoy - timedelta(days=dias)
+        if dias:
+            asegurar_particiones(inicio_dias, hoy)
+
+        columnas = columnas_stock()
+        nuevos_por_dia = int(round(lote * rotacion))
+        filas_historico = 0
+        inicio = time.perf_counter()
+
+        # Cada bloque de vehículos evoluciona de forma independiente durante todos los días,
+        # así la memoria depende de --lote y no del tamaño total
+        for numero, desde in enumerate(range(0, total, lote)):
+            n = min(lote, total - desde)
+            rng = np.random.default_rng([options['seed'], numero])
+            # Índices de los vehículos repuestos: a continuación del inventario inicial, sin solaparse entre bloques
+            siguiente = total + numero * nuevos_por_dia * dias
+
+            with transaction.atomic():
+                bloque = generar_lote(n, rng, inicio=desde, hoy=inicio_dias)
+                for dia in range(dias):
+                    copiar_a_tabla(tabla_historico, bloque, columnas)
+                    filas_historico += n
+                    siguiente += avanzar_dia(bloque, rng, inicio_dias + timedelta(days=dia + 1), rotacion, siguiente)
+                copiar_a_tabla(tabla_stock, bloque, columnas)
+
+            self.stdout.write(f'   · {desde + n}/{total} vehículos ({time.perf_counter() - inicio:.1f}s)')
+
+        actualizar_vector_busqueda()
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {qn(tabla_stock)}')
+            cursor.execute(f'ANALYZE {qn(tabla_historico)}')
+        invalidar_derivados()
+
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✅ {total} filas en Stock y {filas_historico} en StockHistorico en {segundos:.1f}s '
+                f'({(total + filas_historico) / segundos:,.0f} filas/s)'
+            )
+        )
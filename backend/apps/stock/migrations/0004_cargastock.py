@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:18
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("stock", "0003_remove_stock_cilindrada_remove_stock_combustible_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CargaStock",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "modo",
+                    models.CharField(
+                        choices=[
+                            ("reemplazo", "Reemplazo completo"),
+                            ("swap", "Tabla staging + intercambio"),
+                            ("incremental", "Incremental por bastidor"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("fecha_snapshot", models.DateField(db_index=True)),
+                (
+                    "fecha_inicio",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("fecha_fin", models.DateTimeField(blank=True, null=True)),
+                ("insertados", models.IntegerField(default=0)),
+                ("actualizados", models.IntegerField(default=0)),
+                ("sin_cambios", models.IntegerField(default=0)),
+                ("eliminados", models.IntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "Carga de Stock",
+                "verbose_name_plural": "Cargas de Stock",
+                "db_table": "stock_carga",
+                "ordering": ["-fecha_inicio"],
+            },
+        ),
+    ]
@@ -0,0 +1,123 @@
+"""
+Convierte stock_historico en una tabla particionada por rango mensual
+sobre fecha_snapshot.
+
+La tabla original se renombra, se crea la nueva tabla particionada con las
+mismas columnas e índices (con sus nombres originales), se crean las
+particiones mensuales necesarias más una partición por defecto y se copian
+los datos. Las filas sin fecha_snapshot toman la fecha de fecha_insert.
+"""
+import re
+from datetime import date
+
+from django.db import migrations, models
+
+
+TABLA = 'stock_historico'
+TABLA_ANTIGUA = 'stock_historico_sin_particionar'
+SECUENCIA = 'stock_historico_id_seq'
+
+
+def _sumar_meses(fecha, meses):
+    indice = fecha.year * 12 + fecha.month - 1 + meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def particionar(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {TABLA} RENAME TO {TABLA_ANTIGUA}')
+
+        # Guardar las definiciones de índices secundarios y liberar sus nombres
+        cursor.execute(
+            """
+            SELECT i.relname, pg_get_indexdef(i.oid)
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            WHERE x.indrelid = %s::regclass AND NOT x.indisprimary
+            """,
+            [TABLA_ANTIGUA],
+        )
+        indices = cursor.fetchall()
+        for nombre, _ in indices:
+            cursor.execute(f'DROP INDEX "{nombre}"')
+        cursor.execute(f'ALTER TABLE {TABLA_ANTIGUA} DROP CONSTRAINT {TABLA}_pkey')
+
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM {TABLA_ANTIGUA}')
+        max_id = cursor.fetchone()[0]
+        cursor.execute(f'ALTER TABLE {TABLA_ANTIGUA} ALTER COLUMN id DROP IDENTITY IF EXISTS')
+        cursor.execute(f'ALTER TABLE {TABLA_ANTIGUA} ALTER COLUMN id DROP DEFAULT')
+        cursor.execute(f'DROP SEQUENCE IF EXISTS {SECUENCIA}')
+
+        # Nueva tabla particionada. Las columnas identity no se admiten en
+        # tablas particionadas antes de PostgreSQL 17, así que id usa una secuencia
+        cursor.execute(
+            f'CREATE TABLE {TABLA} (LIKE {TABLA_ANTIGUA} INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE (fecha_snapshot)'
+        )
+        cursor.execute(f'CREATE SEQUENCE {SECUENCIA} OWNED BY {TABLA}.id')
+        cursor.execute(f"ALTER TABLE {TABLA} ALTER COLUMN id SET DEFAULT nextval('{SECUENCIA}')")
+        if max_id:
+            cursor.execute('SELECT setval(%s, %s)', [SECUENCIA, max_id])
+        cursor.execute(f'ALTER TABLE {TABLA} ALTER COLUMN fecha_snapshot SET NOT NULL')
+        cursor.execute(f'ALTER TABLE {TABLA} ADD CONSTRAINT {TABLA}_pkey PRIMARY KEY (id, fecha_snapshot)')
+
+        # Particiones: una por cada mes con datos, el mes en curso y el siguiente
+        cursor.execute(f'CREATE TABLE {TABLA}_default PARTITION OF {TABLA} DEFAULT')
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', COALESCE(fecha_snapshot, fecha_insert::date))::date "
+            f"FROM {TABLA_ANTIGUA}"
+        )
+        hoy = date.today().replace(day=1)
+        meses = {fila[0] for fila in cursor.fetchall()} | {hoy, _sumar_meses(hoy, 1)}
+        for mes in sorted(meses):
+            cursor.execute(
+                f'CREATE TABLE {TABLA}_p{mes.year:04d}_{mes.month:02d} PARTITION OF {TABLA} '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                [mes, _sumar_meses(mes, 1)],
+            )
+
+        # Copiar los datos y recrear los índices sobre la tabla particionada
+        cursor.execute(
+            """
+            SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum)
+            FROM pg_attribute
+            WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+            """,
+            [TABLA_ANTIGUA],
+        )
+        columnas = cursor.fetchone()[0]
+        seleccion = columnas.replace(
+            'fecha_snapshot', 'COALESCE(fecha_snapshot, fecha_insert::date)'
+        )
+        cursor.execute(f'INSERT INTO {TABLA} ({columnas}) SELECT {seleccion} FROM {TABLA_ANTIGUA}')
+
+        for nombre, definicion in indices:
+            cursor.execute(
+                re.sub(r' ON (?:ONLY )?\S+ USING ', f' ON {TABLA} USING ', definicion, count=1)
+            )
+
+        cursor.execute(f'DROP TABLE {TABLA_ANTIGUA}')
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("stock", "0004_cargastock"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name="stockhistorico",
+                    name="fecha_snapshot",
+                    field=models.DateField(db_index=True),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(particionar),
+            ],
+        ),
+    ]
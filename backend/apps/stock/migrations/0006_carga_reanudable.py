@@ -0,0 +1,99 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:37
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def marcar_cargas_anteriores(apps, schema_editor):
+    """Las cargas registradas antes de este cambio solo se guardaban al terminar"""
+    CargaStock = apps.get_model('stock', 'CargaStock')
+    CargaStock.objects.filter(fecha_fin__isnull=False).update(estado='completada', paso_completado=4)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("stock", "0005_particionar_stock_historico"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cargastock",
+            name="error",
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name="cargastock",
+            name="estado",
+            field=models.CharField(
+                choices=[
+                    ("en_curso", "En curso"),
+                    ("fallida", "Fallida"),
+                    ("completada", "Completada"),
+                ],
+                db_index=True,
+                default="en_curso",
+                max_length=20,
+            ),
+        ),
+        migrations.AddField(
+            model_name="cargastock",
+            name="opciones",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="cargastock",
+            name="paso_completado",
+            field=models.PositiveSmallIntegerField(
+                choices=[
+                    (0, "Sin empezar"),
+                    (1, "Stock archivado en histórico"),
+                    (2, "Vehículos adquiridos"),
+                    (4, "Stock publicado"),
+                ],
+                default=0,
+            ),
+        ),
+        migrations.CreateModel(
+            name="VehiculoAdquirido",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("posicion", models.PositiveIntegerField()),
+                (
+                    "datos",
+                    models.JSONField(
+                        encoder=django.core.serializers.json.DjangoJSONEncoder
+                    ),
+                ),
+                (
+                    "carga",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="vehiculos_adquiridos",
+                        to="stock.cargastock",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Vehículo adquirido",
+                "verbose_name_plural": "Vehículos adquiridos",
+                "db_table": "stock_carga_vehiculo",
+                "ordering": ["carga", "posicion"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="vehiculoadquirido",
+            constraint=models.UniqueConstraint(
+                fields=("carga", "posicion"), name="stock_carga_vehiculo_posicion_uniq"
+            ),
+        ),
+        migrations.RunPython(marcar_cargas_anteriores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,168 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("stock", "0006_carga_reanudable"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JobRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "command",
+                    models.CharField(
+                        db_index=True, max_length=100, verbose_name="Comando"
+                    ),
+                ),
+                (
+                    "options",
+                    models.JSONField(blank=True, default=dict, verbose_name="Opciones"),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("success", "Correcta"), ("failed", "Fallida")],
+                        max_length=20,
+                        verbose_name="Estado",
+                    ),
+                ),
+                ("error", models.TextField(blank=True, verbose_name="Error")),
+                (
+                    "started_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="Inicio"
+                    ),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(blank=True, null=True, verbose_name="Fin"),
+                ),
+                (
+                    "wall_time",
+                    models.FloatField(
+                        blank=True, null=True, verbose_name="Tiempo real (s)"
+                    ),
+                ),
+                (
+                    "cpu_time",
+                    models.FloatField(
+                        blank=True, null=True, verbose_name="Tiempo de CPU (s)"
+                    ),
+                ),
+                (
+                    "db_queries",
+                    models.IntegerField(
+                        blank=True, null=True, verbose_name="Consultas"
+                    ),
+                ),
+                (
+                    "db_time",
+                    models.FloatField(
+                        blank=True, null=True, verbose_name="Tiempo en BD (s)"
+                    ),
+                ),
+                (
+                    "peak_rss",
+                    models.BigIntegerField(
+                        blank=True, null=True, verbose_name="Pico de memoria (bytes)"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Ejecución de comando",
+                "verbose_name_plural": "Ejecuciones de comandos",
+                "db_table": "stock_job_run",
+                "ordering": ["-started_at"],
+            },
+        ),
+        migrations.CreateModel(
+            name="JobStep",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, verbose_name="Paso")),
+                ("order", models.PositiveSmallIntegerField(verbose_name="Orden")),
+                ("started_at", models.DateTimeField(verbose_name="Inicio")),
+                ("rows", models.BigIntegerField(default=0, verbose_name="Filas")),
+                (
+                    "wall_time",
+                    models.FloatField(
+                        blank=True, null=True, verbose_name="Tiempo real (s)"
+                    ),
+                ),
+                (
+                    "cpu_time",
+                    models.FloatField(
+                        blank=True, null=True, verbose_name="Tiempo de CPU (s)"
+                    ),
+                ),
+                (
+                    "db_queries",
+                    models.IntegerField(
+                        blank=True, null=True, verbose_name="Consultas"
+                    ),
+                ),
+                (
+                    "db_time",
+                    models.FloatField(
+                        blank=True, null=True, verbose_name="Tiempo en BD (s)"
+                    ),
+                ),
+                (
+                    "peak_rss",
+                    models.BigIntegerField(
+                        blank=True, null=True, verbose_name="Pico de memoria (bytes)"
+                    ),
+                ),
+                (
+                    "profile",
+                    models.JSONField(
+                        blank=True, default=dict, verbose_name="Perfil de muestreo"
+                    ),
+                ),
+                (
+                    "run",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="steps",
+                        to="stock.jobrun",
+                        verbose_name="Ejecución",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Paso de ejecución",
+                "verbose_name_plural": "Pasos de ejecución",
+                "db_table": "stock_job_step",
+                "ordering": ["run", "order"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="jobrun",
+            index=models.Index(
+                fields=["command", "-started_at"], name="stock_job_r_command_60e1ee_idx"
+            ),
+        ),
+    ]
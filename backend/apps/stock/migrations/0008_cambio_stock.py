@@ -0,0 +1,184 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:52
+"""
+Outbox de cambios de stock (stock_cambio) y triggers de sentencia que lo
+alimentan. Ver apps/stock/cdc.py.
+"""
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.utils.timezone
+
+
+# Columnas que no cuentan como cambio: la clave y los metadatos de la carga
+# (mismas que COLUMNAS_NO_COMPARADAS de la carga incremental)
+FUNCIONES = """
+CREATE OR REPLACE FUNCTION stock_cdc_columnas(anterior jsonb, nueva jsonb) RETURNS text[]
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT COALESCE(array_agg(e.key ORDER BY e.key), '{}')
+    FROM jsonb_each(nueva) e
+    WHERE e.key <> ALL (ARRAY['bastidor', 'fecha_actualizacion', 'fecha_informe', 'fecha_insert', 'fecha_snapshot'])
+      AND e.value IS DISTINCT FROM anterior -> e.key
+$$;
+
+CREATE OR REPLACE FUNCTION stock_cdc_capturar() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        INSERT INTO stock_cambio (bastidor, operacion, columnas, version, fecha)
+        VALUES ('', 'T', '{}', txid_current(), now());
+
+    ELSIF TG_OP = 'DELETE' THEN
+        CREATE TEMP TABLE IF NOT EXISTS stock_cdc_borrados (
+            bastidor varchar(50) PRIMARY KEY,
+            fila jsonb NOT NULL
+        ) ON COMMIT DROP;
+        INSERT INTO stock_cdc_borrados (bastidor, fila)
+        SELECT v.bastidor, to_jsonb(v) FROM viejas v
+        ON CONFLICT (bastidor) DO UPDATE SET fila = EXCLUDED.fila;
+
+        INSERT INTO stock_cambio (bastidor, operacion, columnas, version, fecha)
+        SELECT v.bastidor, 'D', '{}', txid_current(), now() FROM viejas v;
+
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO stock_cambio (bastidor, operacion, columnas, version, fecha)
+        SELECT n.bastidor, 'U', c.columnas, txid_current(), now()
+        FROM nuevas n
+        JOIN viejas v ON v.bastidor = n.bastidor
+        CROSS JOIN LATERAL (SELECT stock_cdc_columnas(to_jsonb(v), to_jsonb(n)) AS columnas) c
+        WHERE c.columnas <> '{}';
+
+    ELSIF to_regclass('pg_temp.stock_cdc_borrados') IS NULL THEN
+        INSERT INTO stock_cambio (bastidor, operacion, columnas, version, fecha)
+        SELECT n.bastidor, 'I', '{}', txid_current(), now() FROM nuevas n;
+
+    ELSE
+        -- Vehículos borrados antes en esta transacción: el par baja/alta pasa a ser una modificación
+        INSERT INTO stock_cambio (bastidor, operacion, columnas, version, fecha)
+        SELECT n.bastidor,
+               CASE WHEN b.bastidor IS NULL THEN 'I' ELSE 'U' END,
+               COALESCE(c.columnas, '{}'),
+               txid_current(), now()
+        FROM nuevas n
+        LEFT JOIN stock_cdc_borrados b ON b.bastidor = n.bastidor
+        LEFT JOIN LATERAL (
+            SELECT stock_cdc_columnas(b.fila, to_jsonb(n)) AS columnas WHERE b.bastidor IS NOT NULL
+        ) c ON TRUE
+        WHERE b.bastidor IS NULL OR c.columnas <> '{}';
+
+        DELETE FROM stock_cambio o
+        USING nuevas n, stock_cdc_borrados b
+        WHERE b.bastidor = n.bastidor
+          AND o.version = txid_current() AND o.operacion = 'D' AND o.bastidor = n.bastidor;
+
+        DELETE FROM stock_cdc_borrados b USING nuevas n WHERE b.bastidor = n.bastidor;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+"""
+
+TRIGGERS = [
+    ('stock_cdc_insert', 'INSERT', 'REFERENCING NEW TABLE AS nuevas'),
+    ('stock_cdc_update', 'UPDATE', 'REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas'),
+    ('stock_cdc_delete', 'DELETE', 'REFERENCING OLD TABLE AS viejas'),
+    ('stock_cdc_truncate', 'TRUNCATE', ''),
+]
+
+
+def crear_captura(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(FUNCIONES)
+        for nombre, evento, referencias in TRIGGERS:
+            cursor.execute(
+                f'CREATE TRIGGER {nombre} AFTER {evento} ON stock {referencias} '
+                f'FOR EACH STATEMENT EXECUTE FUNCTION stock_cdc_capturar()'
+            )
+
+
+def eliminar_captura(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        for nombre, _, _ in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {nombre} ON stock')
+        cursor.execute('DROP FUNCTION IF EXISTS stock_cdc_capturar()')
+        cursor.execute('DROP FUNCTION IF EXISTS stock_cdc_columnas(jsonb, jsonb)')
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("stock", "0007_job_run"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CambioStock",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "bastidor",
+                    models.CharField(
+                        blank=True, max_length=50, verbose_name="Bastidor (VIN)"
+                    ),
+                ),
+                (
+                    "operacion",
+                    models.CharField(
+                        choices=[
+                            ("I", "Alta"),
+                            ("U", "Modificación"),
+                            ("D", "Baja"),
+                            ("T", "Vaciado de la tabla"),
+                        ],
+                        max_length=1,
+                        verbose_name="Operación",
+                    ),
+                ),
+                (
+                    "columnas",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.CharField(max_length=100),
+                        blank=True,
+                        default=list,
+                        size=None,
+                        verbose_name="Columnas modificadas",
+                    ),
+                ),
+                (
+                    "version",
+                    models.BigIntegerField(verbose_name="Versión (transacción)"),
+                ),
+                (
+                    "fecha",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="Fecha"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Cambio de Stock",
+                "verbose_name_plural": "Cambios de Stock",
+                "db_table": "stock_cambio",
+                "ordering": ["version", "id"],
+                "indexes": [
+                    models.Index(
+                        fields=["version", "id"], name="stock_cambio_cursor_idx"
+                    ),
+                    models.Index(fields=["fecha"], name="stock_cambio_fecha_idx"),
+                ],
+            },
+        ),
+        migrations.RunPython(crear_captura, eliminar_captura),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("stock", "0009_stock_version"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="stockhistorico",
+            name="stock_histo_fecha_s_078704_idx",
+        ),
+        migrations.AddIndex(
+            model_name="stockhistorico",
+            index=models.Index(
+                fields=["fecha_snapshot", "fecha_informe"],
+                name="stock_hist_snap_informe_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stockhistorico",
+            index=models.Index(
+                fields=["fecha_snapshot", "precio_venta"],
+                name="stock_hist_snap_precio_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stockhistorico",
+            index=models.Index(
+                fields=["fecha_snapshot", "marca"], name="stock_hist_snap_marca_idx"
+            ),
+        ),
+    ]
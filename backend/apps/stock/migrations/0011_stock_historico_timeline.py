@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("stock", "0010_stock_historico_as_of"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="stockhistorico",
+            name="stock_histo_bastido_c7578f_idx",
+        ),
+        migrations.AddIndex(
+            model_name="stockhistorico",
+            index=models.Index(
+                fields=["bastidor", "fecha_snapshot"],
+                include=("precio_venta", "dias_stock", "reservado", "publicado"),
+                name="stock_hist_bastidor_snap_idx",
+            ),
+        ),
+    ]
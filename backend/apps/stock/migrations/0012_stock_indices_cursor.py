@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("stock", "0011_stock_historico_timeline"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="stock",
+            index=models.Index(
+                fields=["fecha_informe", "bastidor"], name="stock_informe_bastidor_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stock",
+            index=models.Index(
+                fields=["precio_venta", "bastidor"], name="stock_precio_bastidor_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stock",
+            index=models.Index(
+                fields=["kilometros", "bastidor"], name="stock_km_bastidor_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stock",
+            index=models.Index(
+                fields=["anio_matricula", "bastidor"], name="stock_anio_bastidor_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:05
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("stock", "0012_stock_indices_cursor"),
+    ]
+
+    operations = [
+        # Ya la crea database/init/01-init.sql; aquí para bases creadas sin ese script
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name="stock",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("marca"), name="gin_trgm_ops"
+                ),
+                name="stock_marca_trgm_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stock",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("modelo"), name="gin_trgm_ops"
+                ),
+                name="stock_modelo_trgm_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stock",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("bastidor"),
+                    name="gin_trgm_ops",
+                ),
+                name="stock_bastidor_trgm_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stock",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("matricula"),
+                    name="gin_trgm_ops",
+                ),
+                name="stock_matricula_trgm_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stock",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("color"), name="gin_trgm_ops"
+                ),
+                name="stock_color_trgm_idx",
+            ),
+        ),
+    ]
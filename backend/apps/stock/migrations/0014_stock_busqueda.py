@@ -0,0 +1,113 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:08
+"""
+Columna de búsqueda de texto completo (stock.busqueda) con la configuración
+es_sin_acentos: diccionario español sobre el texto sin tildes. Ver
+apps/stock/busqueda.py.
+
+La captura de cambios deja de contar busqueda como columna modificada: su
+recálculo tras cada carga no es un cambio del vehículo.
+"""
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import UnaccentExtension
+from django.db import migrations
+
+
+CONFIGURACION = """
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'es_sin_acentos') THEN
+        CREATE TEXT SEARCH CONFIGURATION es_sin_acentos (COPY = spanish);
+        ALTER TEXT SEARCH CONFIGURATION es_sin_acentos
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+    END IF;
+END
+$$;
+"""
+
+# Mismo vector que apps.stock.busqueda.expresion_vector_busqueda en esta versión
+VECTOR = (
+    "setweight(to_tsvector('es_sin_acentos', COALESCE(marca, '') || ' ' || COALESCE(modelo, '')), 'A') || "
+    "setweight(to_tsvector('es_sin_acentos', COALESCE(modelo_comercial, '') || ' ' || "
+    "COALESCE(descripcion_modelo_qbi, '') || ' ' || COALESCE(tipo_vehiculo, '') || ' ' || "
+    "COALESCE(categoria, '') || ' ' || COALESCE(descripcion_tipo_vo, '')), 'B') || "
+    "setweight(to_tsvector('es_sin_acentos', COALESCE(color, '') || ' ' || COALESCE(color_secundario, '')), 'C') || "
+    "setweight(to_tsvector('es_sin_acentos', COALESCE(nom_concesionario, '') || ' ' || "
+    "COALESCE(dealer_corto, '') || ' ' || COALESCE(provincia, '')), 'D')"
+)
+
+FUNCION_COLUMNAS = """
+CREATE OR REPLACE FUNCTION stock_cdc_columnas(anterior jsonb, nueva jsonb) RETURNS text[]
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT COALESCE(array_agg(e.key ORDER BY e.key), '{}')
+    FROM jsonb_each(nueva) e
+    WHERE e.key <> ALL (ARRAY[%s])
+      AND e.value IS DISTINCT FROM anterior -> e.key
+$$;
+"""
+
+NO_COMPARADAS = ['bastidor', 'fecha_actualizacion', 'fecha_informe', 'fecha_insert', 'fecha_snapshot']
+
+
+def _funcion_columnas(columnas):
+    return FUNCION_COLUMNAS % ', '.join(f"'{c}'" for c in columnas)
+
+
+def crear_configuracion(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(CONFIGURACION)
+
+
+def eliminar_configuracion(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP TEXT SEARCH CONFIGURATION IF EXISTS es_sin_acentos')
+
+
+def rellenar_busqueda(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(_funcion_columnas(NO_COMPARADAS + ['busqueda']))
+        cursor.execute(f'UPDATE stock SET busqueda = {VECTOR}')
+
+
+def restaurar_funcion_columnas(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(_funcion_columnas(NO_COMPARADAS))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("stock", "0013_stock_trigramas"),
+    ]
+
+    operations = [
+        UnaccentExtension(),
+        migrations.RunPython(crear_configuracion, eliminar_configuracion),
+        migrations.AddField(
+            model_name="stock",
+            name="busqueda",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        # Se rellena antes de crear el índice para construirlo de una vez
+        migrations.RunPython(rellenar_busqueda, restaurar_funcion_columnas),
+        migrations.AddIndex(
+            model_name="stock",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["busqueda"], name="stock_busqueda_idx"
+            ),
+        ),
+    ]
@@ -1,4 +1,9 @@
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils import timezone
 
 
@@ -165,6 +170,9 @@ class Stock(models.Model):
     fecha_insert = models.DateTimeField(auto_now_add=True, db_index=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
 
+    # Búsqueda de texto completo; la recalcula en bloque la carga (ver apps.stock.busqueda)
+    busqueda = SearchVectorField(null=True, editable=False)
+
     class Meta:
         db_table = 'stock'
         verbose_name = 'Stock'
@@ -179,6 +187,19 @@ class Stock(models.Model):
             models.Index(fields=['reservado']),
             models.Index(fields=['flag_lead']),
             models.Index(fields=['fecha_insert']),
+            # Ordenaciones del listado con el bastidor como desempate (paginación por cursor)
+            models.Index(fields=['fecha_informe', 'bastidor'], name='stock_informe_bastidor_idx'),
+            models.Index(fields=['precio_venta', 'bastidor'], name='stock_precio_bastidor_idx'),
+            models.Index(fields=['kilometros', 'bastidor'], name='stock_km_bastidor_idx'),
+            models.Index(fields=['anio_matricula', 'bastidor'], name='stock_anio_bastidor_idx'),
+            # Trigramas sobre UPPER(columna): sirven a icontains (UPPER(col) LIKE UPPER('%...%'))
+            # y a la búsqueda por similitud de apps.stock.busqueda
+            GinIndex(OpClass(Upper('marca'), name='gin_trgm_ops'), name='stock_marca_trgm_idx'),
+            GinIndex(OpClass(Upper('modelo'), name='gin_trgm_ops'), name='stock_modelo_trgm_idx'),
+            GinIndex(OpClass(Upper('bastidor'), name='gin_trgm_ops'), name='stock_bastidor_trgm_idx'),
+            GinIndex(OpClass(Upper('matricula'), name='gin_trgm_ops'), name='stock_matricula_trgm_idx'),
+            GinIndex(OpClass(Upper('color'), name='gin_trgm_ops'), name='stock_color_trgm_idx'),
+            GinIndex(fields=['busqueda'], name='stock_busqueda_idx'),
         ]
 
     def __str__(self):
@@ -189,6 +210,9 @@ class StockHistorico(models.Model):
     """
     Tabla de histórico de stock que recibe diariamente a las 01:00
     todos los datos de la tabla stock antes de ser vaciada.
+
+    En la base de datos está particionada por mes sobre fecha_snapshot
+    (ver apps.stock.particiones); la clave primaria real es (id, fecha_snapshot).
     """
 
     # Identificadores principales
@@ -343,7 +367,8 @@ class StockHistorico(models.Model):
     xxx = models.CharField(max_length=100, null=True, blank=True)
 
     # Metadatos - La fecha de snapshot original es importante para tracking histórico
-    fecha_snapshot = models.DateField(null=True, blank=True, db_index=True)
+    # (es la clave de partición, por eso no admite nulos)
+    fecha_snapshot = models.DateField(db_index=True)
     fecha_insert = models.DateTimeField(db_index=True, verbose_name="Fecha de inserción en histórico")
     fecha_actualizacion = models.DateTimeField(auto_now=True)
 
@@ -352,8 +377,20 @@ class StockHistorico(models.Model):
         verbose_name = 'Stock Histórico'
         verbose_name_plural = 'Stocks Históricos'
         indexes = [
-            models.Index(fields=['bastidor']),
-            models.Index(fields=['fecha_snapshot']),
+            # Serie de un vehículo (/api/stock/{bastidor}/timeline/): las columnas
+            # incluidas (id para quedarse con la última fila de cada día) permiten
+            # leerla solo del índice, sin visitar la tabla
+            models.Index(
+                fields=['bastidor', 'fecha_snapshot'],
+                include=['id', 'precio_venta', 'dias_stock', 'reservado', 'publicado'],
+                name='stock_hist_bastidor_snap_idx',
+            ),
+            # Consultas a una fecha (/api/stock/as-of/): el día y la ordenación o el
+            # filtro más habitual, para no ordenar todo el snapshot en cada página.
+            # También sirven para filtrar solo por fecha_snapshot
+            models.Index(fields=['fecha_snapshot', 'fecha_informe'], name='stock_hist_snap_informe_idx'),
+            models.Index(fields=['fecha_snapshot', 'precio_venta'], name='stock_hist_snap_precio_idx'),
+            models.Index(fields=['fecha_snapshot', 'marca'], name='stock_hist_snap_marca_idx'),
             models.Index(fields=['id_concesionario']),
             models.Index(fields=['marca']),
             models.Index(fields=['modelo']),
@@ -366,3 +403,402 @@ class StockHistorico(models.Model):
 
     def __str__(self):
         return f"{self.bastidor} - {self.marca} {self.modelo} (Histórico: {self.fecha_snapshot})"
+
+
+class StockVersion(models.Model):
+    """
+    Histórico de stock como dimensión lentamente cambiante (SCD tipo 2).
+
+    Cada fila es una versión de un vehículo, vigente desde valid_from
+    (incluido) hasta valid_to (excluido, nulo mientras es la versión actual).
+    Solo se escribe una versión nueva cuando cambia alguno de los atributos
+    versionados, detectado comparando hash_fila (ver apps.stock.versiones);
+    los contadores que avanzan solos cada día no abren versión y conservan el
+    valor con el que empezó la versión.
+    """
+
+    # Identificadores principales
+    idv = models.IntegerField(null=True, blank=True)
+    fecha_informe = models.IntegerField(null=True, blank=True)
+    bastidor = models.CharField(
+        max_length=50,
+        verbose_name="Bastidor (VIN)"
+    )
+    vehicle_key = models.CharField(max_length=100, null=True, blank=True)
+    vehicle_key2 = models.CharField(max_length=100, null=True, blank=True)
+
+    # Datos del concesionario y proveedor
+    id_concesionario = models.CharField(max_length=100, null=True, blank=True)
+    nom_concesionario = models.CharField(max_length=255, null=True, blank=True)
+    id_proveedor = models.CharField(max_length=100, null=True, blank=True)
+    nom_proveedor = models.CharField(max_length=255, null=True, blank=True)
+    dealer_corto = models.CharField(max_length=100, null=True, blank=True)
+    provincia = models.CharField(max_length=100, null=True, blank=True)
+
+    # Datos del vehículo
+    matricula = models.CharField(max_length=20, null=True, blank=True)
+    fecha_matriculacion = models.DateField(null=True, blank=True)
+    fecha_recepcion = models.DateField(null=True, blank=True)
+    marca = models.CharField(max_length=100, null=True, blank=True)
+    modelo = models.CharField(max_length=100, null=True, blank=True)
+    modelo_comercial = models.CharField(max_length=100, null=True, blank=True)
+    id_modelo = models.CharField(max_length=100, null=True, blank=True)
+    modelo_qbi = models.CharField(max_length=100, null=True, blank=True)
+    descripcion_modelo_qbi = models.CharField(max_length=100, null=True, blank=True)
+    modelo_bastidor = models.CharField(max_length=100, null=True, blank=True)
+
+    anio_matricula = models.IntegerField(null=True, blank=True)
+    color = models.CharField(max_length=100, null=True, blank=True)
+    color_secundario = models.CharField(max_length=100, null=True, blank=True)
+    cod_color = models.CharField(max_length=50, null=True, blank=True)
+    id_color = models.CharField(max_length=100, null=True, blank=True)
+
+    kilometros = models.IntegerField(null=True, blank=True)
+    ubicacion = models.CharField(max_length=100, null=True, blank=True)
+
+    # Datos de tipo de vehículo y estado
+    id_tipo_vo = models.CharField(max_length=50, null=True, blank=True)
+    descripcion_tipo_vo = models.CharField(max_length=100, null=True, blank=True)
+    # Tipo de vehículo (sedan, suv, compacto, etc.) - añadido para filtros y estadísticas
+    tipo_vehiculo = models.CharField(max_length=100, null=True, blank=True)
+    id_estado = models.CharField(max_length=50, null=True, blank=True)
+    descripcion_estado = models.CharField(max_length=100, null=True, blank=True)
+    tipo_stock = models.CharField(max_length=50, null=True, blank=True)
+
+    # Datos de stock y reserva
+    reservado = models.BooleanField(default=False)
+    dias_stock = models.IntegerField(null=True, blank=True)
+    intervalo_dias = models.CharField(max_length=50, null=True, blank=True)
+    meses_en_stock = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    dias_stock_fin_mes = models.IntegerField(null=True, blank=True)
+    intervalo_dias_fin_mes = models.CharField(max_length=50, null=True, blank=True)
+    intervalo_dias_vo = models.CharField(max_length=50, null=True, blank=True)
+    intervalo_dias_vo_new = models.CharField(max_length=50, null=True, blank=True)
+    intervalo_km = models.CharField(max_length=50, null=True, blank=True)
+    interv_km_id = models.CharField(max_length=100, null=True, blank=True)
+
+    uds_disponibles_stock = models.IntegerField(null=True, blank=True)
+    uds_reservadas_stock = models.IntegerField(null=True, blank=True)
+    stock_uds = models.IntegerField(null=True, blank=True)
+
+    # Datos de pedido y entrada
+    pedido = models.CharField(max_length=100, null=True, blank=True)
+    categoria = models.CharField(max_length=100, null=True, blank=True)
+    canal_entrada_vo = models.CharField(max_length=100, null=True, blank=True)
+    concepto_compra = models.CharField(max_length=100, null=True, blank=True)
+
+    # Datos financieros
+    importe_compra = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    importe_rectificativas = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    importe_reacon = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    importe_vales = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    importe_costo = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    importe_coste_total = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    precio_venta = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    precio_anterior = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    precio_nuevo = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    diferencia_precios = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    stock_benef_estimado = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+
+    # Datos de internet
+    publicado = models.BooleanField(default=False)
+    id_internet = models.CharField(max_length=100, null=True, blank=True)
+    link_internet = models.TextField(null=True, blank=True)
+    internet_eurotax_compra = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    internet_eurotax_venta = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    internet_anuncios = models.IntegerField(null=True, blank=True)
+    internet_precio_min = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    internet_precio_max = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    precio_internet = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    internet_fotos = models.IntegerField(null=True, blank=True)
+    internet_autorizado = models.BooleanField(default=False)
+    status_imaweb = models.CharField(max_length=100, null=True, blank=True)
+    status_car_imaweb = models.CharField(max_length=100, null=True, blank=True)
+
+    # Datos de publicación y anuncios
+    fecha_primera_publicacion = models.DateField(null=True, blank=True)
+    fecha_ultima_publicacion = models.DateField(null=True, blank=True)
+    antiguedad_anuncio = models.IntegerField(null=True, blank=True)
+    dias_primera_public = models.IntegerField(null=True, blank=True)
+    uc_dias = models.IntegerField(null=True, blank=True)
+    internet_dias_public = models.IntegerField(null=True, blank=True)
+    tmaimg = models.CharField(max_length=100, null=True, blank=True)
+    tiene_video = models.BooleanField(default=False)
+
+    # Datos de interacción
+    visitas_totales = models.IntegerField(null=True, blank=True)
+    llamadas_recibidas = models.IntegerField(null=True, blank=True)
+    emails_recibidos = models.IntegerField(null=True, blank=True)
+    visitas_cambio = models.IntegerField(null=True, blank=True)
+    leads_cambio = models.IntegerField(null=True, blank=True)
+    visitas_cambio_dias = models.IntegerField(null=True, blank=True)
+    leads_cambio_dias = models.IntegerField(null=True, blank=True)
+
+    # Datos de lead y predicción
+    flag_lead = models.BooleanField(default=False)
+    stock_leads = models.IntegerField(null=True, blank=True)
+    prediction = models.CharField(max_length=100, null=True, blank=True)
+
+    # Datos de venta y unidades
+    uds_mes = models.IntegerField(null=True, blank=True)
+    uds_3mes = models.IntegerField(null=True, blank=True)
+    uds_ano = models.IntegerField(null=True, blank=True)
+
+    # Datos de cambios y QBI
+    ultimo_cambio = models.CharField(max_length=100, null=True, blank=True)
+    ult_cambio = models.CharField(max_length=100, null=True, blank=True)
+    fecha_ultimo_cambio = models.DateField(null=True, blank=True)
+    fecha_ultimo_cambio_2 = models.DateField(null=True, blank=True)
+    fecha_ult_cambio = models.DateField(null=True, blank=True)
+    dias_desde_ult_cambio = models.BigIntegerField(null=True, blank=True)
+    bastidor_qbi = models.CharField(max_length=100, null=True, blank=True)
+
+    # Datos de fotos y óptipix
+    id_calidad_marca = models.CharField(max_length=36, null=True, blank=True)  # UUID
+    fecha_ultima_foto_optipix = models.DateTimeField(null=True, blank=True)
+    id_vehiculo_foto_optipix = models.CharField(max_length=36, null=True, blank=True)  # UUID
+    dias_desde_foto_optipix = models.IntegerField(null=True, blank=True)
+    status_foto = models.CharField(max_length=100, null=True, blank=True)
+
+    # Datos de pospuesto
+    id_veces_pospuesto = models.CharField(max_length=36, null=True, blank=True)  # UUID
+    veces_pospuesto = models.IntegerField(null=True, blank=True)
+
+    # Otros
+    xxx = models.CharField(max_length=100, null=True, blank=True)
+
+    # Vigencia de la versión
+    valid_from = models.DateField(verbose_name="Vigente desde")
+    valid_to = models.DateField(null=True, blank=True, verbose_name="Vigente hasta (excluido)")
+    hash_fila = models.CharField(max_length=32, verbose_name="Hash de los atributos versionados")
+
+    class Meta:
+        db_table = 'stock_version'
+        verbose_name = 'Versión de Stock'
+        verbose_name_plural = 'Versiones de Stock'
+        ordering = ['bastidor', 'valid_from']
+        constraints = [
+            models.UniqueConstraint(fields=['bastidor', 'valid_from'], name='stock_version_bastidor_desde_uniq'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['bastidor'],
+                name='stock_version_vigente_idx',
+                condition=models.Q(valid_to__isnull=True),
+            ),
+            models.Index(fields=['valid_from', 'valid_to'], name='stock_version_vigencia_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.bastidor} - {self.marca} {self.modelo} (desde {self.valid_from})"
+
+
+class CargaStock(models.Model):
+    """
+    Registro de cada carga diaria de la tabla stock, con el número de
+    vehículos insertados, actualizados, sin cambios y eliminados.
+
+    También es el punto de control de la ejecución: guarda el último paso
+    confirmado y las opciones con las que se lanzó, para que un reintento
+    continúe desde ahí en lugar de repetir el archivo y la adquisición.
+    """
+
+    MODO_REEMPLAZO = 'reemplazo'
+    MODO_SWAP = 'swap'
+    MODO_INCREMENTAL = 'incremental'
+    MODOS = [
+        (MODO_REEMPLAZO, 'Reemplazo completo'),
+        (MODO_SWAP, 'Tabla staging + intercambio'),
+        (MODO_INCREMENTAL, 'Incremental por bastidor'),
+    ]
+
+    ESTADO_EN_CURSO = 'en_curso'
+    ESTADO_FALLIDA = 'fallida'
+    ESTADO_COMPLETADA = 'completada'
+    ESTADOS = [
+        (ESTADO_EN_CURSO, 'En curso'),
+        (ESTADO_FALLIDA, 'Fallida'),
+        (ESTADO_COMPLETADA, 'Completada'),
+    ]
+
+    # Último paso confirmado; la limpieza (paso 3) se confirma junto con la inserción
+    PASO_NINGUNO = 0
+    PASO_ARCHIVO = 1
+    PASO_ADQUISICION = 2
+    PASO_PUBLICACION = 4
+    PASOS = [
+        (PASO_NINGUNO, 'Sin empezar'),
+        (PASO_ARCHIVO, 'Stock archivado en histórico'),
+        (PASO_ADQUISICION, 'Vehículos adquiridos'),
+        (PASO_PUBLICACION, 'Stock publicado'),
+    ]
+
+    modo = models.CharField(max_length=20, choices=MODOS)
+    fecha_snapshot = models.DateField(db_index=True)
+    fecha_inicio = models.DateTimeField(default=timezone.now)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=ESTADO_EN_CURSO, db_index=True)
+    paso_completado = models.PositiveSmallIntegerField(choices=PASOS, default=PASO_NINGUNO)
+    opciones = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+
+    insertados = models.IntegerField(default=0)
+    actualizados = models.IntegerField(default=0)
+    sin_cambios = models.IntegerField(default=0)
+    eliminados = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'stock_carga'
+        verbose_name = 'Carga de Stock'
+        verbose_name_plural = 'Cargas de Stock'
+        ordering = ['-fecha_inicio']
+
+    def __str__(self):
+        return f"Carga {self.modo} {self.fecha_snapshot}"
+
+
+class VehiculoAdquirido(models.Model):
+    """
+    Vehículos obtenidos en el paso de adquisición (scraping o IA) de una carga.
+
+    Se guardan antes de tocar Stock para que, si la carga falla después, el
+    reintento los reutilice sin volver a scrapear ni pagar de nuevo al LLM.
+    Se eliminan cuando la carga se completa.
+    """
+
+    carga = models.ForeignKey(
+        CargaStock,
+        on_delete=models.CASCADE,
+        related_name='vehiculos_adquiridos'
+    )
+    posicion = models.PositiveIntegerField()
+    datos = models.JSONField(encoder=DjangoJSONEncoder)
+
+    class Meta:
+        db_table = 'stock_carga_vehiculo'
+        verbose_name = 'Vehículo adquirido'
+        verbose_name_plural = 'Vehículos adquiridos'
+        ordering = ['carga', 'posicion']
+        constraints = [
+            models.UniqueConstraint(fields=['carga', 'posicion'], name='stock_carga_vehiculo_posicion_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Vehículo {self.posicion} de la carga {self.carga_id}"
+
+
+class JobRun(models.Model):
+    """
+    Ejecución registrada de un comando de gestión lanzado con --profile,
+    con las métricas del comando completo. Cada paso medido es un JobStep.
+    """
+
+    STATUS_SUCCESS = 'success'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_SUCCESS, 'Correcta'),
+        (STATUS_FAILED, 'Fallida'),
+    ]
+
+    command = models.CharField(max_length=100, db_index=True, verbose_name='Comando')
+    options = models.JSONField(default=dict, blank=True, verbose_name='Opciones')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, verbose_name='Estado')
+    error = models.TextField(blank=True, verbose_name='Error')
+    started_at = models.DateTimeField(default=timezone.now, verbose_name='Inicio')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Fin')
+
+    wall_time = models.FloatField(null=True, blank=True, verbose_name='Tiempo real (s)')
+    cpu_time = models.FloatField(null=True, blank=True, verbose_name='Tiempo de CPU (s)')
+    db_queries = models.IntegerField(null=True, blank=True, verbose_name='Consultas')
+    db_time = models.FloatField(null=True, blank=True, verbose_name='Tiempo en BD (s)')
+    peak_rss = models.BigIntegerField(null=True, blank=True, verbose_name='Pico de memoria (bytes)')
+
+    class Meta:
+        db_table = 'stock_job_run'
+        verbose_name = 'Ejecución de comando'
+        verbose_name_plural = 'Ejecuciones de comandos'
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['command', '-started_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.command} {self.started_at:%Y-%m-%d %H:%M} ({self.status})"
+
+
+class JobStep(models.Model):
+    """Métricas de un paso de una ejecución perfilada y, opcionalmente, su perfil de muestreo"""
+
+    run = models.ForeignKey(
+        JobRun,
+        on_delete=models.CASCADE,
+        related_name='steps',
+        verbose_name='Ejecución'
+    )
+    name = models.CharField(max_length=100, verbose_name='Paso')
+    order = models.PositiveSmallIntegerField(verbose_name='Orden')
+    started_at = models.DateTimeField(verbose_name='Inicio')
+    rows = models.BigIntegerField(default=0, verbose_name='Filas')
+
+    wall_time = models.FloatField(null=True, blank=True, verbose_name='Tiempo real (s)')
+    cpu_time = models.FloatField(null=True, blank=True, verbose_name='Tiempo de CPU (s)')
+    db_queries = models.IntegerField(null=True, blank=True, verbose_name='Consultas')
+    db_time = models.FloatField(null=True, blank=True, verbose_name='Tiempo en BD (s)')
+    peak_rss = models.BigIntegerField(null=True, blank=True, verbose_name='Pico de memoria (bytes)')
+    profile = models.JSONField(default=dict, blank=True, verbose_name='Perfil de muestreo')
+
+    class Meta:
+        db_table = 'stock_job_step'
+        verbose_name = 'Paso de ejecución'
+        verbose_name_plural = 'Pasos de ejecución'
+        ordering = ['run', 'order']
+
+    def __str__(self):
+        return f"{self.name} ({self.run_id})"
+
+
+class CambioStock(models.Model):
+    """
+    Evento de cambio de un vehículo en Stock (outbox de change data capture).
+
+    Lo escriben los triggers de PostgreSQL sobre la tabla stock (apps.stock.cdc),
+    no la aplicación, así que recoge cualquier escritura. Un vehículo borrado y
+    vuelto a insertar en la misma transacción (recarga completa) se registra
+    como una modificación, o no se registra si no cambió nada.
+    """
+
+    OPERACION_ALTA = 'I'
+    OPERACION_MODIFICACION = 'U'
+    OPERACION_BAJA = 'D'
+    OPERACION_VACIADO = 'T'
+    OPERACIONES = [
+        (OPERACION_ALTA, 'Alta'),
+        (OPERACION_MODIFICACION, 'Modificación'),
+        (OPERACION_BAJA, 'Baja'),
+        (OPERACION_VACIADO, 'Vaciado de la tabla'),
+    ]
+
+    bastidor = models.CharField(max_length=50, blank=True, verbose_name='Bastidor (VIN)')
+    operacion = models.CharField(max_length=1, choices=OPERACIONES, verbose_name='Operación')
+    columnas = ArrayField(
+        models.CharField(max_length=100),
+        default=list,
+        blank=True,
+        verbose_name='Columnas modificadas'
+    )
+    version = models.BigIntegerField(verbose_name='Versión (transacción)')
+    fecha = models.DateTimeField(default=timezone.now, verbose_name='Fecha')
+
+    class Meta:
+        db_table = 'stock_cambio'
+        verbose_name = 'Cambio de Stock'
+        verbose_name_plural = 'Cambios de Stock'
+        ordering = ['version', 'id']
+        indexes = [
+            models.Index(fields=['version', 'id'], name='stock_cambio_cursor_idx'),
+            models.Index(fields=['fecha'], name='stock_cambio_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_operacion_display()} {self.bastidor} (v{self.version})"
@@ -0,0 +1,167 @@
+"""
+Paginación por cursor (keyset) para el listado de stock.
+
+En lugar de OFFSET, cada página continúa a partir del último vehículo de la
+anterior: el cursor guarda el valor de la clave de ordenación y el bastidor
+(desempate único), y la página siguiente se lee con una comparación de filas
+(clave, bastidor) > (valor, bastidor) sobre el índice compuesto de esa clave.
+Así la página 500 cuesta lo mismo que la primera, no hace falta COUNT(*) y
+una recarga del stock entre dos páginas no repite ni salta vehículos que no
+hayan cambiado.
+
+Las claves de ordenación admiten nulos, que PostgreSQL coloca al final en
+orden ascendente y al principio en descendente (igual que el índice). Los
+vehículos sin valor se recorren como un tramo aparte ordenado por bastidor.
+"""
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.db import connections
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+# Desempate único de todas las ordenaciones
+CAMPO_DESEMPATE = 'bastidor'
+
+
+class StockCursorPagination(BasePagination):
+    """Paginación por cursor (clave de ordenación, bastidor) para listas de Stock"""
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    # ?paginacion=cursor pide la primera página en este modo
+    mode_query_param = 'paginacion'
+    mode_query_value = 'cursor'
+    invalid_cursor_message = 'Cursor no válido'
+
+    @classmethod
+    def solicitada(cls, request) -> bool:
+        """Indica si la petición usa paginación por cursor"""
+        return (
+            cls.cursor_query_param in request.query_params
+            or request.query_params.get(cls.mode_query_param) == cls.mode_query_value
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        # Solo cuenta el primer campo de la ordenación aplicada por OrderingFilter
+        orden = [
+            o for o in queryset.query.order_by
+            if isinstance(o, str) and o.lstrip('-') != CAMPO_DESEMPATE
+        ]
+        orden = orden[0] if orden else CAMPO_DESEMPATE
+        self.campo = orden.lstrip('-')
+        self.descendente = orden.startswith('-')
+        qn = connections[queryset.db].ops.quote_name
+        self.columnas = (
+            qn(queryset.model._meta.get_field(self.campo).column),
+            qn(queryset.model._meta.get_field(CAMPO_DESEMPATE).column),
+        )
+        posicion = self.decode_cursor(request)
+
+        resultados = []
+        for _, tramo in self._tramos(queryset, posicion):
+            resultados.extend(tramo[:self.page_size + 1 - len(resultados)])
+            if len(resultados) > self.page_size:
+                break
+
+        self.has_next = len(resultados) > self.page_size
+        self.page = resultados[:self.page_size]
+        return self.page
+
+    def _tramos(self, queryset, posicion):
+        """
+        Consultas de los tramos con y sin valor de la clave, en el orden en que
+        se recorren, empezando por el tramo de la posición del cursor
+        """
+        queryset = queryset.order_by()
+        sentido = '-' if self.descendente else ''
+        con_valor = (False, queryset.filter(**{f'{self.campo}__isnull': False}).order_by(
+            f'{sentido}{self.campo}', f'{sentido}{CAMPO_DESEMPATE}'
+        ))
+        sin_valor = (True, queryset.filter(**{f'{self.campo}__isnull': True}).order_by(
+            f'{sentido}{CAMPO_DESEMPATE}'
+        ))
+        if self.campo == CAMPO_DESEMPATE:
+            tramos = [con_valor]
+        else:
+            tramos = [sin_valor, con_valor] if self.descendente else [con_valor, sin_valor]
+
+        if posicion is not None:
+            nulo, valor, bastidor = posicion
+            while tramos and tramos[0][0] != nulo:
+                tramos.pop(0)
+            if not tramos:
+                raise NotFound(self.invalid_cursor_message)
+            tramos[0] = (nulo, tramos[0][1].filter(self._despues_de(nulo, valor, bastidor)))
+
+        return tramos
+
+    def _despues_de(self, nulo, valor, bastidor):
+        """Condición de fila posterior al cursor, como comparación de filas para usar el índice"""
+        operador = '<' if self.descendente else '>'
+        columna, desempate = self.columnas
+        if nulo:
+            return RawSQL(f'{desempate} {operador} %s', [bastidor], output_field=BooleanField())
+        return RawSQL(
+            f'({columna}, {desempate}) {operador} (%s, %s)', [valor, bastidor], output_field=BooleanField()
+        )
+
+    def get_page_size(self, request):
+        try:
+            tamano = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(tamano, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        """Posición (nulo, valor, bastidor) del cursor, o None en la primera página"""
+        codificado = request.query_params.get(self.cursor_query_param)
+        if not codificado:
+            return None
+        try:
+            datos = json.loads(base64.urlsafe_b64decode(codificado.encode('ascii')).decode('utf-8'))
+            return bool(datos['n']), datos['v'], str(datos['b'])
+        except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, vehiculo) -> str:
+        valor = getattr(vehiculo, self.campo)
+        datos = {
+            'n': valor is None,
+            # Decimales y fechas viajan como texto; PostgreSQL los convierte al comparar
+            'v': valor if valor is None or isinstance(valor, (int, float)) else str(valor),
+            'b': vehiculo.bastidor,
+        }
+        return base64.urlsafe_b64encode(json.dumps(datos).encode('utf-8')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.mode_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,193 @@
+"""
+Gestión de las particiones mensuales de stock_historico.
+
+stock_historico está particionada por rango sobre fecha_snapshot, con una
+partición por mes (stock_historico_pAAAA_MM) y una partición por defecto
+que recoge las filas fuera de rango. Las consultas acotadas por
+fecha_snapshot solo leen las particiones afectadas (partition pruning) y
+la retención se aplica eliminando o desacoplando particiones completas.
+"""
+import logging
+import re
+from datetime import date
+from typing import List, Optional, Tuple
+
+from django.db import connections, transaction
+
+from apps.stock.models import Stock, StockHistorico
+
+logger = logging.getLogger(__name__)
+
+TABLA_HISTORICO = StockHistorico._meta.db_table
+PARTICION_DEFECTO = f'{TABLA_HISTORICO}_default'
+
+# Límite hacia atrás al crear particiones a partir de fechas del stock, para
+# que una fecha errónea no genere cientos de particiones (va a la de defecto)
+MESES_MAXIMOS_ATRAS = 12
+
+_RE_PARTICION = re.compile(rf'^{TABLA_HISTORICO}_p(\d{{4}})_(\d{{2}})$')
+
+
+def inicio_de_mes(fecha: date) -> date:
+    """Primer día del mes de la fecha"""
+    return fecha.replace(day=1)
+
+
+def sumar_meses(fecha: date, meses: int) -> date:
+    """Primer día del mes situado `meses` meses después (o antes) del de la fecha"""
+    indice = fecha.year * 12 + fecha.month - 1 + meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def nombre_particion(mes: date) -> str:
+    """Nombre de la partición mensual que contiene la fecha"""
+    return f'{TABLA_HISTORICO}_p{mes.year:04d}_{mes.month:02d}'
+
+
+def listar_particiones(using: str = 'default') -> List[Tuple[str, date]]:
+    """Particiones mensuales existentes como (nombre, primer día del mes), ordenadas por fecha"""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass
+            """,
+            [TABLA_HISTORICO],
+        )
+        nombres = [fila[0] for fila in cursor.fetchall()]
+
+    particiones = []
+    for nombre in nombres:
+        coincidencia = _RE_PARTICION.match(nombre)
+        if coincidencia:
+            particiones.append((nombre, date(int(coincidencia.group(1)), int(coincidencia.group(2)), 1)))
+    return sorted(particiones, key=lambda particion: particion[1])
+
+
+def crear_particion(mes: date, using: str = 'default') -> bool:
+    """
+    Crea la partición mensual del mes indicado si no existe.
+
+    Si la partición por defecto contiene filas de ese mes, se mueven a la
+    nueva partición dentro de la misma transacción.
+
+    Returns:
+        True si se ha creado la partición
+    """
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    desde = inicio_de_mes(mes)
+    hasta = sumar_meses(desde, 1)
+    nombre = nombre_particion(desde)
+
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s)', [nombre])
+        if cursor.fetchone()[0] is not None:
+            return False
+
+        cursor.execute(
+            f'SELECT COUNT(*) FROM {qn(PARTICION_DEFECTO)} '
+            f'WHERE fecha_snapshot >= %s AND fecha_snapshot < %s',
+            [desde, hasta],
+        )
+        pendientes = cursor.fetchone()[0]
+        if pendientes:
+            logger.warning(f"Moviendo {pendientes} filas de {PARTICION_DEFECTO} a {nombre}")
+            cursor.execute(
+                f'CREATE TEMP TABLE {qn("stock_historico_movidas")} '
+                f'(LIKE {qn(TABLA_HISTORICO)})'
+            )
+            cursor.execute(
+                f'WITH movidas AS ('
+                f'DELETE FROM {qn(PARTICION_DEFECTO)} '
+                f'WHERE fecha_snapshot >= %s AND fecha_snapshot < %s RETURNING *'
+                f') INSERT INTO {qn("stock_historico_movidas")} SELECT * FROM movidas',
+                [desde, hasta],
+            )
+
+        cursor.execute(
+            f'CREATE TABLE {qn(nombre)} PARTITION OF {qn(TABLA_HISTORICO)} '
+            f'FOR VALUES FROM (%s) TO (%s)',
+            [desde, hasta],
+        )
+
+        if pendientes:
+            cursor.execute(
+                f'INSERT INTO {qn(TABLA_HISTORICO)} SELECT * FROM {qn("stock_historico_movidas")}'
+            )
+            # Se elimina ya y no al confirmar: la transacción exterior puede crear
+            # varias particiones seguidas y cada una necesita la tabla vacía
+            cursor.execute(f'DROP TABLE {qn("stock_historico_movidas")}')
+
+    logger.info(f"Partición {nombre} creada [{desde}, {hasta})")
+    return True
+
+
+def asegurar_particiones(desde: date, hasta: date, using: str = 'default') -> int:
+    """
+    Crea las particiones mensuales que falten entre los meses de `desde` y `hasta` (incluidos).
+
+    Returns:
+        Número de particiones creadas
+    """
+    creadas = 0
+    mes = inicio_de_mes(desde)
+    while mes <= hasta:
+        if crear_particion(mes, using=using):
+            creadas += 1
+        mes = sumar_meses(mes, 1)
+    return creadas
+
+
+def asegurar_particiones_para_stock(hoy: Optional[date] = None, using: str = 'default') -> int:
+    """
+    Crea las particiones necesarias para archivar el stock actual y las
+    del mes en curso y el siguiente.
+    """
+    hoy = hoy or date.today()
+    connection = connections[using]
+    qn = connection.ops.quote_name
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT MIN(fecha_snapshot) FROM {qn(Stock._meta.db_table)}')
+        minima = cursor.fetchone()[0]
+
+    desde = max(min(minima or hoy, hoy), sumar_meses(hoy, -MESES_MAXIMOS_ATRAS))
+    return asegurar_particiones(desde, sumar_meses(hoy, 1), using=using)
+
+
+def purgar_particiones(antes_de: date, desacoplar: bool = False, using: str = 'default') -> List[str]:
+    """
+    Elimina (o desacopla) las particiones mensuales anteriores al mes de `antes_de`.
+
+    Cada partición se descarta completa con DROP TABLE o DETACH PARTITION,
+    sin recorrer sus filas.
+
+    Args:
+        antes_de: Se purgan las particiones cuyo mes es anterior al de esta fecha
+        desacoplar: Si es True, las particiones se desacoplan y se conservan
+            como tablas independientes en lugar de eliminarse
+
+    Returns:
+        Nombres de las particiones purgadas
+    """
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    limite = inicio_de_mes(antes_de)
+    purgadas = []
+
+    for nombre, mes in listar_particiones(using=using):
+        if mes >= limite:
+            break
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            if desacoplar:
+                cursor.execute(f'ALTER TABLE {qn(TABLA_HISTORICO)} DETACH PARTITION {qn(nombre)}')
+            else:
+                cursor.execute(f'DROP TABLE {qn(nombre)}')
+        purgadas.append(nombre)
+        logger.info(f"Partición {nombre} {'desacoplada' if desacoplar else 'eliminada'}")
+
+    return purgadas
@@ -0,0 +1,331 @@
+"""
+Registro y perfilado de ejecuciones de comandos de gestión.
+
+Con --profile cada ejecución queda guardada como JobRun y cada paso medido
+como JobStep: tiempo real, tiempo de CPU, consultas y tiempo en base de
+datos, pico de memoria residente y, con --profile-muestreo, las funciones
+en las que más tiempo se pasó según un profiler de muestreo.
+
+Las mediciones se acumulan en memoria y se guardan al terminar el comando,
+fuera de las transacciones de sus pasos, para que un paso revertido no se
+lleve su registro.
+"""
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from django.db import connections
+from django.utils import timezone
+
+from apps.stock.benchmark import MedidorMemoria
+
+logger = logging.getLogger(__name__)
+
+# Funciones que se guardan en el perfil de muestreo de cada paso
+FUNCIONES_PERFIL = 25
+INTERVALO_MUESTREO = 0.01
+
+# Opciones comunes de Django que no aportan nada al registro
+OPCIONES_IGNORADAS = {
+    'stdout', 'stderr', 'settings', 'pythonpath', 'traceback', 'no_color',
+    'force_color', 'skip_checks', 'verbosity', 'profile', 'profile_muestreo',
+}
+
+
+class ContadorTiempoConsultas:
+    """Execute wrapper de Django que cuenta las consultas y suma su duración"""
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas += 1
+            self.segundos += time.perf_counter() - inicio
+
+
+class PerfiladorMuestreo:
+    """
+    Profiler de muestreo: cada intervalo toma la pila del hilo medido y cuenta
+    cuántas veces aparece cada función (acumulado) y cuántas está en la cima
+    (tiempo propio). No instrumenta el código, así que su coste es constante.
+    """
+
+    def __init__(self, intervalo: float = INTERVALO_MUESTREO):
+        self.intervalo = intervalo
+        self.muestras = 0
+        self.acumulado = Counter()
+        self.propio = Counter()
+        self._hilo_medido = threading.get_ident()
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+
+    def _muestrear(self):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self._hilo_medido)
+            if frame is None:
+                continue
+            self.muestras += 1
+            self.propio[self._funcion(frame)] += 1
+            vistas = set()
+            while frame is not None:
+                vistas.add(self._funcion(frame))
+                frame = frame.f_back
+            self.acumulado.update(vistas)
+
+    @staticmethod
+    def _funcion(frame) -> str:
+        return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}"
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._parar.set()
+        self._hilo.join()
+
+    def resumen(self, limite: int = FUNCIONES_PERFIL) -> Dict:
+        """Funciones con más muestras, con su porcentaje sobre el total"""
+        def top(contador):
+            return [
+                {'funcion': funcion, 'muestras': muestras, 'porcentaje': round(100 * muestras / self.muestras, 1)}
+                for funcion, muestras in contador.most_common(limite)
+            ]
+
+        if not self.muestras:
+            return {}
+        return {
+            'intervalo': self.intervalo,
+            'muestras': self.muestras,
+            'acumulado': top(self.acumulado),
+            'propio': top(self.propio),
+        }
+
+
+@contextmanager
+def _medicion(using: str, muestreo: bool):
+    """Mide un bloque y deja las métricas en el diccionario que se cede"""
+    metricas = {}
+    contador = ContadorTiempoConsultas()
+    memoria = MedidorMemoria()
+    perfilador = PerfiladorMuestreo() if muestreo else None
+    try:
+        with memoria, connections[using].execute_wrapper(contador):
+            inicio, inicio_cpu = time.perf_counter(), time.process_time()
+            try:
+                if perfilador:
+                    with perfilador:
+                        yield metricas
+                else:
+                    yield metricas
+            finally:
+                metricas.update({
+                    'wall_time': round(time.perf_counter() - inicio, 4),
+                    'cpu_time': round(time.process_time() - inicio_cpu, 4),
+                    'db_queries': contador.consultas,
+                    'db_time': round(contador.segundos, 4),
+                })
+    finally:
+        metricas['peak_rss'] = memoria.pico
+        metricas['profile'] = perfilador.resumen() if perfilador else {}
+
+
+class Perfil:
+    """
+    Perfil de una ejecución. Sin --profile es inerte: los pasos se ejecutan
+    igual pero no se mide ni se guarda nada.
+    """
+
+    def __init__(self, command: str, opciones: Optional[Dict] = None, activo: bool = False,
+                 muestreo: bool = False, using: str = 'default'):
+        self.command = command
+        self.opciones = opciones or {}
+        self.activo = activo or muestreo
+        self.muestreo = muestreo
+        self.using = using
+        self.pasos: List[Dict] = []
+
+    @contextmanager
+    def paso(self, nombre: str):
+        """
+        Mide un paso del comando. Quien lo usa puede asignar paso['filas'].
+
+        Yields:
+            Diccionario del paso; al salir contiene sus métricas
+        """
+        paso = {'name': nombre, 'order': len(self.pasos), 'filas': 0, 'started_at': timezone.now()}
+        if not self.activo:
+            yield paso
+            return
+
+        self.pasos.append(paso)
+        metricas = {}
+        try:
+            with _medicion(self.using, self.muestreo) as metricas:
+                yield paso
+        finally:
+            paso.update(metricas)
+
+    @contextmanager
+    def ejecucion(self):
+        """Mide el comando completo y guarda JobRun y sus JobStep al terminar"""
+        if not self.activo:
+            yield self
+            return
+
+        from apps.stock.models import JobRun
+
+        started_at = timezone.now()
+        estado, error = JobRun.STATUS_SUCCESS, ''
+        metricas = {}
+        try:
+            with _medicion(self.using, muestreo=False) as metricas:
+                yield self
+        except BaseException as e:
+            estado, error = JobRun.STATUS_FAILED, str(e) or e.__class__.__name__
+            raise
+        finally:
+            try:
+                self._guardar(started_at, estado, error, metricas)
+            except Exception as e:
+                logger.error(f"No se pudo guardar el perfil de {self.command}: {str(e)}", exc_info=True)
+
+    def _guardar(self, started_at, estado, error, metricas):
+        from apps.stock.models import JobRun, JobStep
+
+        run = JobRun.objects.create(
+            command=self.command,
+            options=self.opciones,
+            status=estado,
+            error=error,
+            started_at=started_at,
+            finished_at=timezone.now(),
+            wall_time=metricas.get('wall_time'),
+            cpu_time=metricas.get('cpu_time'),
+            db_queries=metricas.get('db_queries'),
+            db_time=metricas.get('db_time'),
+            peak_rss=metricas.get('peak_rss'),
+        )
+        JobStep.objects.bulk_create([
+            JobStep(
+                run=run,
+                name=paso['name'],
+                order=paso['order'],
+                started_at=paso['started_at'],
+                rows=paso['filas'],
+                wall_time=paso.get('wall_time'),
+                cpu_time=paso.get('cpu_time'),
+                db_queries=paso.get('db_queries'),
+                db_time=paso.get('db_time'),
+                peak_rss=paso.get('peak_rss'),
+                profile=paso.get('profile', {}),
+            )
+            for paso in self.pasos
+        ])
+        logger.info(f"Perfil de {self.command} guardado como JobRun {run.pk} ({len(self.pasos)} pasos)")
+        return run
+
+
+class ComandoPerfilable:
+    """
+    Mixin para comandos de gestión que añade --profile y --profile-muestreo.
+
+    El comando mide sus pasos con `with self.perfil.paso('nombre') as paso:`;
+    sin --profile esos bloques no hacen nada adicional.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.perfil = Perfil(command=self._nombre_comando())
+
+    def _nombre_comando(self) -> str:
+        return self.__module__.rsplit('.', 1)[-1]
+
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        parser.add_argument(
+            '--profile',
+            action='store_true',
+            help='Registra la ejecución (JobRun) con tiempo, CPU, consultas y memoria de cada paso'
+        )
+        parser.add_argument(
+            '--profile-muestreo',
+            action='store_true',
+            help='Como --profile, y además guarda un perfil de muestreo de las funciones de cada paso'
+        )
+        return parser
+
+    def execute(self, *args, **options):
+        self.perfil = Perfil(
+            command=self._nombre_comando(),
+            opciones={
+                clave: valor for clave, valor in options.items()
+                if clave not in OPCIONES_IGNORADAS and isinstance(valor, (str, int, float, bool, type(None)))
+            },
+            activo=options.get('profile', False),
+            muestreo=options.get('profile_muestreo', False),
+        )
+        with self.perfil.ejecucion():
+            return super().execute(*args, **options)
+
+
+def tendencias(command: str, ultimas: int = 30) -> Dict:
+    """
+    Evolución de las últimas ejecuciones registradas de un comando, por paso.
+
+    Returns:
+        Diccionario con las ejecuciones (más antigua primero) y, por paso,
+        su serie de métricas, la media y la variación del último valor
+        respecto a la media de los anteriores
+    """
+    from apps.stock.models import JobRun, JobStep
+
+    runs = list(JobRun.objects.filter(command=command).order_by('-started_at')[:ultimas])[::-1]
+    series = {}
+    for step in JobStep.objects.filter(run__in=runs).order_by('run__started_at', 'order'):
+        series.setdefault(step.name, []).append({
+            'run': step.run_id,
+            'started_at': step.started_at,
+            'wall_time': step.wall_time,
+            'cpu_time': step.cpu_time,
+            'db_queries': step.db_queries,
+            'db_time': step.db_time,
+            'peak_rss': step.peak_rss,
+            'rows': step.rows,
+        })
+
+    pasos = []
+    for nombre, serie in series.items():
+        tiempos = [punto['wall_time'] for punto in serie if punto['wall_time'] is not None]
+        anteriores = tiempos[:-1]
+        media_anteriores = sum(anteriores) / len(anteriores) if anteriores else None
+        pasos.append({
+            'name': nombre,
+            'runs': len(serie),
+            'avg_wall_time': round(sum(tiempos) / len(tiempos), 4) if tiempos else None,
+            'last_wall_time': tiempos[-1] if tiempos else None,
+            'variation': round(tiempos[-1] / media_anteriores - 1, 3) if media_anteriores else None,
+            'series': serie,
+        })
+
+    return {
+        'command': command,
+        'runs': [
+            {
+                'id': run.pk, 'started_at': run.started_at, 'status': run.status,
+                'wall_time': run.wall_time, 'cpu_time': run.cpu_time,
+                'db_queries': run.db_queries, 'db_time': run.db_time, 'peak_rss': run.peak_rss,
+            }
+            for run in runs
+        ],
+        'steps': pasos,
+    }
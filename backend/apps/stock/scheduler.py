@@ -1,15 +1,19 @@
 """
 Configuración de tareas programadas para ejecutarse a las 1:00 AM diariamente
+
+El scheduler solo se ejecuta en el proceso dedicado `manage.py run_scheduler`,
+nunca en los workers web ni en otros comandos.
 """
 import logging
 from apscheduler.schedulers.background import BackgroundScheduler
 from django.core.management import call_command
+from django.db import close_old_connections
 
 logger = logging.getLogger(__name__)
 
 
-def schedule_stock_migration():
-    """Configura la migración automática de stock para las 1:00 AM"""
+def crear_scheduler_stock() -> BackgroundScheduler:
+    """Crea (sin iniciarlo) el scheduler con la migración automática de stock a las 1:00 AM"""
     scheduler = BackgroundScheduler()
 
     # Agregar trabajo: ejecutar migrate_stock_and_scrape a las 1:00 AM todos los días
@@ -22,18 +26,18 @@ def schedule_stock_migration():
         name='Migración diaria de Stock',
         replace_existing=True,
         max_instances=1,
+        # Si el relevo de líder ocurre cerca de la hora, se ejecuta igualmente una sola vez
+        coalesce=True,
+        misfire_grace_time=3600,
     )
-
-    # Iniciar el scheduler si no está ya en ejecución
-    if not scheduler.running:
-        scheduler.start()
-        logger.info("✅ APScheduler iniciado - Migración de Stock programada para 01:00 AM")
+    return scheduler
 
 
 def _run_stock_migration():
     """Ejecuta el comando de migración de stock"""
     try:
         logger.info("🚀 Iniciando migración programada de Stock...")
+        close_old_connections()
         call_command(
             'migrate_stock_and_scrape',
             paginas=5,
@@ -43,3 +47,5 @@ def _run_stock_migration():
         logger.info("✅ Migración de Stock completada exitosamente")
     except Exception as e:
         logger.error(f"❌ Error en migración programada: {str(e)}", exc_info=True)
+    finally:
+        close_old_connections()
@@ -1,6 +1,7 @@
 """
 Módulo de scraping para obtener datos de vehículos de coches.net
 """
+import hashlib
 import logging
 import random
 from datetime import datetime, timedelta
@@ -8,10 +9,13 @@ from decimal import Decimal
 from typing import Dict, List, Optional, Tuple
 import uuid
 
-import requests
-from bs4 import BeautifulSoup
+from django.conf import settings
 from django.utils import timezone
 
+from apps.stock.cache_http import CacheHTTP
+from apps.stock.extractores import ExtractorBeautifulSoup, extraer_paginas
+from apps.stock.fetcher import Fetcher
+
 logger = logging.getLogger(__name__)
 
 # Configuración de headers para simular navegador real
@@ -24,6 +28,8 @@ HEADERS = {
     'Upgrade-Insecure-Requests': '1'
 }
 
+URL_COCHES_NET = "https://www.coches.net/segunda-mano/"
+
 # Marcas y modelos de ejemplo para datos faltantes
 MARCAS_COMUNES = ['BMW', 'Mercedes-Benz', 'Audi', 'Volkswagen', 'Ford', 'Renault', 'Peugeot',
                    'Citroën', 'Opel', 'Fiat', 'Toyota', 'Honda', 'Mazda', 'Hyundai', 'Kia']
@@ -52,29 +58,81 @@ CONCESIONARIOS_PRINCIPALES = [
 ]
 
 
-def generar_bastidor() -> str:
+# Caracteres válidos de un VIN (sin I, O ni Q)
+CARACTERES_BASTIDOR = 'ABCDEFGHJKLMNPRSTUVWXYZ0123456789'
+
+URL_BASE_ANUNCIOS = 'https://www.coches.net'
+
+# Fecha a partir de la que se generan las fechas de relleno de los anuncios
+# identificados: al ser fija, el mismo anuncio produce los mismos datos en cada
+# carga y la carga incremental lo reconoce como sin cambios
+FECHA_REFERENCIA_RELLENO = datetime(2025, 1, 1)
+
+
+def generar_bastidor(rng=None) -> str:
     """Genera un número de bastidor (VIN) válido de forma aleatoria"""
+    rng = rng or random
     # VIN tiene 17 caracteres
-    caracteres = 'ABCDEFGHJKLMNPRSTUVWXYZ0123456789'
-    return ''.join(random.choice(caracteres) for _ in range(17))
+    return ''.join(rng.choice(CARACTERES_BASTIDOR) for _ in range(17))
+
+
+def bastidor_anuncio(datos_vehiculo: Dict) -> Optional[str]:
+    """
+    Bastidor estable de un anuncio scrapeado.
+
+    Se deriva del identificador del anuncio en coches.net (o de su enlace si
+    no lo tiene), de modo que el mismo anuncio conserva el bastidor entre
+    cargas. Devuelve None si el vehículo no tiene ninguno de los dos.
+    """
+    identidad = datos_vehiculo.get('id_anuncio') or datos_vehiculo.get('url_anuncio')
+    if not identidad:
+        return None
+    numero = int.from_bytes(hashlib.sha256(f'coches.net:{identidad}'.encode('utf-8')).digest(), 'big')
+    caracteres = []
+    for _ in range(17):
+        numero, resto = divmod(numero, len(CARACTERES_BASTIDOR))
+        caracteres.append(CARACTERES_BASTIDOR[resto])
+    return ''.join(caracteres)
+
+
+def generador_relleno(bastidor: Optional[str]) -> Tuple[random.Random, datetime]:
+    """
+    Generador aleatorio y fecha de referencia para los campos de relleno.
+
+    Con bastidor, el generador se inicializa con él y la fecha es fija, así
+    que los campos inventados no cambian de una carga a otra; sin bastidor
+    los datos son aleatorios y relativos a hoy, como siempre.
+    """
+    if bastidor:
+        return random.Random(bastidor), FECHA_REFERENCIA_RELLENO
+    return random.Random(), datetime.now()
 
 
-def generar_matricula() -> str:
+def generar_matricula(rng=None) -> str:
     """Genera una matrícula española válida de forma aleatoria"""
+    rng = rng or random
     # Formato español: 4 números + 3 letras
-    numeros = ''.join(random.choice('0123456789') for _ in range(4))
-    letras = ''.join(random.choice('BCDFGHJKLMNPRSTVWXYZ') for _ in range(3))
+    numeros = ''.join(rng.choice('0123456789') for _ in range(4))
+    letras = ''.join(rng.choice('BCDFGHJKLMNPRSTVWXYZ') for _ in range(3))
     return f"{numeros}{letras}"
 
 
-def generar_datos_faltantes() -> Dict:
-    """Genera datos faltantes de forma aleatoria y realista"""
-    marca = random.choice(MARCAS_COMUNES)
-    modelo = random.choice(MODELOS_POR_MARCA.get(marca, ['Modelo Genérico']))
+def generar_datos_faltantes(rng=None, referencia: Optional[datetime] = None) -> Dict:
+    """
+    Genera datos faltantes de forma aleatoria y realista
 
-    fecha_matricula = datetime.now() - timedelta(days=random.randint(30, 3650))
-    dias_stock = random.randint(1, 365)
-    precio = Decimal(str(random.randint(5000, 150000)))
+    Args:
+        rng: Generador aleatorio (por defecto el del módulo random)
+        referencia: Fecha respecto a la que se generan las fechas (por defecto ahora)
+    """
+    rng = rng or random
+    referencia = referencia or datetime.now()
+    marca = rng.choice(MARCAS_COMUNES)
+    modelo = rng.choice(MODELOS_POR_MARCA.get(marca, ['Modelo Genérico']))
+
+    fecha_matricula = referencia - timedelta(days=rng.randint(30, 3650))
+    dias_stock = rng.randint(1, 365)
+    precio = Decimal(str(rng.randint(5000, 150000)))
 
     # Datos técnicos
     combustibles = ['Gasolina', 'Diésel', 'Híbrido', 'Eléctrico', 'GLP']
@@ -85,29 +143,46 @@ def generar_datos_faltantes() -> Dict:
         'marca': marca,
         'modelo': modelo,
         'modelo_comercial': modelo,
-        'version': f"{modelo} {random.choice(['1.0', '1.6', '2.0', '2.5', '3.0'])}",
+        'version': f"{modelo} {rng.choice(['1.0', '1.6', '2.0', '2.5', '3.0'])}",
         'anio_matricula': fecha_matricula.year,
-        'color': random.choice(COLORES),
-        'color_secundario': random.choice(COLORES),
-        'kilometros': random.randint(1000, 250000),
+        'color': rng.choice(COLORES),
+        'color_secundario': rng.choice(COLORES),
+        'kilometros': rng.randint(1000, 250000),
         'precio_venta': precio,
-        'importe_compra': Decimal(str(float(precio) * random.uniform(0.90, 1.00))),
-        'importe_costo': Decimal(str(float(precio) * random.uniform(0.90, 1.00))),
+        'importe_compra': Decimal(str(float(precio) * rng.uniform(0.90, 1.00))),
+        'importe_costo': Decimal(str(float(precio) * rng.uniform(0.90, 1.00))),
         'dias_stock': dias_stock,
         'fecha_matriculacion': fecha_matricula.date(),
-        'fecha_recepcion': fecha_matricula.date() + timedelta(days=random.randint(0, 30)),
+        'fecha_recepcion': fecha_matricula.date() + timedelta(days=rng.randint(0, 30)),
         # Nuevos campos técnicos
-        'combustible': random.choice(combustibles),
-        'transmision': random.choice(transmisiones),
-        'tipo_vehiculo': random.choice(tipos_vehiculos),
-        'cilindrada': random.randint(1000, 5000),
-        'potencia': random.randint(75, 500),
-        'peso': random.randint(1000, 2500),
-        'puertas': random.choice([3, 5]),
-        'plazas': random.choice([5, 7]),
+        'combustible': rng.choice(combustibles),
+        'transmision': rng.choice(transmisiones),
+        'tipo_vehiculo': rng.choice(tipos_vehiculos),
+        'cilindrada': rng.randint(1000, 5000),
+        'potencia': rng.randint(75, 500),
+        'peso': rng.randint(1000, 2500),
+        'puertas': rng.choice([3, 5]),
+        'plazas': rng.choice([5, 7]),
     }
 
 
+def completar_vehiculo(datos: Dict) -> Dict:
+    """
+    Agrega datos generados aleatoriamente para los campos no encontrados en el HTML
+
+    Si el anuncio tiene identificador, fija su bastidor y genera siempre los
+    mismos datos de relleno para él.
+    """
+    bastidor = datos.get('bastidor') or bastidor_anuncio(datos)
+    if bastidor:
+        datos['bastidor'] = bastidor
+    datos_generados = generar_datos_faltantes(*generador_relleno(bastidor))
+    for campo, valor in datos_generados.items():
+        if campo not in datos:
+            datos[campo] = valor
+    return datos
+
+
 def extraer_informacion_vehiculo(elemento_html) -> Optional[Dict]:
     """
     Extrae la información de un vehículo del HTML de coches.net
@@ -119,108 +194,107 @@ def extraer_informacion_vehiculo(elemento_html) -> Optional[Dict]:
         Diccionario con los datos del vehículo o None si no se puede extraer
     """
     try:
-        datos = {}
+        return completar_vehiculo(ExtractorBeautifulSoup().extraer_elemento(elemento_html))
+    except Exception as e:
+        logger.error(f"Error extrayendo información del vehículo: {str(e)}")
+        return None
 
-        # Intenta extraer información del título
-        titulo = elemento_html.get_text(strip=True)
 
-        # Extrae precio
-        precio_elem = elemento_html.find(class_='price')
-        if precio_elem:
-            precio_text = precio_elem.get_text(strip=True).replace('€', '').replace('.', '').replace(',', '.')
-            try:
-                datos['precio_venta'] = Decimal(precio_text)
-            except:
-                pass
-
-        # Extrae kilómetros
-        km_elem = elemento_html.find(class_='km')
-        if km_elem:
-            km_text = km_elem.get_text(strip=True).replace('km', '').replace('.', '')
-            try:
-                datos['kilometros'] = int(km_text)
-            except:
-                pass
-
-        # Extrae año
-        año_elem = elemento_html.find(class_='year')
-        if año_elem:
-            año_text = año_elem.get_text(strip=True)
-            try:
-                datos['anio_matricula'] = int(año_text)
-            except:
-                pass
+def _procesar_paginas(contenidos: List[bytes], paginas: List[int], extractor: str = 'lxml',
+                      procesos: int = 1) -> List[List[Dict]]:
+    """Extrae los vehículos de varias páginas, opcionalmente en un pool de procesos"""
+    resultados = extraer_paginas(contenidos, extractor=extractor, procesos=procesos)
+    for pagina, datos_pagina in zip(paginas, resultados):
+        logger.info(f"Encontrados {len(datos_pagina)} vehículos en página {pagina}")
+    return [[completar_vehiculo(datos) for datos in datos_pagina] for datos_pagina in resultados]
 
-        # Agrega datos generados aleatoriamente para campos no encontrados
-        datos_generados = generar_datos_faltantes()
-        for campo, valor in datos_generados.items():
-            if campo not in datos:
-                datos[campo] = valor
 
-        return datos
-
-    except Exception as e:
-        logger.error(f"Error extrayendo información del vehículo: {str(e)}")
-        return None
+def urls_coches_net(paginas: int, url_base: str = URL_COCHES_NET) -> List[str]:
+    """URLs de las páginas de listado a descargar"""
+    return [f"{url_base}?page={pagina}" if pagina > 1 else url_base for pagina in range(1, paginas + 1)]
 
 
-def scrape_coches_net(paginas: int = 1, retraso_segundos: float = 2.0) -> List[Dict]:
+def scrape_coches_net(paginas: int = 1, retraso_segundos: Optional[float] = None,
+                      concurrencia: Optional[int] = None, peticiones_por_segundo: Optional[float] = None,
+                      url_base: str = URL_COCHES_NET, cache: Optional[CacheHTTP] = None,
+                      extractor: Optional[str] = None, procesos: Optional[int] = None) -> List[Dict]:
     """
     Scrape de vehículos desde coches.net
 
+    Las páginas se descargan concurrentemente con un pool de conexiones
+    persistentes y un límite de tasa por host (ver apps.stock.fetcher).
+
     Args:
         paginas: Número de páginas a descargar
-        retraso_segundos: Retraso entre solicitudes
+        retraso_segundos: Intervalo medio mínimo entre peticiones al host; si se
+            indica sustituye a peticiones_por_segundo (equivale a 1 / retraso)
+        concurrencia: Peticiones simultáneas (default: settings.SCRAPER_CONCURRENCIA)
+        peticiones_por_segundo: Tasa máxima por host (default: settings.SCRAPER_PETICIONES_POR_SEGUNDO)
+        url_base: URL del listado
+        cache: Caché HTTP en disco; las páginas que no han cambiado (304 o
+            mismo hash del cuerpo) reutilizan los vehículos ya extraídos
+        extractor: Backend de extracción, "lxml" o "bs4" (default: settings.SCRAPER_EXTRACTOR)
+        procesos: Procesos entre los que se reparte el parseo (default: settings.SCRAPER_PROCESOS)
 
     Returns:
         Lista de diccionarios con información de vehículos
     """
+    if peticiones_por_segundo is None:
+        peticiones_por_segundo = (
+            1 / retraso_segundos if retraso_segundos else settings.SCRAPER_PETICIONES_POR_SEGUNDO
+        )
+
     vehiculos = []
-    url_base = "https://www.coches.net/segunda-mano/"
+    urls = urls_coches_net(paginas, url_base)
+    fetcher = Fetcher(
+        concurrencia=concurrencia or settings.SCRAPER_CONCURRENCIA,
+        peticiones_por_segundo=peticiones_por_segundo,
+        reintentos=settings.SCRAPER_REINTENTOS,
+        headers=HEADERS,
+        cache=cache,
+    )
 
     try:
-        for pagina in range(1, paginas + 1):
-            try:
-                # Agregar parámetro de página si es necesario
-                url = f"{url_base}?page={pagina}" if pagina > 1 else url_base
-
-                logger.info(f"Scrapeando página {pagina}: {url}")
-
-                # Realizar solicitud HTTP
-                respuesta = requests.get(url, headers=HEADERS, timeout=10)
-                respuesta.raise_for_status()
-
-                # Parsear HTML
-                soup = BeautifulSoup(respuesta.content, 'html.parser')
-
-                # Buscar elementos de vehículos (ajustar selectores según estructura real del sitio)
-                elementos_vehiculos = soup.find_all('div', class_='vehicle-item')
-
-                if not elementos_vehiculos:
-                    # Si no encuentra con esa clase, intentar otras opciones comunes
-                    elementos_vehiculos = soup.find_all('div', class_='advert')
-
-                if not elementos_vehiculos:
-                    elementos_vehiculos = soup.find_all('article', class_='car')
-
-                logger.info(f"Encontrados {len(elementos_vehiculos)} vehículos en página {pagina}")
-
-                for elemento in elementos_vehiculos:
-                    info_vehiculo = extraer_informacion_vehiculo(elemento)
-                    if info_vehiculo:
-                        vehiculos.append(info_vehiculo)
-
-                # Retraso entre solicitudes
-                import time
-                time.sleep(retraso_segundos)
-
-            except requests.exceptions.RequestException as e:
-                logger.warning(f"Error al descargar página {pagina}: {str(e)}")
+        logger.info(f"Scrapeando {len(urls)} páginas con concurrencia {fetcher.concurrencia} "
+                    f"y {peticiones_por_segundo:.2f} peticiones/s")
+        respuestas = fetcher.descargar(urls)
+
+        # Páginas que hay que procesar: las que no se pueden servir desde la caché
+        pendientes = []
+        for pagina, (url, respuesta) in enumerate(zip(urls, respuestas), start=1):
+            if respuesta is None:
+                logger.warning(f"Error al descargar página {pagina}")
                 continue
+            en_cache = cache.resultado_en_cache(url, respuesta) if cache else None
+            if en_cache is not None:
+                vehiculos.extend(en_cache)
+            elif respuesta.status_code == 304:
+                logger.warning(f"Página {pagina} no modificada pero sin entrada en caché")
+            else:
+                pendientes.append((pagina, url, respuesta))
+
+        if pendientes:
+            try:
+                resultados = _procesar_paginas(
+                    [respuesta.content for _, _, respuesta in pendientes],
+                    [pagina for pagina, _, _ in pendientes],
+                    extractor=extractor or settings.SCRAPER_EXTRACTOR,
+                    procesos=procesos or settings.SCRAPER_PROCESOS,
+                )
+            except Exception as e:
+                logger.error(f"Error procesando páginas: {str(e)}")
+                resultados = []
+
+            for (pagina, url, respuesta), vehiculos_pagina in zip(pendientes, resultados):
+                if cache:
+                    cache.guardar(url, respuesta, vehiculos_pagina)
+                vehiculos.extend(vehiculos_pagina)
 
     except Exception as e:
         logger.error(f"Error general en scraping: {str(e)}")
 
+    if cache:
+        logger.info(f"Caché HTTP del scraping: {cache.estadisticas()}")
     logger.info(f"Total de vehículos scrapeados: {len(vehiculos)}")
     return vehiculos
 
@@ -234,122 +308,136 @@ def crear_registro_stock(datos_vehiculo: Dict) -> Dict:
 
     Returns:
         Diccionario con campos del modelo Stock
+
+    Los campos que la fuente no proporciona se inventan. Si el vehículo tiene
+    bastidor (propio o derivado del anuncio), se inventan siempre igual para
+    que la carga incremental no lo cuente como actualizado en cada ejecución.
     """
-    concesionario = random.choice(CONCESIONARIOS_PRINCIPALES)
+    bastidor = datos_vehiculo.get('bastidor') or bastidor_anuncio(datos_vehiculo)
+    rng, referencia = generador_relleno(bastidor)
+    bastidor = bastidor or generar_bastidor(rng)
+    hoy = referencia.date()
+    concesionario = rng.choice(CONCESIONARIOS_PRINCIPALES)
+    url_anuncio = datos_vehiculo.get('url_anuncio')
+    if url_anuncio and url_anuncio.startswith('/'):
+        url_anuncio = f'{URL_BASE_ANUNCIOS}{url_anuncio}'
+
+    def uuid_relleno() -> str:
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
 
     return {
-        'bastidor': generar_bastidor(),
-        'idv': random.randint(1000000, 9999999),
+        'bastidor': bastidor,
+        'idv': rng.randint(1000000, 9999999),
         'fecha_informe': int(datetime.now().strftime('%Y%m%d')),
         'id_concesionario': concesionario['id'],
         'nom_concesionario': concesionario['nombre'],
         'dealer_corto': concesionario['nombre'][:15],
-        'matricula': generar_matricula(),
-        'vehicle_key': generar_bastidor(),
-        'vehicle_key2': generar_bastidor(),
+        'matricula': generar_matricula(rng),
+        'vehicle_key': generar_bastidor(rng),
+        'vehicle_key2': generar_bastidor(rng),
         'fecha_matriculacion': datos_vehiculo.get('fecha_matriculacion',
-                                                   datetime.now().date() - timedelta(days=random.randint(30, 3650))),
+                                                   hoy - timedelta(days=rng.randint(30, 3650))),
         'fecha_recepcion': datos_vehiculo.get('fecha_recepcion',
-                                              datetime.now().date() - timedelta(days=random.randint(0, 30))),
-        'id_proveedor': f"PROV{random.randint(1000, 9999)}",
-        'nom_proveedor': f"Proveedor {random.choice(['Nacional', 'Importado', 'Premium'])}",
-        'marca': datos_vehiculo.get('marca', random.choice(MARCAS_COMUNES)),
+                                              hoy - timedelta(days=rng.randint(0, 30))),
+        'id_proveedor': f"PROV{rng.randint(1000, 9999)}",
+        'nom_proveedor': f"Proveedor {rng.choice(['Nacional', 'Importado', 'Premium'])}",
+        'marca': datos_vehiculo.get('marca', rng.choice(MARCAS_COMUNES)),
         'modelo': datos_vehiculo.get('modelo', 'Modelo'),
         'modelo_comercial': datos_vehiculo.get('modelo_comercial', 'Comercial'),
-        'id_modelo': f"MOD{random.randint(100000, 999999)}",
-        'anio_matricula': datos_vehiculo.get('anio_matricula', datetime.now().year - random.randint(0, 15)),
-        'color': datos_vehiculo.get('color', random.choice(COLORES)),
+        'id_modelo': f"MOD{rng.randint(100000, 999999)}",
+        'anio_matricula': datos_vehiculo.get('anio_matricula', hoy.year - rng.randint(0, 15)),
+        'color': datos_vehiculo.get('color', rng.choice(COLORES)),
         'color_secundario': datos_vehiculo.get('color_secundario', 'N/A'),
-        'cod_color': f"COL{random.randint(100, 999)}",
-        'id_color': f"IDCOL{random.randint(100, 999)}",
-        'kilometros': datos_vehiculo.get('kilometros', random.randint(1000, 250000)),
-        'ubicacion': random.choice(PROVINCIAS),
-        'provincia': random.choice(PROVINCIAS),
+        'cod_color': f"COL{rng.randint(100, 999)}",
+        'id_color': f"IDCOL{rng.randint(100, 999)}",
+        'kilometros': datos_vehiculo.get('kilometros', rng.randint(1000, 250000)),
+        'ubicacion': rng.choice(PROVINCIAS),
+        'provincia': rng.choice(PROVINCIAS),
         'id_tipo_vo': 'VO001',
         'descripcion_tipo_vo': 'Vehículo de Ocasión',
-        'id_estado': random.choice(['DISP', 'RESERV', 'VEND']),
-        'descripcion_estado': random.choice(['Disponible', 'Reservado', 'Vendido']),
-        'tipo_stock': random.choice(['STOCK', 'SPECIAL', 'PROMOCION']),
-        'reservado': random.choice([True, False]),
-        'dias_stock': datos_vehiculo.get('dias_stock', random.randint(1, 365)),
-        'intervalo_dias': f"0-{random.randint(30, 90)}",
-        'meses_en_stock': Decimal(str(random.uniform(0.5, 12))),
-        'dias_stock_fin_mes': random.randint(1, 365),
-        'intervalo_dias_fin_mes': f"0-{random.randint(30, 90)}",
-        'intervalo_dias_vo': f"0-{random.randint(30, 90)}",
-        'intervalo_dias_vo_new': f"0-{random.randint(30, 90)}",
+        'id_estado': rng.choice(['DISP', 'RESERV', 'VEND']),
+        'descripcion_estado': rng.choice(['Disponible', 'Reservado', 'Vendido']),
+        'tipo_stock': rng.choice(['STOCK', 'SPECIAL', 'PROMOCION']),
+        'reservado': rng.choice([True, False]),
+        'dias_stock': datos_vehiculo.get('dias_stock', rng.randint(1, 365)),
+        'intervalo_dias': f"0-{rng.randint(30, 90)}",
+        'meses_en_stock': Decimal(str(rng.uniform(0.5, 12))),
+        'dias_stock_fin_mes': rng.randint(1, 365),
+        'intervalo_dias_fin_mes': f"0-{rng.randint(30, 90)}",
+        'intervalo_dias_vo': f"0-{rng.randint(30, 90)}",
+        'intervalo_dias_vo_new': f"0-{rng.randint(30, 90)}",
         'intervalo_km': '0-100000',
-        'interv_km_id': f"KM{random.randint(1, 5)}",
-        'uds_disponibles_stock': random.randint(1, 50),
-        'uds_reservadas_stock': random.randint(0, 10),
-        'stock_uds': random.randint(1, 50),
-        'pedido': f"PED{random.randint(100000, 999999)}",
-        'categoria': random.choice(['SUV', 'Berlina', 'Familiar', 'Coupé', 'Monovolumen']),
-        'canal_entrada_vo': random.choice(['DIRECTO', 'SUBASTA', 'PERMUTA']),
-        'concepto_compra': random.choice(['COMPRA', 'TRUEQUE', 'ALMONEDA']),
+        'interv_km_id': f"KM{rng.randint(1, 5)}",
+        'uds_disponibles_stock': rng.randint(1, 50),
+        'uds_reservadas_stock': rng.randint(0, 10),
+        'stock_uds': rng.randint(1, 50),
+        'pedido': f"PED{rng.randint(100000, 999999)}",
+        'categoria': rng.choice(['SUV', 'Berlina', 'Familiar', 'Coupé', 'Monovolumen']),
+        'canal_entrada_vo': rng.choice(['DIRECTO', 'SUBASTA', 'PERMUTA']),
+        'concepto_compra': rng.choice(['COMPRA', 'TRUEQUE', 'ALMONEDA']),
         'importe_compra': datos_vehiculo.get('importe_compra',
-                                            Decimal(str(random.randint(5000, 100000)))),
+                                            Decimal(str(rng.randint(5000, 100000)))),
         'importe_rectificativas': Decimal('0'),
         'importe_reacon': Decimal('0'),
         'importe_vales': Decimal('0'),
         'importe_costo': datos_vehiculo.get('importe_costo',
-                                           Decimal(str(random.randint(4000, 80000)))),
-        'importe_coste_total': Decimal(str(random.randint(4000, 100000))),
+                                           Decimal(str(rng.randint(4000, 80000)))),
+        'importe_coste_total': Decimal(str(rng.randint(4000, 100000))),
         'precio_venta': datos_vehiculo.get('precio_venta',
-                                          Decimal(str(random.randint(5000, 150000)))),
-        'precio_anterior': Decimal(str(random.randint(5000, 150000))),
-        'precio_nuevo': Decimal(str(random.randint(5000, 150000))),
+                                          Decimal(str(rng.randint(5000, 150000)))),
+        'precio_anterior': Decimal(str(rng.randint(5000, 150000))),
+        'precio_nuevo': Decimal(str(rng.randint(5000, 150000))),
         'diferencia_precios': Decimal('0'),
-        'stock_benef_estimado': Decimal(str(random.randint(500, 50000))),
-        'publicado': random.choice([True, False]),
-        'id_internet': f"INT{random.randint(100000, 999999)}",
-        'link_internet': f"https://www.coches.net/vehiculo/{random.randint(100000, 999999)}.html",
-        'internet_eurotax_compra': Decimal(str(random.randint(5000, 100000))),
-        'internet_eurotax_venta': Decimal(str(random.randint(5000, 150000))),
-        'internet_anuncios': random.randint(1, 10),
-        'internet_precio_min': Decimal(str(random.randint(5000, 100000))),
-        'internet_precio_max': Decimal(str(random.randint(100000, 150000))),
+        'stock_benef_estimado': Decimal(str(rng.randint(500, 50000))),
+        'publicado': rng.choice([True, False]),
+        'id_internet': datos_vehiculo.get('id_anuncio') or f"INT{rng.randint(100000, 999999)}",
+        'link_internet': url_anuncio or f"https://www.coches.net/vehiculo/{rng.randint(100000, 999999)}.html",
+        'internet_eurotax_compra': Decimal(str(rng.randint(5000, 100000))),
+        'internet_eurotax_venta': Decimal(str(rng.randint(5000, 150000))),
+        'internet_anuncios': rng.randint(1, 10),
+        'internet_precio_min': Decimal(str(rng.randint(5000, 100000))),
+        'internet_precio_max': Decimal(str(rng.randint(100000, 150000))),
         'precio_internet': datos_vehiculo.get('precio_venta',
-                                             Decimal(str(random.randint(5000, 150000)))),
-        'internet_fotos': random.randint(5, 50),
-        'internet_autorizado': random.choice([True, False]),
-        'status_imaweb': random.choice(['ACTIVO', 'INACTIVO', 'PENDIENTE']),
-        'status_car_imaweb': random.choice(['OK', 'FALTA_DATOS', 'ERROR']),
-        'fecha_primera_publicacion': datetime.now().date() - timedelta(days=random.randint(1, 365)),
-        'fecha_ultima_publicacion': datetime.now().date(),
-        'antiguedad_anuncio': random.randint(1, 365),
-        'dias_primera_public': random.randint(1, 365),
-        'uc_dias': random.randint(1, 365),
-        'internet_dias_public': random.randint(1, 365),
+                                             Decimal(str(rng.randint(5000, 150000)))),
+        'internet_fotos': rng.randint(5, 50),
+        'internet_autorizado': rng.choice([True, False]),
+        'status_imaweb': rng.choice(['ACTIVO', 'INACTIVO', 'PENDIENTE']),
+        'status_car_imaweb': rng.choice(['OK', 'FALTA_DATOS', 'ERROR']),
+        'fecha_primera_publicacion': hoy - timedelta(days=rng.randint(1, 365)),
+        'fecha_ultima_publicacion': hoy,
+        'antiguedad_anuncio': rng.randint(1, 365),
+        'dias_primera_public': rng.randint(1, 365),
+        'uc_dias': rng.randint(1, 365),
+        'internet_dias_public': rng.randint(1, 365),
         'tmaimg': 'FULL_HD',
-        'tiene_video': random.choice([True, False]),
-        'visitas_totales': random.randint(10, 10000),
-        'llamadas_recibidas': random.randint(0, 100),
-        'emails_recibidos': random.randint(0, 100),
-        'visitas_cambio': random.randint(0, 1000),
-        'leads_cambio': random.randint(0, 50),
-        'visitas_cambio_dias': random.randint(0, 100),
-        'leads_cambio_dias': random.randint(0, 10),
-        'flag_lead': random.choice([True, False]),
-        'stock_leads': random.randint(0, 50),
-        'prediction': random.choice(['VENTA_PROXIMA', 'LENTA', 'MEDIA', 'RAPIDA']),
-        'uds_mes': random.randint(0, 10),
-        'uds_3mes': random.randint(0, 30),
-        'uds_ano': random.randint(0, 100),
-        'ultimo_cambio': f"CAMBIO{random.randint(1, 100)}",
-        'ult_cambio': f"CAMBIO{random.randint(1, 100)}",
-        'fecha_ultimo_cambio': datetime.now().date() - timedelta(days=random.randint(0, 30)),
-        'fecha_ultimo_cambio_2': datetime.now().date() - timedelta(days=random.randint(0, 30)),
-        'fecha_ult_cambio': datetime.now().date() - timedelta(days=random.randint(0, 30)),
-        'dias_desde_ult_cambio': random.randint(0, 30),
-        'bastidor_qbi': generar_bastidor(),
-        'id_calidad_marca': str(uuid.uuid4()),
-        'fecha_ultima_foto_optipix': timezone.now() - timedelta(days=random.randint(0, 30)),
-        'id_vehiculo_foto_optipix': str(uuid.uuid4()),
-        'dias_desde_foto_optipix': random.randint(0, 30),
-        'status_foto': random.choice(['OK', 'INCOMPLETA', 'PENDIENTE']),
-        'id_veces_pospuesto': str(uuid.uuid4()),
-        'veces_pospuesto': random.randint(0, 5),
+        'tiene_video': rng.choice([True, False]),
+        'visitas_totales': rng.randint(10, 10000),
+        'llamadas_recibidas': rng.randint(0, 100),
+        'emails_recibidos': rng.randint(0, 100),
+        'visitas_cambio': rng.randint(0, 1000),
+        'leads_cambio': rng.randint(0, 50),
+        'visitas_cambio_dias': rng.randint(0, 100),
+        'leads_cambio_dias': rng.randint(0, 10),
+        'flag_lead': rng.choice([True, False]),
+        'stock_leads': rng.randint(0, 50),
+        'prediction': rng.choice(['VENTA_PROXIMA', 'LENTA', 'MEDIA', 'RAPIDA']),
+        'uds_mes': rng.randint(0, 10),
+        'uds_3mes': rng.randint(0, 30),
+        'uds_ano': rng.randint(0, 100),
+        'ultimo_cambio': f"CAMBIO{rng.randint(1, 100)}",
+        'ult_cambio': f"CAMBIO{rng.randint(1, 100)}",
+        'fecha_ultimo_cambio': hoy - timedelta(days=rng.randint(0, 30)),
+        'fecha_ultimo_cambio_2': hoy - timedelta(days=rng.randint(0, 30)),
+        'fecha_ult_cambio': hoy - timedelta(days=rng.randint(0, 30)),
+        'dias_desde_ult_cambio': rng.randint(0, 30),
+        'bastidor_qbi': generar_bastidor(rng),
+        'id_calidad_marca': uuid_relleno(),
+        'fecha_ultima_foto_optipix': timezone.make_aware(referencia) - timedelta(days=rng.randint(0, 30)),
+        'id_vehiculo_foto_optipix': uuid_relleno(),
+        'dias_desde_foto_optipix': rng.randint(0, 30),
+        'status_foto': rng.choice(['OK', 'INCOMPLETA', 'PENDIENTE']),
+        'id_veces_pospuesto': uuid_relleno(),
+        'veces_pospuesto': rng.randint(0, 5),
         'xxx': 'DATO_ADICIONAL',
         'fecha_snapshot': datetime.now().date(),
     }
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Stock, StockHistorico
+from .models import JobRun, JobStep, Stock, StockHistorico, StockVersion
 
 
 class StockListSerializer(serializers.ModelSerializer):
@@ -120,3 +120,69 @@ class StockHistoricoSerializer(serializers.ModelSerializer):
             'fecha_snapshot',
         ]
         read_only_fields = fields
+
+
+class StockHistoricoListSerializer(serializers.ModelSerializer):
+    """Serializer para listar el inventario de un día del histórico (mismos campos que el listado de stock)"""
+
+    class Meta:
+        model = StockHistorico
+        fields = StockListSerializer.Meta.fields + ['fecha_snapshot']
+        read_only_fields = fields
+
+
+class StockVersionListSerializer(serializers.ModelSerializer):
+    """Serializer para listar el inventario de un día a partir de las versiones vigentes"""
+
+    # Día consultado, anotado en el queryset (las versiones no tienen fecha de snapshot)
+    fecha_snapshot = serializers.DateField(read_only=True)
+
+    class Meta:
+        model = StockVersion
+        fields = StockListSerializer.Meta.fields + ['fecha_snapshot', 'valid_from', 'valid_to']
+        read_only_fields = fields
+
+
+class JobStepSerializer(serializers.ModelSerializer):
+    """Serializer para las métricas de un paso de una ejecución perfilada"""
+
+    class Meta:
+        model = JobStep
+        fields = [
+            'order',
+            'name',
+            'started_at',
+            'rows',
+            'wall_time',
+            'cpu_time',
+            'db_queries',
+            'db_time',
+            'peak_rss',
+            'profile',
+        ]
+        read_only_fields = fields
+
+
+class JobRunSerializer(serializers.ModelSerializer):
+    """Serializer para una ejecución perfilada de un comando con sus pasos"""
+
+    steps = JobStepSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = JobRun
+        fields = [
+            'id',
+            'command',
+            'options',
+            'status',
+            'error',
+            'started_at',
+            'finished_at',
+            'wall_time',
+            'cpu_time',
+            'db_queries',
+            'db_time',
+            'peak_rss',
+            'steps',
+        ]
+        read_only_fields = fields
@@ -0,0 +1,81 @@
+"""
+Operaciones set-based sobre las tablas de stock.
+
+Copian filas directamente en la base de datos (INSERT ... SELECT) sin
+instanciar modelos en Python, de modo que el coste en memoria no depende
+del tamaño del inventario.
+"""
+import logging
+from datetime import date
+from typing import List, Optional
+
+from django.db import connections
+
+from apps.stock.models import Stock, StockHistorico
+
+logger = logging.getLogger(__name__)
+
+# Columnas de StockHistorico que no se copian desde Stock
+COLUMNAS_EXCLUIDAS_HISTORICO = {'id', 'fecha_insert', 'fecha_actualizacion'}
+
+
+def columnas_historico() -> List[str]:
+    """
+    Devuelve las columnas que se copian de stock a stock_historico.
+
+    Son las columnas concretas comunes a ambos modelos, excepto la clave
+    primaria del histórico y los metadatos de inserción/actualización.
+    """
+    columnas_stock = {campo.column for campo in Stock._meta.concrete_fields}
+    return [
+        campo.column
+        for campo in StockHistorico._meta.concrete_fields
+        if campo.column in columnas_stock and campo.column not in COLUMNAS_EXCLUIDAS_HISTORICO
+    ]
+
+
+def snapshot_stock_a_historico(using: str = 'default', fecha_snapshot: Optional[date] = None) -> int:
+    """
+    Copia todo el contenido de stock a stock_historico con un único
+    INSERT ... SELECT ejecutado en el servidor.
+
+    Es idempotente: los vehículos que ya tienen fila en el histórico con la
+    misma fecha_snapshot no se vuelven a copiar, así que repetir el archivo
+    (una carga reintentada tras la medianoche o con --desde-cero) no duplica
+    el histórico.
+
+    Args:
+        using: Alias de la base de datos
+        fecha_snapshot: Si se indica, se guarda como fecha_snapshot de todas
+            las filas en lugar de copiar la de cada vehículo
+
+    Returns:
+        Número de filas archivadas
+    """
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    columnas = columnas_historico()
+    destino = ', '.join(qn(columna) for columna in columnas)
+    # fecha_snapshot es la clave de partición del histórico y no admite nulos
+    fecha = '%s' if fecha_snapshot else f'COALESCE(s.{qn("fecha_snapshot")}, CURRENT_DATE)'
+    origen = ', '.join(
+        fecha if columna == 'fecha_snapshot' else f's.{qn(columna)}'
+        for columna in columnas
+    )
+    parametros = [fecha_snapshot, fecha_snapshot] if fecha_snapshot else None
+    historico = qn(StockHistorico._meta.db_table)
+
+    sql = (
+        f'INSERT INTO {historico} '
+        f'({destino}, {qn("fecha_insert")}, {qn("fecha_actualizacion")}) '
+        f'SELECT {origen}, NOW(), NOW() FROM {qn(Stock._meta.db_table)} s '
+        f'WHERE NOT EXISTS (SELECT 1 FROM {historico} h '
+        f'WHERE h.{qn("bastidor")} = s.{qn("bastidor")} AND h.{qn("fecha_snapshot")} = {fecha})'
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, parametros)
+        filas = cursor.rowcount
+
+    logger.info(f"Snapshot de stock a histórico: {filas} filas copiadas")
+    return filas
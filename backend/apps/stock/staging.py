@@ -0,0 +1,211 @@
+"""
+Refresco del stock mediante tabla de staging e intercambio atómico.
+
+El nuevo inventario se construye en una tabla paralela (stock_staging)
+mientras la API sigue leyendo la tabla stock actual. Al terminar se
+publica con un par de RENAME dentro de una transacción muy corta, de modo
+que los lectores ven siempre el snapshot anterior completo o el nuevo
+completo.
+
+Los índices de la tabla staging se crean con los mismos nombres que los
+de stock (con un prefijo temporal) y se renombran al publicar, para que
+el esquema resultante coincida con el que esperan las migraciones. Los
+triggers de captura de cambios (apps.stock.cdc) no se copian con LIKE: al
+publicar se registra la diferencia entre ambas tablas y se recrean.
+"""
+import logging
+import re
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from django.db import OperationalError, connections, transaction
+from psycopg2.extras import execute_values
+
+from apps.stock.cdc import crear_triggers, registrar_diferencias
+from apps.stock.models import Stock
+
+logger = logging.getLogger(__name__)
+
+TABLA_STAGING = 'stock_staging'
+TABLA_ANTERIOR = 'stock_anterior'
+PREFIJO_INDICE_STAGING = 'stg_'
+
+# Tiempo máximo que el intercambio espera el bloqueo antes de reintentar,
+# para no dejar encolados a los lectores de la API detrás del ALTER TABLE
+LOCK_TIMEOUT_SWAP = '500ms'
+INTENTOS_SWAP = 10
+
+LOTE_INSERCION = 500
+
+_RE_INDEXDEF = re.compile(r'^CREATE (UNIQUE )?INDEX \S+ ON (?:ONLY )?\S+ USING ')
+
+
+def _indices_de_tabla(cursor, tabla: str) -> List[Tuple[str, str, Optional[str]]]:
+    """
+    Devuelve (nombre, definición, tipo_constraint) de cada índice de la tabla.
+
+    tipo_constraint es 'p' o 'u' si el índice respalda una PRIMARY KEY o
+    UNIQUE, y None en otro caso.
+    """
+    cursor.execute(
+        """
+        SELECT i.relname, pg_get_indexdef(i.oid), c.contype
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        LEFT JOIN pg_constraint c ON c.conindid = i.oid AND c.contype IN ('p', 'u')
+        WHERE x.indrelid = %s::regclass
+        ORDER BY i.relname
+        """,
+        [tabla],
+    )
+    return cursor.fetchall()
+
+
+def _crear_indice_staging(cursor, qn, nombre: str, definicion: str, tipo_constraint: Optional[str]):
+    """Recrea sobre la tabla staging un índice de stock con nombre temporal"""
+    nombre_staging = f'{PREFIJO_INDICE_STAGING}{nombre}'
+    unico = 'UNIQUE ' if definicion.startswith('CREATE UNIQUE ') else ''
+    sql = _RE_INDEXDEF.sub(
+        f'CREATE {unico}INDEX {qn(nombre_staging)} ON {qn(TABLA_STAGING)} USING ',
+        definicion,
+        count=1,
+    )
+    cursor.execute(sql)
+    if tipo_constraint:
+        tipo = 'PRIMARY KEY' if tipo_constraint == 'p' else 'UNIQUE'
+        cursor.execute(
+            f'ALTER TABLE {qn(TABLA_STAGING)} '
+            f'ADD CONSTRAINT {qn(nombre_staging)} {tipo} USING INDEX {qn(nombre_staging)}'
+        )
+
+
+def crear_tabla_staging(using: str = 'default'):
+    """
+    Crea una tabla staging vacía con la estructura de stock.
+
+    Solo se crean de entrada la clave primaria y las restricciones UNIQUE;
+    el resto de índices se construyen tras la carga con crear_indices_staging.
+    """
+    connection = connections[using]
+    qn = connection.ops.quote_name
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {qn(TABLA_STAGING)}')
+        cursor.execute(
+            f'CREATE TABLE {qn(TABLA_STAGING)} '
+            f'(LIKE {qn(Stock._meta.db_table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        )
+        for nombre, definicion, tipo_constraint in _indices_de_tabla(cursor, Stock._meta.db_table):
+            if tipo_constraint:
+                _crear_indice_staging(cursor, qn, nombre, definicion, tipo_constraint)
+
+    logger.info(f"Tabla {TABLA_STAGING} creada")
+
+
+def crear_indices_staging(using: str = 'default') -> int:
+    """Construye sobre la tabla staging los índices secundarios de stock"""
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    creados = 0
+
+    with connection.cursor() as cursor:
+        for nombre, definicion, tipo_constraint in _indices_de_tabla(cursor, Stock._meta.db_table):
+            if not tipo_constraint:
+                _crear_indice_staging(cursor, qn, nombre, definicion, None)
+                creados += 1
+        cursor.execute(f'ANALYZE {qn(TABLA_STAGING)}')
+
+    logger.info(f"{creados} índices creados en {TABLA_STAGING}")
+    return creados
+
+
+def insertar_en_tabla(tabla: str, objetos: Iterable[Stock], using: str = 'default') -> int:
+    """
+    Inserta instancias de Stock (sin guardar) en una tabla con la estructura de stock.
+
+    Los valores se preparan igual que en bulk_create y los conflictos de
+    clave se ignoran.
+
+    Returns:
+        Número de filas insertadas
+    """
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    campos = Stock._meta.concrete_fields
+    columnas = ', '.join(qn(campo.column) for campo in campos)
+
+    filas = [
+        tuple(campo.get_db_prep_save(campo.pre_save(objeto, True), connection) for campo in campos)
+        for objeto in objetos
+    ]
+    sql = f'INSERT INTO {qn(tabla)} ({columnas}) VALUES %s ON CONFLICT DO NOTHING'
+    insertadas = 0
+
+    with connection.cursor() as cursor:
+        for i in range(0, len(filas), LOTE_INSERCION):
+            execute_values(cursor.cursor, sql, filas[i:i + LOTE_INSERCION], page_size=LOTE_INSERCION)
+            insertadas += cursor.cursor.rowcount
+
+    return insertadas
+
+
+def insertar_en_staging(objetos: Iterable[Stock], using: str = 'default') -> int:
+    """Inserta instancias de Stock (sin guardar) en la tabla staging"""
+    return insertar_en_tabla(TABLA_STAGING, objetos, using=using)
+
+
+def publicar_staging(using: str = 'default') -> int:
+    """
+    Intercambia atómicamente la tabla staging por stock.
+
+    El bloqueo exclusivo se pide con un lock_timeout corto y se reintenta,
+    de forma que ningún lector espera más que ese tiempo.
+
+    Returns:
+        Número de vehículos de stock que no están en la staging (eliminados)
+    """
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    tabla = Stock._meta.db_table
+
+    for intento in range(1, INTENTOS_SWAP + 1):
+        try:
+            with transaction.atomic(using=using), connection.cursor() as cursor:
+                cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT_SWAP}'")
+                cursor.execute(f'LOCK TABLE {qn(tabla)} IN ACCESS EXCLUSIVE MODE')
+                indices_staging = _indices_de_tabla(cursor, TABLA_STAGING)
+                # El intercambio no pasa por los triggers de captura: se registra la diferencia
+                cambios = registrar_diferencias(cursor, qn(TABLA_STAGING))
+                cursor.execute(
+                    f'SELECT COUNT(*) FROM {qn(tabla)} v WHERE NOT EXISTS '
+                    f'(SELECT 1 FROM {qn(TABLA_STAGING)} n WHERE n.bastidor = v.bastidor)'
+                )
+                eliminados = cursor.fetchone()[0]
+
+                cursor.execute(f'ALTER TABLE {qn(tabla)} RENAME TO {qn(TABLA_ANTERIOR)}')
+                cursor.execute(f'ALTER TABLE {qn(TABLA_STAGING)} RENAME TO {qn(tabla)}')
+                cursor.execute(f'DROP TABLE {qn(TABLA_ANTERIOR)}')
+
+                for nombre, _, _ in indices_staging:
+                    if nombre.startswith(PREFIJO_INDICE_STAGING):
+                        cursor.execute(
+                            f'ALTER INDEX {qn(nombre)} '
+                            f'RENAME TO {qn(nombre[len(PREFIJO_INDICE_STAGING):])}'
+                        )
+                crear_triggers(cursor, qn(tabla))
+            logger.info(
+                f"Tabla {TABLA_STAGING} publicada como {tabla} (intento {intento}, {cambios} cambios registrados)"
+            )
+            return eliminados
+        except OperationalError as e:
+            if intento == INTENTOS_SWAP:
+                raise
+            logger.warning(f"No se obtuvo el bloqueo para publicar {TABLA_STAGING} ({str(e)}), reintentando...")
+            time.sleep(0.2 * intento)
+
+
+def descartar_staging(using: str = 'default'):
+    """Elimina la tabla staging si existe"""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {connection.ops.quote_name(TABLA_STAGING)}')
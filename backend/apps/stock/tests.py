@@ -1,3 +1,1225 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import os
+import re
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+import numpy as np
+import pytest
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.db.models import Avg, Count, F, Sum
+from django.contrib.auth import get_user_model
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .ai_vehicle_generator import AdaptiveBatchSizer, AIVehicleGenerator, StreamingVehicleParser
+from .benchmark import comparar, medir
+from .busqueda import actualizar_vector_busqueda
+from .bloqueos import CLAVE_LIDER_SCHEDULER, CLAVE_MIGRACION_STOCK, Liderazgo
+from .cache_http import CacheHTTP
+from .cdc import leer_cambios
+from .dag import ESTADO_ERROR, ESTADO_OK, ESTADO_OMITIDA, ESTADO_TIMEOUT, Etapa, ejecutar_dag, validar_grafo
+from .derivados import etapas_post_carga, invalidar_derivados, obtener_derivado
+from .extractores import extraer_paginas, parsear_precio
+from .fetcher import Fetcher, TokenBucket
+from .generador_masivo import avanzar_dia, columnas_stock, filas_csv, generar_lote
+from .incremental import aplicar_incremental
+from .management.commands.migrate_stock_and_scrape import Command as MigrateStockCommand
+from .models import CambioStock, CargaStock, JobRun, Stock, StockHistorico, StockVersion, VehiculoAdquirido
+from .perfilado import Perfil, PerfiladorMuestreo
+from .particiones import (
+    PARTICION_DEFECTO, asegurar_particiones, listar_particiones, nombre_particion, purgar_particiones, sumar_meses,
+)
+from .scheduler import crear_scheduler_stock
+from .scrapers import completar_vehiculo, crear_registro_stock, generar_datos_faltantes, scrape_coches_net
+from .snapshot import COLUMNAS_EXCLUIDAS_HISTORICO, columnas_historico, snapshot_stock_a_historico
+from .staging import (
+    TABLA_STAGING, crear_indices_staging, crear_tabla_staging,
+    insertar_en_staging, publicar_staging,
+)
+from .versiones import registrar_versiones
+
+
+def _valores_historico():
+    """Filas de StockHistorico sin los campos que dependen del momento de inserción"""
+    campos = [
+        campo.name for campo in StockHistorico._meta.concrete_fields
+        if campo.column not in COLUMNAS_EXCLUIDAS_HISTORICO
+    ]
+    return list(StockHistorico.objects.order_by('bastidor').values(*campos))
+
+
+@pytest.fixture
+def stock_inicial(db):
+    """Crear un pequeño inventario de prueba"""
+    return Stock.objects.bulk_create([
+        Stock(**crear_registro_stock(generar_datos_faltantes())) for _ in range(25)
+    ])
+
+
+@pytest.fixture
+def comando_migracion():
+    comando = MigrateStockCommand()
+    comando.stdout = StringIO()
+    return comando
+
+
+def test_columnas_historico_cubren_todos_los_campos_de_stock():
+    """Toda columna de Stock con equivalente en histórico se copia"""
+    columnas_stock = {campo.column for campo in Stock._meta.concrete_fields}
+    columnas = set(columnas_historico())
+
+    assert 'tipo_vehiculo' in columnas
+    assert columnas == (columnas_stock - COLUMNAS_EXCLUIDAS_HISTORICO) & {
+        campo.column for campo in StockHistorico._meta.concrete_fields
+    }
+
+
+@pytest.mark.django_db
+def test_snapshot_equivale_a_copia_por_objetos(stock_inicial, comando_migracion):
+    """El modo snapshot produce las mismas filas que la copia columna a columna"""
+    archivados = comando_migracion._migrar_stock_a_historico(modo='objetos')
+    esperado = _valores_historico()
+    StockHistorico.objects.all().delete()
+
+    archivados_snapshot = comando_migracion._migrar_stock_a_historico(modo='snapshot')
+
+    assert archivados == archivados_snapshot == len(stock_inicial)
+    assert _valores_historico() == esperado
+    assert not StockHistorico.objects.filter(fecha_insert__isnull=True).exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('modo', ['snapshot', 'objetos'])
+def test_archivar_dos_veces_no_duplica_el_historico(stock_inicial, comando_migracion, modo):
+    """Repetir el paso 1 con la misma fecha_snapshot (carga reintentada) no vuelve a copiar los vehículos"""
+    fecha = date(2026, 1, 15)
+    assert comando_migracion._migrar_stock_a_historico(modo=modo, fecha_snapshot=fecha) == len(stock_inicial)
+    assert comando_migracion._migrar_stock_a_historico(modo=modo, fecha_snapshot=fecha) == 0
+    assert comando_migracion._migrar_stock_a_historico(modo=modo) == len(stock_inicial)
+
+    repetidos = StockHistorico.objects.values('bastidor', 'fecha_snapshot').annotate(
+        filas=Count('id')
+    ).filter(filas__gt=1)
+    assert not repetidos.exists()
+
+
+@pytest.mark.django_db
+def test_snapshot_sin_stock(comando_migracion):
+    """Con Stock vacío no se archiva nada"""
+    assert comando_migracion._migrar_stock_a_historico(modo='snapshot') == 0
+    assert StockHistorico.objects.count() == 0
+
+
+def _indices_stock():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s", [Stock._meta.db_table])
+        return {fila[0] for fila in cursor.fetchall()}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_swap_publica_staging_con_los_mismos_indices(stock_inicial):
+    """El intercambio sustituye el contenido de stock y conserva los nombres de índices"""
+    indices_antes = _indices_stock()
+    nuevos = [Stock(**crear_registro_stock(generar_datos_faltantes())) for _ in range(10)]
+
+    crear_tabla_staging()
+    assert insertar_en_staging(nuevos) == 10
+    # Mientras se construye la staging, stock sigue mostrando el snapshot anterior
+    assert Stock.objects.count() == len(stock_inicial)
+
+    crear_indices_staging()
+    assert publicar_staging() == len(stock_inicial)
+
+    assert set(Stock.objects.values_list('bastidor', flat=True)) == {v.bastidor for v in nuevos}
+    assert _indices_stock() == indices_antes
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [TABLA_STAGING])
+        assert cursor.fetchone()[0] is None
+
+    # El intercambio registra sus cambios y la nueva tabla conserva los triggers de captura
+    ultimos = CambioStock.objects.order_by('-version', '-id')
+    assert {c.operacion for c in ultimos[:len(stock_inicial) + len(nuevos)]} == {'I', 'D'}
+    Stock.objects.filter(bastidor=nuevos[0].bastidor).update(kilometros=1)
+    assert ultimos.first().bastidor == nuevos[0].bastidor
+
+
+@pytest.mark.django_db
+def test_cdc_registra_cambios_compactos_y_se_consume_por_cursor(stock_inicial):
+    """Los triggers registran altas, modificaciones y bajas; una recarga completa solo deja lo que cambia"""
+    lectura = leer_cambios()
+    assert [c['operacion'] for c in lectura['cambios']] == ['I'] * len(stock_inicial)
+    assert not lectura['hay_mas']
+
+    # Recarga completa: se borra todo y se vuelve a insertar con un solo precio distinto
+    stock_inicial[0].precio_venta += 500
+    Stock.objects.all().delete()
+    Stock.objects.bulk_create(stock_inicial)
+    Stock.objects.filter(bastidor=stock_inicial[1].bastidor).update(kilometros=123456)
+    Stock.objects.filter(bastidor=stock_inicial[2].bastidor).delete()
+
+    lectura = leer_cambios(lectura['cursor'], limite=2)
+    assert [(c['bastidor'], c['operacion'], c['columnas']) for c in lectura['cambios']] == [
+        (stock_inicial[0].bastidor, 'U', ['precio_venta']),
+        (stock_inicial[1].bastidor, 'U', ['kilometros']),
+    ]
+    assert lectura['hay_mas']
+    resto = leer_cambios(lectura['cursor'])
+    assert [(c['bastidor'], c['operacion']) for c in resto['cambios']] == [(stock_inicial[2].bastidor, 'D')]
+    assert leer_cambios(resto['cursor'])['cambios'] == []
+
+    admin = get_user_model().objects.create_superuser(username='admin_cdc', email='c@c.es', password='x')
+    cliente = APIClient()
+    cliente.force_authenticate(user=admin)
+    respuesta = cliente.get('/api/stock/cambios/', {'cursor': lectura['cursor']})
+    assert respuesta.status_code == 200 and respuesta.json()['cursor'] == resto['cursor']
+    assert cliente.get('/api/stock/cambios/', {'cursor': 'no-valido'}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_incremental_clasifica_y_escribe_solo_cambios(stock_inicial):
+    """La carga incremental inserta, actualiza y elimina solo lo que cambia"""
+    actuales = list(Stock.objects.order_by('bastidor'))
+    sin_cambios, cambiado, eliminado = actuales[:-2], actuales[-2], actuales[-1]
+    fecha_actualizacion = {v.bastidor: v.fecha_actualizacion for v in sin_cambios}
+
+    cambiado.precio_venta += 1000
+    nuevo = Stock(**crear_registro_stock(generar_datos_faltantes()))
+    entrante = sin_cambios + [cambiado, nuevo]
+
+    resultado = aplicar_incremental(entrante)
+
+    assert resultado == {
+        'insertados': 1,
+        'actualizados': 1,
+        'sin_cambios': len(sin_cambios),
+        'eliminados': 1,
+    }
+    assert not Stock.objects.filter(bastidor=eliminado.bastidor).exists()
+    assert Stock.objects.get(bastidor=cambiado.bastidor).precio_venta == cambiado.precio_venta
+    assert Stock.objects.filter(bastidor=nuevo.bastidor).exists()
+    # Las filas sin cambios no se reescriben
+    for bastidor, fecha in Stock.objects.filter(
+        bastidor__in=fecha_actualizacion
+    ).values_list('bastidor', 'fecha_actualizacion'):
+        assert fecha == fecha_actualizacion[bastidor]
+
+
+def test_crear_registro_stock_conserva_bastidor_de_origen():
+    """Un bastidor proporcionado por la fuente se mantiene para poder cruzar cargas"""
+    assert crear_registro_stock({'bastidor': 'WVWZZZ1JZXW000001'})['bastidor'] == 'WVWZZZ1JZXW000001'
+
+
+def test_sumar_meses_cruza_anios():
+    assert sumar_meses(date(2026, 11, 15), 2) == date(2027, 1, 1)
+    assert sumar_meses(date(2026, 1, 31), -1) == date(2025, 12, 1)
+    assert nombre_particion(date(2026, 3, 1)) == 'stock_historico_p2026_03'
+
+
+@pytest.mark.django_db
+def test_particiones_historico_y_retencion():
+    """Cada mes va a su partición y la retención descarta particiones completas"""
+    asegurar_particiones(date(2024, 1, 1), date(2024, 3, 1))
+    for mes in (1, 2, 3):
+        StockHistorico.objects.bulk_create([
+            StockHistorico(bastidor=f'B{mes}', fecha_snapshot=date(2024, mes, 10), fecha_insert=timezone.now())
+        ])
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM {nombre_particion(date(2024, 2, 1))}")
+        assert cursor.fetchone()[0] == 1
+
+    purgadas = purgar_particiones(date(2024, 3, 1))
+
+    assert purgadas == ['stock_historico_p2024_01', 'stock_historico_p2024_02']
+    assert list(StockHistorico.objects.values_list('bastidor', flat=True)) == ['B3']
+    assert nombre_particion(date(2024, 1, 1)) not in dict(listar_particiones())
+
+
+@pytest.mark.django_db
+def test_particiones_recolocan_varios_meses_de_la_particion_por_defecto():
+    """Crear en una sola transacción dos particiones con filas en la partición por defecto"""
+    StockHistorico.objects.bulk_create([
+        StockHistorico(bastidor=f'D{mes}', fecha_snapshot=date(2023, mes, 5), fecha_insert=timezone.now())
+        for mes in (4, 5)
+    ])
+
+    with transaction.atomic():
+        assert asegurar_particiones(date(2023, 4, 1), date(2023, 5, 1)) == 2
+
+    with connection.cursor() as cursor:
+        for mes in (4, 5):
+            cursor.execute(f"SELECT bastidor FROM {nombre_particion(date(2023, mes, 1))}")
+            assert cursor.fetchall() == [(f'D{mes}',)]
+        cursor.execute(f"SELECT COUNT(*) FROM {PARTICION_DEFECTO}")
+        assert cursor.fetchone()[0] == 0
+
+
+LISTADO_HTML = (
+    b'<html><body>'
+    b'<div class="vehicle-item"><h2 class="title">Seat Ibiza</h2><span class="price">9.500 \xe2\x82\xac</span></div>'
+    b'<div class="vehicle-item"><h2 class="title">Renault Clio</h2><span class="price">8.900 \xe2\x82\xac</span></div>'
+    b'</body></html>'
+)
+
+
+@pytest.fixture
+def servidor_local():
+    """Servidor HTTP local que sirve un listado con una latencia fija y registra las peticiones"""
+    estado = {'peticiones': 0, 'fallos_pendientes': 0, 'latencia': 0.1, 'cuerpo': LISTADO_HTML, 'etag': None}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                estado['peticiones'] += 1
+                fallar = estado['fallos_pendientes'] > 0
+                if fallar:
+                    estado['fallos_pendientes'] -= 1
+            time.sleep(estado['latencia'])
+            if estado['etag'] and self.headers.get('If-None-Match') == estado['etag']:
+                self.send_response(304)
+                self.end_headers()
+                return
+            cuerpo = estado['cuerpo']
+            self.send_response(503 if fallar else 200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            if estado['etag']:
+                self.send_header('ETag', estado['etag'])
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    estado['url'] = f'http://127.0.0.1:{servidor.server_address[1]}/'
+    yield estado
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_token_bucket_limita_la_tasa():
+    async def consumir():
+        limitador = TokenBucket(tasa=20, capacidad=1)
+        inicio = time.monotonic()
+        for _ in range(6):
+            await limitador.adquirir()
+        return time.monotonic() - inicio
+
+    # El primer token está disponible; los otros 5 esperan 1/20 s cada uno
+    assert asyncio.run(consumir()) >= 0.2
+
+
+def test_fetcher_concurrente_reduce_el_tiempo_total(servidor_local):
+    urls = [f"{servidor_local['url']}?page={pagina}" for pagina in range(1, 9)]
+
+    inicio = time.monotonic()
+    secuencial = Fetcher(concurrencia=1, peticiones_por_segundo=1000).descargar(urls)
+    tiempo_secuencial = time.monotonic() - inicio
+
+    inicio = time.monotonic()
+    concurrente = Fetcher(concurrencia=4, peticiones_por_segundo=1000).descargar(urls)
+    tiempo_concurrente = time.monotonic() - inicio
+
+    assert all(respuesta.status_code == 200 for respuesta in secuencial + concurrente)
+    assert tiempo_concurrente < tiempo_secuencial / 2
+
+
+def test_fetcher_reintenta_errores_transitorios(servidor_local):
+    servidor_local['fallos_pendientes'] = 2
+    fetcher = Fetcher(concurrencia=1, peticiones_por_segundo=1000, reintentos=3, backoff_base=0.01)
+
+    respuestas = fetcher.descargar([servidor_local['url']])
+
+    assert respuestas[0].status_code == 200
+    assert servidor_local['peticiones'] == 3
+
+
+def test_scrape_coches_net_procesa_todas_las_paginas(servidor_local):
+    vehiculos = scrape_coches_net(
+        paginas=3, concurrencia=3, peticiones_por_segundo=1000, url_base=servidor_local['url']
+    )
+
+    assert servidor_local['peticiones'] == 3
+    assert len(vehiculos) == 6
+
+
+def test_cache_http_evita_reprocesar_paginas_sin_cambios(servidor_local, tmp_path, monkeypatch):
+    from . import scrapers
+
+    procesadas = []
+    procesar = scrapers._procesar_paginas
+    monkeypatch.setattr(
+        scrapers, '_procesar_paginas',
+        lambda contenidos, paginas, **kwargs: procesadas.extend(paginas) or procesar(contenidos, paginas, **kwargs),
+    )
+    servidor_local.update(latencia=0, etag='"v1"')
+    opciones = dict(paginas=2, peticiones_por_segundo=1000, url_base=servidor_local['url'])
+
+    primera = CacheHTTP(tmp_path)
+    vehiculos = scrape_coches_net(cache=primera, **opciones)
+    assert primera.aciertos == 0 and len(procesadas) == 2
+
+    # Mismo ETag: el servidor responde 304 y se reutilizan los vehículos guardados
+    segunda = CacheHTTP(tmp_path)
+    assert scrape_coches_net(cache=segunda, **opciones) == vehiculos
+    assert segunda.aciertos_304 == 2 and len(procesadas) == 2
+    assert segunda.bytes_ahorrados == 2 * len(LISTADO_HTML)
+
+    # Sin validadores pero con el mismo cuerpo: acierto por hash
+    servidor_local['etag'] = None
+    tercera = CacheHTTP(tmp_path)
+    scrape_coches_net(cache=tercera, **opciones)
+    assert tercera.aciertos_hash == 2 and tercera.ratio_aciertos == 1.0 and len(procesadas) == 2
+
+    # Contenido nuevo: se vuelve a procesar
+    servidor_local['cuerpo'] = LISTADO_HTML.replace(b'Seat Ibiza', b'Seat Leon')
+    cuarta = CacheHTTP(tmp_path)
+    scrape_coches_net(cache=cuarta, **opciones)
+    assert cuarta.aciertos == 0 and len(procesadas) == 4
+
+
+FIXTURES_HTML = sorted((Path(__file__).parent / 'fixtures' / 'html').glob('*.html'))
+
+
+def test_extractores_devuelven_los_mismos_datos():
+    paginas = [fichero.read_bytes() for fichero in FIXTURES_HTML]
+
+    con_bs4 = extraer_paginas(paginas, extractor='bs4')
+    con_lxml = extraer_paginas(paginas, extractor='lxml')
+    en_paralelo = extraer_paginas(paginas, extractor='lxml', procesos=2)
+
+    assert con_bs4 == con_lxml == en_paralelo
+    assert all(len(vehiculos) == 30 for vehiculos in con_lxml)
+    assert {'precio_venta', 'kilometros', 'anio_matricula', 'id_anuncio', 'url_anuncio'} <= set(con_lxml[0][1])
+
+
+def _registros_scrapeados(pagina):
+    """Registros de Stock de una página tal como los crea una carga: extracción, relleno y registro"""
+    return [crear_registro_stock(completar_vehiculo(datos)) for datos in extraer_paginas([pagina])[0]]
+
+
+def test_anuncio_scrapeado_genera_siempre_el_mismo_registro():
+    """El bastidor sale del identificador del anuncio y el relleno no cambia entre cargas"""
+    pagina = FIXTURES_HTML[0].read_bytes()
+    primera, segunda = _registros_scrapeados(pagina), _registros_scrapeados(pagina)
+
+    assert primera == segunda
+    assert len({registro['bastidor'] for registro in primera}) == 30
+    assert all(registro['link_internet'].startswith('https://www.coches.net/') for registro in primera)
+
+
+@pytest.mark.django_db
+def test_incremental_reconoce_los_anuncios_scrapeados_sin_cambios():
+    """Cargar dos veces el mismo listado scrapeado no escribe ninguna fila la segunda vez"""
+    pagina = FIXTURES_HTML[0].read_bytes()
+    Stock.objects.all().delete()
+
+    primera = aplicar_incremental([Stock(**registro) for registro in _registros_scrapeados(pagina)])
+    assert primera['insertados'] == 30
+    segunda = aplicar_incremental([Stock(**registro) for registro in _registros_scrapeados(pagina)])
+    assert segunda == {'insertados': 0, 'actualizados': 0, 'sin_cambios': 30, 'eliminados': 0}
+
+
+def test_parsear_precio_ignora_textos_no_numericos():
+    assert parsear_precio('12.500 €') == 12500
+    assert parsear_precio('Consultar') is None
+
+
+def test_benchmark_extractores_guarda_resultados(tmp_path):
+    salida = tmp_path / 'benchmark.json'
+    call_command('benchmark_extractores', paginas=4, procesos=1, salida=str(salida), stdout=StringIO())
+
+    resultados = json.loads(salida.read_text())
+    assert {resultado['extractor'] for resultado in resultados} == {'bs4', 'lxml'}
+    assert all(resultado['paginas_por_segundo'] > 0 for resultado in resultados)
+
+
+@pytest.fixture
+def servidor_llm():
+    """Servidor local compatible con la API de chat completions de OpenAI"""
+    estado = {'peticiones': 0, 'en_vuelo': 0, 'max_en_vuelo': 0, 'fallar': {2}, 'latencia': 0.2, 'latencia_trozo': 0.03}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            cuerpo = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            cantidad = int(re.search(r'Genera (\d+) vehículos', cuerpo['messages'][-1]['content']).group(1))
+            with lock:
+                estado['peticiones'] += 1
+                numero = estado['peticiones']
+                estado['en_vuelo'] += 1
+                estado['max_en_vuelo'] = max(estado['max_en_vuelo'], estado['en_vuelo'])
+            time.sleep(estado['latencia'])
+            with lock:
+                estado['en_vuelo'] -= 1
+
+            if numero in estado['fallar']:
+                contenido = 'Lo siento, no puedo generar esos datos'
+            else:
+                contenido = json.dumps({'vehicles': [
+                    {'marca': 'Stub', 'modelo': f'Modelo {i}', 'anio_matricula': 2020, 'precio_venta': 15000}
+                    for i in range(cantidad)
+                ]})
+            if cuerpo.get('stream'):
+                self._responder_en_streaming(cuerpo, numero, contenido)
+                return
+            respuesta = json.dumps({
+                'id': f'chatcmpl-{numero}', 'object': 'chat.completion', 'created': 0, 'model': cuerpo['model'],
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': contenido}}],
+            }).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(respuesta)))
+            self.end_headers()
+            self.wfile.write(respuesta)
+
+        def _responder_en_streaming(self, cuerpo, numero, contenido):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.end_headers()
+            for i in range(0, len(contenido), 40):
+                trozo = {
+                    'id': f'chatcmpl-{numero}', 'object': 'chat.completion.chunk', 'created': 0,
+                    'model': cuerpo['model'],
+                    'choices': [{'index': 0, 'finish_reason': None, 'delta': {'content': contenido[i:i + 40]}}],
+                }
+                self.wfile.write(f'data: {json.dumps(trozo)}\n\n'.encode('utf-8'))
+                self.wfile.flush()
+                time.sleep(estado['latencia_trozo'])
+            self.wfile.write(b'data: [DONE]\n\n')
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    estado['url'] = f'http://127.0.0.1:{servidor.server_address[1]}/v1'
+    yield estado
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_generador_ia_lanza_lotes_en_paralelo_y_aisla_fallos(servidor_llm):
+    generador = AIVehicleGenerator(api_base=servidor_llm['url'], api_key='stub', model='stub', max_in_flight=4)
+
+    inicio = time.monotonic()
+    vehiculos = generador.generate_vehicles(count=40)
+    segundos = time.monotonic() - inicio
+
+    # Lotes de 5: 8 peticiones de 0.2s en serie tardarían 1.6s
+    assert len(vehiculos) == 40
+    assert servidor_llm['max_en_vuelo'] == 4
+    assert segundos < 1.2
+    # Solo el lote que devolvió una respuesta inválida pasa a fallback
+    assert sum(vehiculo['marca'] == 'Stub' for vehiculo in vehiculos) == 40 - 5
+
+
+def test_parser_en_streaming_entrega_cada_vehiculo_al_cerrarse():
+    respuesta = '```json\n' + json.dumps({'vehicles': [
+        {'marca': 'Marca "}]', 'extras': [{'nombre': 'GPS'}], 'posicion': i} for i in range(3)
+    ]}) + '\n```'
+    parser = StreamingVehicleParser()
+
+    por_trozo = [parser.feed(respuesta[i:i + 7]) for i in range(0, len(respuesta), 7)]
+
+    vehiculos = [vehiculo for trozo in por_trozo for vehiculo in trozo]
+    assert [vehiculo['posicion'] for vehiculo in vehiculos] == [0, 1, 2]
+    assert vehiculos[0]['extras'] == [{'nombre': 'GPS'}]
+    # Cada vehículo sale en cuanto llega su llave de cierre, no al final de la respuesta
+    assert sum(1 for trozo in por_trozo if trozo) == 3
+
+
+def test_generador_ia_en_streaming_entrega_vehiculos_antes_de_terminar(servidor_llm):
+    generador = AIVehicleGenerator(api_base=servidor_llm['url'], api_key='stub', model='stub', max_in_flight=4)
+
+    inicio = time.monotonic()
+    llegadas = []
+    vehiculos = []
+    for vehiculo in generador.stream_vehicles(count=20):
+        llegadas.append(time.monotonic() - inicio)
+        vehiculos.append(vehiculo)
+
+    assert len(vehiculos) == 20
+    assert llegadas[0] < llegadas[-1] * 0.7
+    # El lote con respuesta inválida se completa con fallback
+    assert sum(vehiculo['marca'] == 'Stub' for vehiculo in vehiculos) == 15
+
+
+def test_generador_ia_en_streaming_no_espera_a_los_lotes_al_dejar_de_iterar(servidor_llm):
+    servidor_llm['latencia_trozo'] = 0.2
+    generador = AIVehicleGenerator(api_base=servidor_llm['url'], api_key='stub', model='stub', max_in_flight=4)
+
+    vehiculos = generador.stream_vehicles(count=20)
+    next(vehiculos)
+    inicio = time.monotonic()
+    vehiculos.close()
+
+    # Cada lote de 5 tarda en completarse unos 2s más tras el primer vehículo
+    assert time.monotonic() - inicio < 0.5
+
+
+def test_tamano_de_lote_adaptativo():
+    sizer = AdaptiveBatchSizer(initial=8, minimum=2, maximum=12, target_latency=10.0, error_threshold=0.1)
+
+    sizer.record(1.0, ok=True)
+    assert sizer.size == 10
+    sizer.record(1.0, ok=True)
+    sizer.record(1.0, ok=True)
+    assert sizer.size == 12
+
+    sizer.record(15.0, ok=True)
+    assert sizer.size == 9
+    sizer.record(None, ok=False)
+    assert sizer.size == 4
+    # Con la tasa de errores por encima del umbral no vuelve a crecer
+    sizer.record(1.0, ok=True)
+    assert sizer.size == 4
+
+
+def test_generador_masivo_es_determinista_y_respeta_el_modelo():
+    hoy = date(2025, 3, 1)
+    lote = generar_lote(500, np.random.default_rng(7), hoy=hoy)
+    repetido = generar_lote(500, np.random.default_rng(7), hoy=hoy)
+
+    assert list(lote) == columnas_stock()
+    assert all(np.array_equal(lote[columna], repetido[columna]) for columna in lote)
+    for campo in Stock._meta.concrete_fields:
+        if getattr(campo, 'max_length', None) and lote[campo.column].dtype == object:
+            assert max(len(valor) for valor in lote[campo.column]) <= campo.max_length, campo.column
+
+    # Bloques con índices distintos nunca repiten bastidor, aunque compartan semilla
+    otro = generar_lote(500, np.random.default_rng(7), inicio=500, hoy=hoy)
+    assert len(set(lote['bastidor']) | set(otro['bastidor'])) == 1000
+
+
+def test_avanzar_dia_repone_vehiculos_y_exporta_csv():
+    rng = np.random.default_rng(3)
+    lote = generar_lote(200, rng, hoy=date(2025, 3, 1))
+    antes = set(lote['bastidor'])
+
+    nuevos = avanzar_dia(lote, rng, date(2025, 3, 2), rotacion=0.1, inicio_nuevos=200)
+
+    assert nuevos == 20
+    assert len(antes - set(lote['bastidor'])) == 20
+    assert (lote['fecha_snapshot'] == np.datetime64('2025-03-02')).all()
+
+    filas = list(csv.reader(filas_csv(lote, columnas_stock())))
+    assert len(filas) == 200 and len(filas[0]) == len(columnas_stock())
+
+
+@pytest.mark.django_db
+def test_seed_dataset_carga_stock_e_historico_con_copy():
+    call_command('seed_dataset', scale=0.01, dias=3, lote=40, seed=1, stdout=StringIO())
+
+    assert Stock.objects.count() == 100
+    assert StockHistorico.objects.count() == 300
+    assert StockHistorico.objects.values('fecha_snapshot').distinct().count() == 3
+    assert set(Stock.objects.values_list('fecha_snapshot', flat=True)) == {date.today()}
+
+
+def test_medir_registra_tiempo_memoria_y_consultas():
+    with medir('prueba') as resultado:
+        datos = bytearray(50 * 2 ** 20)
+        resultado['filas'] = len(datos)
+
+    assert resultado['consultas'] == 0
+    assert resultado['pico_rss_mb'] >= 50
+    assert resultado['filas_por_segundo'] > 0
+
+
+def test_comparar_marca_regresiones():
+    anteriores = [{'tamano': 10000, 'paso': 'archivo', 'filas_por_segundo': 1000.0},
+                  {'tamano': 10000, 'paso': 'insercion', 'filas_por_segundo': 1000.0}]
+    actuales = [{'tamano': 10000, 'paso': 'archivo', 'filas_por_segundo': 950.0},
+                {'tamano': 10000, 'paso': 'insercion', 'filas_por_segundo': 500.0},
+                {'tamano': 100000, 'paso': 'archivo', 'filas_por_segundo': 900.0}]
+
+    comparacion = comparar(actuales, anteriores, umbral=0.2)
+
+    assert [(fila['paso'], fila['regresion']) for fila in comparacion] == [('archivo', False), ('insercion', True)]
+
+
+@pytest.mark.django_db
+def test_benchmark_pipeline_escribe_resultados(tmp_path):
+    salida = tmp_path / 'pipeline.json'
+    call_command('benchmark_pipeline', tamanos='60', salida=str(salida), confirmar=True, stdout=StringIO())
+
+    informe = json.loads(salida.read_text())
+    assert [r['paso'] for r in informe['resultados']] == ['archivo', 'limpieza', 'adquisicion', 'insercion']
+    assert all(r['filas'] == 60 for r in informe['resultados'])
+    assert Stock.objects.count() == 60
+
+
+def test_el_arranque_de_django_no_inicia_el_scheduler():
+    assert not any(hilo.name == 'APScheduler' for hilo in threading.enumerate())
+
+    scheduler = crear_scheduler_stock()
+    trabajo = scheduler.get_jobs()[0]
+    assert not scheduler.running
+    assert trabajo.id == 'migrate_stock_daily' and trabajo.max_instances == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_liderazgo_con_advisory_lock_es_exclusivo():
+    lider, candidato = Liderazgo(CLAVE_LIDER_SCHEDULER), Liderazgo(CLAVE_LIDER_SCHEDULER)
+    try:
+        assert lider.intentar()
+        assert not candidato.intentar()
+        assert lider.sigue_siendo_lider()
+
+        lider.liberar()
+        assert candidato.intentar()
+    finally:
+        lider.liberar()
+        candidato.liberar()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_migracion_se_omite_si_otra_tiene_el_bloqueo(stock_inicial):
+    otra_ejecucion = Liderazgo(CLAVE_MIGRACION_STOCK)
+    salida = StringIO()
+    try:
+        assert otra_ejecucion.intentar()
+        call_command('migrate_stock_and_scrape', stdout=salida)
+    finally:
+        otra_ejecucion.liberar()
+
+    assert 'Ya hay una migración de Stock en curso' in salida.getvalue()
+    assert Stock.objects.count() == len(stock_inicial)
+    assert StockHistorico.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_migracion_fallida_se_reanuda_sin_repetir_la_adquisicion(stock_inicial, monkeypatch):
+    """Un fallo al insertar deja la carga reanudable desde los vehículos ya adquiridos"""
+    adquisiciones = []
+
+    def scrapear(self, paginas, debug=False, usar_cache=True):
+        adquisiciones.append(paginas)
+        return [generar_datos_faltantes() for _ in range(10)]
+
+    insertar = MigrateStockCommand._insertar_nuevos_vehiculos
+
+    def insertar_con_fallo(self, *args, **kwargs):
+        raise RuntimeError('Fallo simulado al insertar')
+
+    monkeypatch.setattr(MigrateStockCommand, '_scrapeiar_vehiculos', scrapear)
+    monkeypatch.setattr(MigrateStockCommand, '_insertar_nuevos_vehiculos', insertar_con_fallo)
+    with pytest.raises(RuntimeError):
+        call_command('migrate_stock_and_scrape', cantidad=10, stdout=StringIO())
+
+    carga = CargaStock.objects.get()
+    assert carga.estado == CargaStock.ESTADO_FALLIDA
+    assert carga.paso_completado == CargaStock.PASO_ADQUISICION
+    assert VehiculoAdquirido.objects.filter(carga=carga).count() == 10
+    # La limpieza se revierte con la inserción: Stock sigue intacto
+    assert Stock.objects.count() == len(stock_inicial)
+    assert StockHistorico.objects.count() == len(stock_inicial)
+
+    monkeypatch.setattr(MigrateStockCommand, '_insertar_nuevos_vehiculos', insertar)
+    salida = StringIO()
+    call_command('migrate_stock_and_scrape', cantidad=50, stdout=salida)
+
+    carga.refresh_from_db()
+    assert 'Reanudando la ejecución' in salida.getvalue()
+    assert adquisiciones == [5]
+    assert carga.estado == CargaStock.ESTADO_COMPLETADA
+    assert carga.opciones['cantidad'] == 10 and carga.insertados == 10
+    assert Stock.objects.count() == 10
+    assert StockHistorico.objects.count() == len(stock_inicial)
+    assert not VehiculoAdquirido.objects.exists()
+
+    with pytest.raises(CommandError):
+        call_command('migrate_stock_and_scrape', reanudar=carga.pk, stdout=StringIO())
+
+
+def _calculo_costoso(segundos):
+    fin = time.perf_counter() + segundos
+    while time.perf_counter() < fin:
+        sum(range(1000))
+
+
+def test_perfilador_de_muestreo_encuentra_la_funcion_costosa():
+    with PerfiladorMuestreo(intervalo=0.005) as perfilador:
+        _calculo_costoso(0.3)
+
+    resumen = perfilador.resumen()
+    assert resumen['muestras'] > 10
+    assert resumen['acumulado'][0]['porcentaje'] > 90
+    assert any(fila['funcion'].endswith('._calculo_costoso') for fila in resumen['acumulado'])
+
+
+def test_perfil_sin_profile_no_mide_ni_guarda():
+    perfil = Perfil('comando')
+    with perfil.ejecucion(), perfil.paso('paso') as paso:
+        paso['filas'] = 3
+
+    assert perfil.pasos == []
+    assert 'wall_time' not in paso
+
+
+@pytest.mark.django_db
+def test_profile_registra_cada_paso_de_la_migracion(stock_inicial, monkeypatch):
+    monkeypatch.setattr(
+        MigrateStockCommand, '_scrapeiar_vehiculos',
+        lambda self, paginas, debug=False, usar_cache=True: [generar_datos_faltantes() for _ in range(5)]
+    )
+
+    call_command('migrate_stock_and_scrape', cantidad=5, profile_muestreo=True, stdout=StringIO())
+
+    run = JobRun.objects.get()
+    pasos = list(run.steps.order_by('order'))
+    assert run.command == 'migrate_stock_and_scrape' and run.status == JobRun.STATUS_SUCCESS
+    assert run.options['cantidad'] == 5
+    assert [paso.name for paso in pasos] == ['archivo', 'adquisicion', 'limpieza', 'insercion', 'derivados']
+    assert [paso.rows for paso in pasos] == [len(stock_inicial), 5, len(stock_inicial), 5, len(etapas_post_carga())]
+    assert all(paso.wall_time is not None and paso.peak_rss > 0 for paso in pasos)
+    assert pasos[0].db_queries > 0 and run.db_queries >= sum(paso.db_queries for paso in pasos)
+
+    admin = get_user_model().objects.create_superuser(username='admin_jobs', email='a@a.es', password='x')
+    cliente = APIClient()
+    cliente.force_authenticate(user=admin)
+    respuesta = cliente.get('/api/jobs/tendencias/', {'command': 'migrate_stock_and_scrape'})
+
+    assert respuesta.status_code == 200
+    assert [paso['name'] for paso in respuesta.json()['steps']] == [
+        'archivo', 'adquisicion', 'limpieza', 'insercion', 'derivados'
+    ]
+
+
+def test_dag_ejecuta_etapas_en_paralelo_y_aisla_fallos_y_timeouts():
+    etapas = [
+        Etapa('espera_1', 'time.sleep', argumentos=(1.5,), timeout=30),
+        Etapa('espera_2', 'time.sleep', argumentos=(1.5,), timeout=30),
+        Etapa('pid', 'os.getpid', depende_de=('espera_1', 'espera_2'), timeout=30),
+        Etapa('colgada', 'time.sleep', argumentos=(60,), timeout=1),
+        Etapa('fallida', 'math.sqrt', argumentos=(-1,), timeout=30),
+        Etapa('dependiente', 'os.getpid', depende_de=('fallida',), timeout=30),
+    ]
+
+    inicio = time.perf_counter()
+    resultados = ejecutar_dag(etapas, procesos=4)
+    segundos = time.perf_counter() - inicio
+
+    assert {nombre: r['estado'] for nombre, r in resultados.items()} == {
+        'espera_1': ESTADO_OK, 'espera_2': ESTADO_OK, 'pid': ESTADO_OK,
+        'colgada': ESTADO_TIMEOUT, 'fallida': ESTADO_ERROR, 'dependiente': ESTADO_OMITIDA,
+    }
+    assert resultados['pid']['resultado'] != os.getpid()
+    assert 'math domain error' in resultados['fallida']['error']
+    # Las esperas y la etapa colgada se solapan: el total es menor que la suma de las etapas
+    assert segundos < sum(r['segundos'] for r in resultados.values())
+
+    with pytest.raises(ValueError, match='circulares'):
+        validar_grafo([Etapa('a', 'os.getpid', depende_de=('b',)), Etapa('b', 'os.getpid', depende_de=('a',))])
+
+
+def test_derivados_se_leen_de_cache_hasta_invalidar_el_stock():
+    cache.clear()
+    llamadas = []
+
+    def calcular():
+        llamadas.append(1)
+        return {'total': len(llamadas)}
+
+    assert obtener_derivado('prueba', calcular) == {'total': 1}
+    assert obtener_derivado('prueba', calcular) == {'total': 1}
+    assert obtener_derivado('prueba', calcular, 'seat') == {'total': 2}
+
+    invalidar_derivados()
+    assert obtener_derivado('prueba', calcular) == {'total': 3}
+
+
+@pytest.mark.django_db
+def test_versiones_solo_escriben_los_vehiculos_que_cambian(stock_inicial):
+    """El histórico SCD abre versión solo si cambian atributos versionados y se puede repetir un día"""
+    assert registrar_versiones(date(2026, 3, 1)) == {'cerradas': 0, 'abiertas': len(stock_inicial)}
+
+    # Los contadores de días no abren versión; un precio y una baja sí
+    Stock.objects.update(dias_stock=F('dias_stock') + 1)
+    Stock.objects.filter(bastidor=stock_inicial[0].bastidor).update(precio_venta=1)
+    Stock.objects.filter(bastidor=stock_inicial[1].bastidor).delete()
+
+    assert registrar_versiones(date(2026, 3, 2)) == {'cerradas': 2, 'abiertas': 1}
+    assert registrar_versiones(date(2026, 3, 2)) == {'cerradas': 2, 'abiertas': 1}
+    assert StockVersion.objects.count() == len(stock_inicial) + 1
+    assert list(
+        StockVersion.objects.filter(bastidor=stock_inicial[0].bastidor).values_list('valid_from', 'valid_to')
+    ) == [(date(2026, 3, 1), date(2026, 3, 2)), (date(2026, 3, 2), None)]
+    assert StockVersion.objects.get(bastidor=stock_inicial[1].bastidor).valid_to == date(2026, 3, 2)
+    with pytest.raises(ValueError):
+        registrar_versiones(date(2026, 3, 1))
+
+
+@pytest.mark.django_db
+def test_migrar_historico_a_versiones_equivale_al_archivo_diario(stock_inicial):
+    """Los snapshots diarios de StockHistorico se convierten en las mismas versiones"""
+    asegurar_particiones(date(2026, 3, 1), date(2026, 3, 1))
+    snapshot_stock_a_historico(fecha_snapshot=date(2026, 3, 1))
+    Stock.objects.filter(bastidor=stock_inicial[0].bastidor).update(color='Verde lima')
+    snapshot_stock_a_historico(fecha_snapshot=date(2026, 3, 2))
+    snapshot_stock_a_historico(fecha_snapshot=date(2026, 3, 3))
+
+    call_command('migrar_historico_a_versiones', stdout=StringIO())
+
+    assert StockHistorico.objects.count() == 3 * len(stock_inicial)
+    assert StockVersion.objects.count() == len(stock_inicial) + 1
+    assert StockVersion.objects.filter(valid_to__isnull=True).count() == len(stock_inicial)
+    assert StockVersion.objects.get(bastidor=stock_inicial[0].bastidor, valid_to__isnull=True).color == 'Verde lima'
+
+    # Relanzarlo no repite fechas ya registradas
+    salida = StringIO()
+    call_command('migrar_historico_a_versiones', stdout=salida)
+    assert 'No hay fechas' in salida.getvalue()
+
+
+@pytest.mark.django_db
+def test_as_of_devuelve_el_inventario_del_snapshot_de_la_fecha(stock_inicial):
+    """/api/stock/as-of/ lee el último snapshot hasta la fecha con los filtros y la paginación del listado"""
+    asegurar_particiones(date(2026, 3, 1), date(2026, 3, 1))
+    snapshot_stock_a_historico(fecha_snapshot=date(2026, 3, 1))
+    Stock.objects.filter(bastidor=stock_inicial[0].bastidor).update(precio_venta=1)
+    snapshot_stock_a_historico(fecha_snapshot=date(2026, 3, 3))
+
+    usuario = get_user_model().objects.create_user(username='usuario_as_of', password='x')
+    cliente = APIClient()
+    cliente.force_authenticate(user=usuario)
+
+    respuesta = cliente.get('/api/stock/as-of/', {'date': '2026-03-02', 'ordering': 'precio_venta'}).json()
+    assert respuesta['fecha_snapshot'] == '2026-03-01'
+    assert respuesta['count'] == len(stock_inicial) and len(respuesta['results']) == 10
+    assert '1.00' not in [v['precio_venta'] for v in respuesta['results']]
+
+    marca = stock_inicial[0].marca
+    respuesta = cliente.get('/api/stock/as-of/', {'date': '2026-03-03', 'marca': marca, 'page_size': 100}).json()
+    assert respuesta['count'] == Stock.objects.filter(marca=marca).count()
+    assert {v['fecha_snapshot'] for v in respuesta['results']} == {'2026-03-03'}
+    assert stock_inicial[0].bastidor in {v['bastidor'] for v in respuesta['results'] if v['precio_venta'] == '1.00'}
+
+    # Un vehículo archivado dos veces el mismo día aparece una vez, con la última fila
+    StockHistorico.objects.create(
+        bastidor=stock_inicial[0].bastidor, marca=marca, precio_venta=2,
+        fecha_snapshot=date(2026, 3, 3), fecha_insert=timezone.now(),
+    )
+    repetido = cliente.get('/api/stock/as-of/', {'date': '2026-03-03', 'marca': marca, 'page_size': 100}).json()
+    assert repetido['count'] == respuesta['count']
+    assert [v['precio_venta'] for v in repetido['results'] if v['bastidor'] == stock_inicial[0].bastidor] == ['2.00']
+
+    assert cliente.get('/api/stock/as-of/', {'date': '2026-02-28'}).status_code == 404
+    assert cliente.get('/api/stock/as-of/', {'date': 'ayer'}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_as_of_responde_con_las_versiones_tras_pasar_a_modo_versiones(stock_inicial, comando_migracion):
+    """Con --modo-historico versiones los días sin snapshot salen de stock_version, no del último snapshot"""
+    asegurar_particiones(date(2026, 3, 1), date(2026, 3, 1))
+    comando_migracion._migrar_stock_a_historico(modo='snapshot', fecha_snapshot=date(2026, 3, 1))
+    comando_migracion._migrar_stock_a_historico(modo='versiones', fecha_snapshot=date(2026, 3, 5))
+    Stock.objects.filter(bastidor=stock_inicial[0].bastidor).update(precio_venta=1)
+    Stock.objects.filter(bastidor=stock_inicial[1].bastidor).delete()
+    comando_migracion._migrar_stock_a_historico(modo='versiones', fecha_snapshot=date(2026, 3, 10))
+
+    usuario = get_user_model().objects.create_user(username='usuario_as_of_versiones', password='x')
+    cliente = APIClient()
+    cliente.force_authenticate(user=usuario)
+
+    def consultar(fecha):
+        return cliente.get('/api/stock/as-of/', {'date': fecha, 'page_size': 100}).json()
+
+    respuesta = consultar('2026-03-07')
+    assert (respuesta['fecha_snapshot'], respuesta['origen']) == ('2026-03-07', 'versiones')
+    assert respuesta['count'] == len(stock_inicial)
+    assert '1.00' not in [v['precio_venta'] for v in respuesta['results']]
+
+    # Después del último registro vale el estado de ese registro, no el snapshot del día 1
+    respuesta = consultar('2026-03-20')
+    assert (respuesta['fecha_snapshot'], respuesta['origen']) == ('2026-03-10', 'versiones')
+    assert respuesta['count'] == len(stock_inicial) - 1
+    assert [v['precio_venta'] for v in respuesta['results'] if v['bastidor'] == stock_inicial[0].bastidor] == ['1.00']
+
+    assert consultar('2026-03-01')['origen'] == 'snapshot'
+    assert consultar('2026-03-03')['fecha_snapshot'] == '2026-03-01'
+
+
+@pytest.mark.django_db
+def test_timeline_devuelve_la_serie_columnar_del_vehiculo(stock_inicial):
+    """/api/stock/{bastidor}/timeline/ alinea fechas y valores, también si el vehículo ya no está en stock"""
+    vehiculo = stock_inicial[0]
+    asegurar_particiones(date(2026, 3, 1), date(2026, 4, 1))
+    snapshot_stock_a_historico(fecha_snapshot=date(2026, 3, 31))
+    Stock.objects.filter(bastidor=vehiculo.bastidor).update(precio_venta=9000, reservado=True)
+    snapshot_stock_a_historico(fecha_snapshot=date(2026, 4, 1))
+    Stock.objects.filter(bastidor=vehiculo.bastidor).delete()
+
+    usuario = get_user_model().objects.create_user(username='usuario_timeline', password='x')
+    cliente = APIClient()
+    cliente.force_authenticate(user=usuario)
+
+    serie = cliente.get(f'/api/stock/{vehiculo.bastidor}/timeline/').json()
+    assert serie['fechas'] == ['2026-03-31', '2026-04-01']
+    assert serie['precio_venta'][1] == 9000.0
+    assert serie['reservado'] == [vehiculo.reservado, True]
+    assert len(serie['dias_stock']) == len(serie['publicado']) == 2
+
+    assert cliente.get(f'/api/stock/{vehiculo.bastidor}/timeline/', {'desde': '2026-04-01'}).json()['fechas'] == [
+        '2026-04-01'
+    ]
+    StockHistorico.objects.create(
+        bastidor=vehiculo.bastidor, precio_venta=9100, fecha_snapshot=date(2026, 4, 1), fecha_insert=timezone.now()
+    )
+    serie = cliente.get(f'/api/stock/{vehiculo.bastidor}/timeline/').json()
+    assert serie['fechas'] == ['2026-03-31', '2026-04-01'] and serie['precio_venta'][1] == 9100.0
+
+    assert cliente.get('/api/stock/NO-EXISTE/timeline/').status_code == 404
+    assert cliente.get(f'/api/stock/{vehiculo.bastidor}/timeline/', {'hasta': 'ayer'}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_timeline_sigue_con_las_versiones_tras_pasar_a_modo_versiones(stock_inicial, comando_migracion):
+    """Tras el cambio a versiones (y tras purgar los snapshots) la serie sale de stock_version"""
+    vehiculo = stock_inicial[0]
+    asegurar_particiones(date(2026, 3, 1), date(2026, 3, 1))
+    comando_migracion._migrar_stock_a_historico(modo='snapshot', fecha_snapshot=date(2026, 3, 31))
+    comando_migracion._migrar_stock_a_historico(modo='versiones', fecha_snapshot=date(2026, 4, 5))
+    Stock.objects.filter(bastidor=vehiculo.bastidor).update(precio_venta=9000)
+    comando_migracion._migrar_stock_a_historico(modo='versiones', fecha_snapshot=date(2026, 4, 10))
+
+    usuario = get_user_model().objects.create_user(username='usuario_timeline_versiones', password='x')
+    cliente = APIClient()
+    cliente.force_authenticate(user=usuario)
+    url = f'/api/stock/{vehiculo.bastidor}/timeline/'
+
+    serie = cliente.get(url).json()
+    assert serie['fechas'] == ['2026-03-31', '2026-04-05', '2026-04-10']
+    assert serie['precio_venta'][-1] == 9000.0
+    assert cliente.get(url, {'desde': '2026-04-07'}).json()['fechas'] == ['2026-04-07', '2026-04-10']
+
+    StockHistorico.objects.all().delete()
+    assert cliente.get(url).json()['fechas'] == ['2026-04-05', '2026-04-10']
+
+
+@pytest.mark.django_db
+def test_diff_entre_snapshots_devuelve_altas_bajas_y_cambios_por_campo(stock_inicial):
+    """/api/stock/diff/ compara dos días por bastidor e ignora los contadores diarios"""
+    asegurar_particiones(date(2026, 3, 1), date(2026, 3, 1))
+    snapshot_stock_a_historico(fecha_snapshot=date(2026, 3, 1))
+    Stock.objects.update(dias_stock=F('dias_stock') + 1)
+    Stock.objects.filter(bastidor=stock_inicial[0].bastidor).update(precio_venta=1, color='Verde lima')
+    Stock.objects.filter(bastidor=stock_inicial[1].bastidor).delete()
+    nuevo = Stock.objects.create(**crear_registro_stock(generar_datos_faltantes()))
+    snapshot_stock_a_historico(fecha_snapshot=date(2026, 3, 2))
+
+    usuario = get_user_model().objects.create_user(username='usuario_diff', password='x')
+    cliente = APIClient()
+    cliente.force_authenticate(user=usuario)
+
+    respuesta = cliente.get('/api/stock/diff/', {'from': '2026-03-01', 'to': '2026-03-02'})
+    diff = json.loads(b''.join(respuesta.streaming_content))
+    cambios = {c['bastidor']: c for c in diff['cambios']}
+
+    assert diff['total'] == len(cambios) == 3
+    assert [c['bastidor'] for c in diff['cambios']] == sorted(cambios)
+    assert cambios[nuevo.bastidor]['cambio'] == 'alta'
+    assert cambios[stock_inicial[1].bastidor]['cambio'] == 'baja'
+    modificado = cambios[stock_inicial[0].bastidor]
+    assert modificado['cambio'] == 'modificacion' and modificado['precio_venta'] == 1.0
+    assert set(modificado['campos']) == {'precio_venta', 'color'}
+    assert modificado['campos']['color'] == [stock_inicial[0].color, 'Verde lima']
+
+    assert cliente.get('/api/stock/diff/', {'from': '2026-03-01'}).status_code == 400
+    assert cliente.get('/api/stock/diff/', {'from': '2026-03-01', 'to': '2026-03-05'}).status_code == 404
+
+
+@pytest.mark.django_db
+def test_diff_compara_con_las_versiones_tras_pasar_a_modo_versiones(stock_inicial, comando_migracion):
+    """Un día sin snapshot se compara con las versiones vigentes y sin ninguno de los dos da 404"""
+    asegurar_particiones(date(2026, 3, 1), date(2026, 3, 1))
+    comando_migracion._migrar_stock_a_historico(modo='snapshot', fecha_snapshot=date(2026, 3, 1))
+    comando_migracion._migrar_stock_a_historico(modo='versiones', fecha_snapshot=date(2026, 3, 5))
+    Stock.objects.filter(bastidor=stock_inicial[0].bastidor).update(precio_venta=1)
+    Stock.objects.filter(bastidor=stock_inicial[1].bastidor).delete()
+    comando_migracion._migrar_stock_a_historico(modo='versiones', fecha_snapshot=date(2026, 3, 10))
+
+    usuario = get_user_model().objects.create_user(username='usuario_diff_versiones', password='x')
+    cliente = APIClient()
+    cliente.force_authenticate(user=usuario)
+
+    def cambios(desde, hasta):
+        respuesta = cliente.get('/api/stock/diff/', {'from': desde, 'to': hasta})
+        return {c['bastidor']: c['cambio'] for c in json.loads(b''.join(respuesta.streaming_content))['cambios']}
+
+    esperados = {stock_inicial[0].bastidor: 'modificacion', stock_inicial[1].bastidor: 'baja'}
+    assert cambios('2026-03-01', '2026-03-10') == esperados
+    assert cambios('2026-03-07', '2026-03-10') == esperados
+    assert cambios('2026-03-01', '2026-03-07') == {}
+
+    assert cliente.get('/api/stock/diff/', {'from': '2026-02-01', 'to': '2026-03-10'}).status_code == 404
+
+
+@pytest.mark.django_db
+def test_paginacion_por_cursor_recorre_el_stock_sin_repetir_ni_saltar(stock_inicial):
+    """Con ?paginacion=cursor las páginas siguen (clave, bastidor), incluidos los nulos, aunque cambie el stock"""
+    Stock.objects.filter(bastidor__in=[v.bastidor for v in stock_inicial[:3]]).update(precio_venta=None)
+    Stock.objects.filter(bastidor__in=[v.bastidor for v in stock_inicial[3:6]]).update(precio_venta=15000)
+
+    usuario = get_user_model().objects.create_user(username='usuario_cursor', password='x')
+    cliente = APIClient()
+    cliente.force_authenticate(user=usuario)
+
+    ordenaciones = {
+        'precio_venta': ['precio_venta', 'bastidor'],
+        '-precio_venta': ['-precio_venta', '-bastidor'],
+        None: ['-fecha_informe', '-bastidor'],
+    }
+    for ordering, orden_esperado in ordenaciones.items():
+        total = Stock.objects.count()
+        parametros = {'paginacion': 'cursor', 'page_size': 4}
+        if ordering:
+            parametros['ordering'] = ordering
+        respuesta = cliente.get('/api/stock/', parametros).json()
+        assert 'count' not in respuesta
+        vistos = [v['bastidor'] for v in respuesta['results']]
+        if ordering == 'precio_venta':
+            # Una recarga entre páginas no desplaza a los demás vehículos
+            Stock.objects.filter(bastidor=vistos[0]).delete()
+        while respuesta['next']:
+            respuesta = cliente.get(respuesta['next']).json()
+            vistos += [v['bastidor'] for v in respuesta['results']]
+
+        assert len(vistos) == len(set(vistos)) == total
+        esperado = list(Stock.objects.order_by(*orden_esperado).values_list('bastidor', flat=True))
+        assert [b for b in vistos if b in esperado] == esperado
+
+    assert cliente.get('/api/stock/', {'cursor': 'no-valido'}).status_code == 404
+
+
+@pytest.mark.django_db
+def test_busqueda_por_similitud_tolera_erratas_y_ordena_por_relevancia(stock_inicial):
+    """modo "similitud" encuentra marcas mal escritas y abreviadas, y exige todas las palabras"""
+    mercedes, golf = stock_inicial[0], stock_inicial[1]
+    Stock.objects.filter(bastidor=mercedes.bastidor).update(marca='Mercedes-Benz', modelo='Clase C')
+    Stock.objects.filter(bastidor=golf.bastidor).update(marca='Volkswagen', modelo='Golf')
+
+    usuario = get_user_model().objects.create_user(username='usuario_busqueda', password='x')
+    cliente = APIClient()
+    cliente.force_authenticate(user=usuario)
+
+    def buscar(**datos):
+        respuesta = cliente.post('/api/stock/search/?page_size=100', datos, format='json')
+        assert respuesta.status_code == 200
+        return respuesta.json()['results']
+
+    resultados = buscar(query='mercedez', modo='similitud')
+    assert mercedes.bastidor in {v['bastidor'] for v in resultados}
+    assert all(v['marca'].upper().startswith('MERCEDES') for v in resultados)
+
+    resultados = buscar(query='vw golf', modo='similitud')
+    assert golf.bastidor in {v['bastidor'] for v in resultados}
+    assert all(v['modelo'].upper().startswith('GOLF') for v in resultados)
+
+    assert buscar(query='mercedez') == []
+    assert mercedes.bastidor in {v['bastidor'] for v in buscar(query='clase c')}
+    assert cliente.get('/api/stock/', {'search': 'Golf'}).status_code == 200
+    assert cliente.post('/api/stock/search/', {'query': 'x', 'modo': 'otro'}, format='json').status_code == 400
+
+
+@pytest.mark.django_db
+def test_busqueda_texto_completo_ignora_tildes_y_ordena_por_relevancia(stock_inicial):
+    """El vector se recalcula en bloque solo donde cambia y /api/stock/texto/ lo consulta en español"""
+    ateca = stock_inicial[0]
+    Stock.objects.filter(bastidor=ateca.bastidor).update(
+        marca='Seat', modelo='Ateca', categoria='SUV', color='Blanco',
+        descripcion_modelo_qbi='Ateca 2.0 TDI Diésel Automático',
+    )
+    assert actualizar_vector_busqueda() == len(stock_inicial)
+    assert actualizar_vector_busqueda() == 0
+    # El recálculo del vector no es un cambio del vehículo para la captura de cambios
+    assert not CambioStock.objects.filter(columnas__contains=['busqueda']).exists()
+
+    usuario = get_user_model().objects.create_user(username='usuario_texto', password='x')
+    cliente = APIClient()
+    cliente.force_authenticate(user=usuario)
+
+    resultados = cliente.get('/api/stock/texto/', {'q': 'suv diesel automatico blancos'}).json()['results']
+    assert [v['bastidor'] for v in resultados] == [ateca.bastidor]
+
+    resultados = cliente.get('/api/stock/texto/', {'q': 'ocasion', 'marca': 'Seat', 'page_size': 100}).json()
+    assert ateca.bastidor in {v['bastidor'] for v in resultados['results']}
+    assert resultados['count'] == Stock.objects.filter(marca='Seat').count()
+    assert cliente.get('/api/stock/texto/').status_code == 400
+
+
+@pytest.mark.django_db
+def test_facetas_cuentan_el_stock_filtrado_y_se_cachean_por_version(stock_inicial):
+    """/api/stock/facets/ coincide con los conteos por columna y no vuelve a la tabla hasta la siguiente carga"""
+    cache.clear()
+    usuario = get_user_model().objects.create_user(username='usuario_facetas', password='x')
+    cliente = APIClient()
+    cliente.force_authenticate(user=usuario)
+    marca = stock_inicial[0].marca
+
+    respuesta = cliente.get('/api/stock/facets/', {'marca': marca}).json()
+    filtrado = Stock.objects.filter(marca=marca)
+    assert respuesta['total'] == filtrado.count()
+    for campo in ('modelo', 'provincia', 'color', 'tipo_vehiculo'):
+        esperado = {v[campo]: v['total'] for v in filtrado.values(campo).annotate(total=Count('bastidor'))}
+        assert {v['valor']: v['total'] for v in respuesta['facetas'][campo]} == esperado
+    assert [v['valor'] for v in respuesta['facetas']['marca']] == [marca]
+    assert sum(v['total'] for v in respuesta['facetas']['tramo_precio']) == filtrado.count()
+
+    Stock.objects.filter(marca=marca).delete()
+    assert cliente.get('/api/stock/facets/', {'marca': marca, 'page': 2}).json() == respuesta
+    invalidar_derivados()
+    assert cliente.get('/api/stock/facets/', {'marca': marca}).json()['total'] == 0
+
+
+@pytest.mark.django_db
+def test_estadisticas_salen_de_una_consulta_y_se_cachean_por_version(stock_inicial):
+    """/api/stock/stats/ calcula los indicadores en una consulta y no repite hasta la siguiente carga"""
+    cache.clear()
+    usuario = get_user_model().objects.create_user(username='usuario_stats', password='x')
+    cliente = APIClient()
+    cliente.force_authenticate(user=usuario)
+
+    with CaptureQueriesContext(connection) as consultas:
+        respuesta = cliente.get('/api/stock/stats/').json()
+    assert len([q for q in consultas.captured_queries if 'FROM "stock"' in q['sql']]) == 1
+
+    total = Stock.objects.count()
+    agregados = Stock.objects.aggregate(costo=Sum('importe_costo'), dias=Avg('dias_stock'))
+    assert respuesta['total_vehiculos'] == total
+    assert respuesta['vehiculos_disponibles'] == Stock.objects.filter(reservado=False).count()
+    assert respuesta['vehiculos_reservados'] == Stock.objects.filter(reservado=True).count()
+    assert respuesta['vehiculos_publicados'] == Stock.objects.filter(publicado=True).count()
+    assert respuesta['ratio_publicados'] == round(respuesta['vehiculos_publicados'] / total, 4)
+    assert respuesta['valor_stock_costo'] == pytest.approx(float(agregados['costo'] or 0))
+    if agregados['dias'] is not None:
+        assert respuesta['dias_stock_medio'] == pytest.approx(float(agregados['dias']), abs=0.05)
+    por_estado = Stock.objects.values('descripcion_estado').annotate(total=Count('pk'))
+    esperado = {v['descripcion_estado']: v['total'] for v in por_estado}
+    assert {e['estado']: e['total'] for e in respuesta['por_estado']} == esperado
+
+    Stock.objects.all().delete()
+    with CaptureQueriesContext(connection) as consultas:
+        assert cliente.get('/api/stock/stats/').json() == respuesta
+    assert not [q for q in consultas.captured_queries if 'FROM "stock"' in q['sql']]
+    invalidar_derivados()
+    vacio = cliente.get('/api/stock/stats/').json()
+    assert vacio['total_vehiculos'] == 0 and vacio['dias_stock_medio'] is None and vacio['por_estado'] == []
@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import StockViewSet
+from .views import JobRunViewSet, StockViewSet
 
 router = DefaultRouter()
 router.register(r'stock', StockViewSet, basename='stock')
+router.register(r'jobs', JobRunViewSet, basename='jobs')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -0,0 +1,147 @@
+"""
+Histórico de stock como dimensión lentamente cambiante (SCD tipo 2).
+
+En lugar de copiar cada día todo el inventario a stock_historico, cada
+vehículo tiene una fila por versión en stock_version con su vigencia
+[valid_from, valid_to). Al archivar un día se compara el hash de los
+atributos versionados de cada vehículo con el de su versión vigente y solo
+se cierran y escriben las que cambian, con una única consulta en el
+servidor. Un vehículo que pasa 200 días sin cambios ocupa una fila, no 200.
+
+Los contadores que avanzan solos cada día (días en stock, días publicado,
+visitas, leads...) no abren versión: la versión guarda el valor con el que
+empezó y los días se pueden recalcular a partir de valid_from.
+"""
+import logging
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+from django.db import connections, transaction
+from django.db.models import Max
+
+from apps.stock.models import Stock, StockHistorico, StockVersion
+
+logger = logging.getLogger(__name__)
+
+# Columnas propias de la versión, que no se copian del origen
+COLUMNAS_VIGENCIA = {'id', 'valid_from', 'valid_to', 'hash_fila'}
+
+# Columnas que se guardan pero cuyo cambio no abre una versión nueva
+COLUMNAS_NO_VERSIONADAS = {
+    'fecha_informe',
+    # Contadores de días
+    'dias_stock', 'meses_en_stock', 'dias_stock_fin_mes', 'intervalo_dias', 'intervalo_dias_fin_mes',
+    'intervalo_dias_vo', 'intervalo_dias_vo_new', 'antiguedad_anuncio', 'dias_primera_public', 'uc_dias',
+    'internet_dias_public', 'dias_desde_ult_cambio', 'dias_desde_foto_optipix',
+    # Actividad e indicadores de mercado
+    'visitas_totales', 'llamadas_recibidas', 'emails_recibidos', 'visitas_cambio', 'leads_cambio',
+    'visitas_cambio_dias', 'leads_cambio_dias', 'stock_leads', 'uds_mes', 'uds_3mes', 'uds_ano',
+    'internet_anuncios', 'internet_precio_min', 'internet_precio_max',
+}
+
+
+def columnas_version() -> List[str]:
+    """Columnas de stock_version que se copian del origen (stock o stock_historico)"""
+    return [
+        campo.column for campo in StockVersion._meta.concrete_fields
+        if campo.column not in COLUMNAS_VIGENCIA
+    ]
+
+
+def columnas_versionadas() -> List[str]:
+    """Columnas cuyo cambio abre una versión nueva del vehículo"""
+    return [
+        columna for columna in columnas_version()
+        if columna not in COLUMNAS_NO_VERSIONADAS and columna != 'bastidor'
+    ]
+
+
+def registrar_versiones(fecha: date, origen: Optional[str] = None, parametros: Sequence = (),
+                        using: str = 'default') -> Dict[str, int]:
+    """
+    Registra el estado del origen como vigente desde `fecha`.
+
+    Cierra (valid_to = fecha) las versiones vigentes de los vehículos que
+    cambian o desaparecen y abre una versión para los que cambian o son
+    nuevos. Volver a registrar la misma fecha sustituye lo registrado antes
+    para ella, así que la operación se puede repetir.
+
+    Args:
+        fecha: Fecha desde la que es válido el estado del origen
+        origen: SQL de una relación con las columnas de stock y un bastidor por
+            fila (por defecto la tabla stock)
+        parametros: Parámetros del SQL de origen
+        using: Alias de la base de datos
+
+    Returns:
+        Diccionario con las versiones cerradas y abiertas
+
+    Raises:
+        ValueError: Si ya hay versiones posteriores a la fecha
+    """
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    tabla = qn(StockVersion._meta.db_table)
+    origen = origen or qn(Stock._meta.db_table)
+
+    columnas = ', '.join(qn(c) for c in columnas_version())
+    seleccion = ', '.join(f'o.{qn(c)}' for c in columnas_version())
+    hash_fila = f"md5(ROW({', '.join(f'o.{qn(c)}' for c in columnas_versionadas())})::text)"
+
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(f'SELECT 1 FROM {tabla} WHERE valid_from > %s LIMIT 1', [fecha])
+        if cursor.fetchone():
+            raise ValueError(f'Ya hay versiones de stock posteriores a {fecha}')
+
+        # Repetición de la misma fecha: se deshace lo registrado para ella
+        cursor.execute(f'DELETE FROM {tabla} WHERE valid_from = %s', [fecha])
+        cursor.execute(f'UPDATE {tabla} SET valid_to = NULL WHERE valid_to = %s', [fecha])
+
+        # Las subconsultas ven las versiones anteriores al UPDATE de la CTE
+        cursor.execute(
+            f"""
+            WITH origen AS (
+                SELECT {seleccion}, {hash_fila} AS hash_fila FROM {origen} o
+            ),
+            cerradas AS (
+                UPDATE {tabla} v SET valid_to = %s
+                WHERE v.valid_to IS NULL AND NOT EXISTS (
+                    SELECT 1 FROM origen o WHERE o.bastidor = v.bastidor AND o.hash_fila = v.hash_fila
+                )
+                RETURNING 1
+            ),
+            abiertas AS (
+                INSERT INTO {tabla} ({columnas}, valid_from, valid_to, hash_fila)
+                SELECT {seleccion}, %s, NULL, o.hash_fila FROM origen o
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM {tabla} v
+                    WHERE v.bastidor = o.bastidor AND v.valid_to IS NULL AND v.hash_fila = o.hash_fila
+                )
+                RETURNING 1
+            )
+            SELECT (SELECT COUNT(*) FROM cerradas), (SELECT COUNT(*) FROM abiertas)
+            """,
+            [*parametros, fecha, fecha],
+        )
+        cerradas, abiertas = cursor.fetchone()
+
+    logger.info(f"Versiones de stock a {fecha}: {cerradas} cerradas, {abiertas} abiertas")
+    return {'cerradas': cerradas, 'abiertas': abiertas}
+
+
+def origen_historico(using: str = 'default') -> str:
+    """
+    SQL de origen con el inventario de un día de stock_historico (parámetro:
+    la fecha). Si un vehículo se archivó dos veces ese día vale la última.
+    """
+    qn = connections[using].ops.quote_name
+    return (
+        f'(SELECT DISTINCT ON (h.{qn("bastidor")}) h.* '
+        f'FROM {qn(StockHistorico._meta.db_table)} h WHERE h.{qn("fecha_snapshot")} = %s '
+        f'ORDER BY h.{qn("bastidor")}, h.{qn("id")} DESC)'
+    )
+
+
+def ultima_fecha_registrada(using: str = 'default') -> Optional[date]:
+    """Fecha de la última versión abierta, o None si no hay ninguna"""
+    return StockVersion.objects.using(using).aggregate(ultima=Max('valid_from'))['ultima']
@@ -1,13 +1,29 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q
-from .models import Stock, StockHistorico
-from .serializers import StockListSerializer, StockDetailSerializer
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from .busqueda import buscar_por_similitud, buscar_texto_completo
+from .cdc import LIMITE_CAMBIOS, leer_cambios
+from .consultas_historico import (
+    ORIGEN_VERSIONES, diferencias_snapshots, inventario_del_dia, origen_del_dia, serie_vehiculo,
+    ultimo_inventario,
+)
+from .derivados import calcular_estadisticas_api, obtener_derivado
+from .facetas import clave_filtros, contar_facetas
+from .models import JobRun, Stock
+from .paginacion import StockCursorPagination
+from .perfilado import tendencias
+from .serializers import (
+    JobRunSerializer, StockDetailSerializer, StockHistoricoListSerializer, StockListSerializer,
+    StockVersionListSerializer,
+)
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -26,9 +42,16 @@ class StockViewSet(viewsets.ReadOnlyModelViewSet):
 
     Endpoints:
     - GET /api/stock/ - Listar vehículos con paginación
+      (?paginacion=cursor para paginar por cursor sin OFFSET ni COUNT)
     - GET /api/stock/{bastidor}/ - Detalles de un vehículo
     - GET /api/stock/search/ - Búsqueda avanzada
+    - GET /api/stock/texto/?q= - Búsqueda de texto completo ordenada por relevancia
     - GET /api/stock/stats/ - Estadísticas del stock
+    - GET /api/stock/facets/ - Conteos por marca, modelo, provincia, color, tipo y precio
+    - GET /api/stock/as-of/?date= - Inventario tal como estaba en una fecha (histórico)
+    - GET /api/stock/{bastidor}/timeline/ - Evolución de un vehículo en el histórico
+    - GET /api/stock/diff/?from=&to= - Altas, bajas y cambios entre dos snapshots
+    - GET /api/stock/cambios/?cursor= - Eventos de cambio posteriores a un cursor (solo staff)
     """
 
     queryset = Stock.objects.all()
@@ -37,11 +60,12 @@ class StockViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
 
     # Campos para búsqueda
-    search_fields = ['marca', 'modelo', 'bastidor', 'matricula', 'color', 'version']
+    search_fields = ['marca', 'modelo', 'bastidor', 'matricula', 'color']
 
     # Campos para ordenamiento
     ordering_fields = ['precio_venta', 'kilometros', 'anio_matricula', 'fecha_informe']
-    ordering = ['-fecha_informe']  # Ordenamiento por defecto: más recientes primero
+    # Ordenamiento por defecto: más recientes primero, con el bastidor como desempate
+    ordering = ['-fecha_informe', '-bastidor']
 
     # Campos para filtrado
     filterset_fields = {
@@ -58,6 +82,14 @@ class StockViewSet(viewsets.ReadOnlyModelViewSet):
         'descripcion_estado': ['exact', 'icontains'],
     }
 
+    @property
+    def paginator(self):
+        """Paginación por cursor en el listado si la petición la pide"""
+        if not hasattr(self, '_paginator') and self.action == 'list' \
+                and StockCursorPagination.solicitada(self.request):
+            self._paginator = StockCursorPagination()
+        return super().paginator
+
     def get_serializer_class(self):
         """Usa diferentes serializadores para list y detail"""
         if self.action == 'retrieve':
@@ -74,17 +106,31 @@ class StockViewSet(viewsets.ReadOnlyModelViewSet):
             "query": "bmw 2020",
             "min_price": 10000,
             "max_price": 50000,
-            "marca": "bmw"
+            "marca": "bmw",
+            "modo": "contiene"
         }
+
+        modo "contiene" (por defecto) busca el texto tal cual en marca, modelo,
+        bastidor, matrícula y color; modo "similitud" tolera erratas
+        ("mercedez", "vw golf") y ordena por relevancia.
         """
         query = request.data.get('query', '')
         min_price = request.data.get('min_price')
         max_price = request.data.get('max_price')
         marca = request.data.get('marca')
+        modo = request.data.get('modo', 'contiene')
+
+        if modo not in ('contiene', 'similitud'):
+            return Response(
+                {'error': 'modo debe ser "contiene" o "similitud"'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         queryset = self.queryset
 
-        if query:
+        if query and modo == 'similitud':
+            queryset = buscar_por_similitud(queryset, query)
+        elif query:
             queryset = queryset.filter(
                 Q(marca__icontains=query) |
                 Q(modelo__icontains=query) |
@@ -110,22 +156,212 @@ class StockViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = StockListSerializer(queryset, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def texto(self, request):
+        """
+        Búsqueda de texto completo en español, ordenada por relevancia
+
+        Query params:
+        - q: texto a buscar (obligatorio), p. ej. "suv diesel automático blanco"
+        - los mismos filtros y paginación que /api/stock/
+
+        Busca en marca, modelo, versión, tipo, color, concesionario y provincia
+        sin distinguir tildes ni formas de las palabras (blanco/blancos).
+        """
+        q = request.query_params.get('q', '').strip()
+        if not q:
+            return Response({'error': 'El parámetro q es obligatorio'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = buscar_texto_completo(self.filter_queryset(self.get_queryset()), q)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = StockListSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = StockListSerializer(queryset, many=True)
+        return Response(serializer.data)
+
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """
-        Estadísticas básicas del stock
+        Indicadores del stock actual
+
+        Conteos, valor a coste, días medios en stock, ratio de publicados y
+        reparto por estado, de una sola consulta y precalculados tras cada carga
+        """
+        return Response(obtener_derivado('estadisticas_api', calcular_estadisticas_api))
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Conteos por faceta del stock filtrado, para la barra de filtros
+
+        Query params: los mismos filtros y búsqueda que /api/stock/
+
+        Devuelve el total y, para marca, modelo, provincia, color,
+        tipo_vehiculo y tramo_precio, los valores con su número de
+        vehículos. Se calcula con una sola consulta y se guarda en caché
+        hasta la siguiente carga del stock.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(
+            obtener_derivado('facetas', lambda: contar_facetas(queryset), clave_filtros(request.query_params))
+        )
+
+    @action(detail=False, methods=['get'], url_path='as-of')
+    def as_of(self, request):
+        """
+        Inventario tal como estaba en una fecha, leído de stock_historico
+
+        Query params:
+        - date: fecha en formato AAAA-MM-DD (obligatorio)
+        - los mismos filtros, búsqueda, ordenación y paginación que /api/stock/
+
+        Si ese día no hubo snapshot en stock_historico se responde con las
+        versiones vigentes ese día (stock_version); si tampoco las hay, con el
+        inventario más reciente anterior. La fecha usada se devuelve en
+        fecha_snapshot y su origen ('snapshot' o 'versiones') en origen.
+        Cada vehículo aparece una vez.
+        """
+        valor = request.query_params.get('date', '')
+        try:
+            fecha = parse_date(valor)
+        except ValueError:
+            fecha = None
+        if fecha is None:
+            return Response(
+                {'error': 'El parámetro date es obligatorio (AAAA-MM-DD)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        inventario = ultimo_inventario(fecha)
+        if inventario is None:
+            return Response(
+                {'error': f'No hay histórico de stock anterior o igual a {fecha}'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        fecha_snapshot, origen = inventario
+
+        queryset = self.filter_queryset(inventario_del_dia(fecha_snapshot, origen))
+        serializer_class = (
+            StockVersionListSerializer if origen == ORIGEN_VERSIONES else StockHistoricoListSerializer
+        )
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = serializer_class(page, many=True)
+            response = self.get_paginated_response(serializer.data)
+            response.data['fecha_snapshot'] = fecha_snapshot
+            response.data['origen'] = origen
+            return response
+
+        serializer = serializer_class(queryset, many=True)
+        return Response({'fecha_snapshot': fecha_snapshot, 'origen': origen, 'results': serializer.data})
+
+    @action(detail=False, methods=['get'])
+    def diff(self, request):
+        """
+        Vehículos dados de alta, de baja o modificados entre dos snapshots
+
+        Query params:
+        - from: fecha del snapshot de partida (AAAA-MM-DD, obligatorio)
+        - to: fecha del snapshot final (AAAA-MM-DD, obligatorio)
+
+        Cada día sale de su snapshot en stock_historico o, si no lo tiene, de
+        las versiones vigentes ese día en stock_version; si no hay ninguno de
+        los dos se responde 404 en lugar de comparar con datos que faltan.
+
+        La respuesta se genera mientras se lee la consulta por páginas, sin
+        cargar la diferencia completa en memoria. Las modificaciones incluyen
+        en campos cada columna que cambia como [antes, después].
+        """
+        fechas = {}
+        origenes = {}
+        for nombre in ('from', 'to'):
+            try:
+                fechas[nombre] = parse_date(request.query_params.get(nombre, ''))
+            except ValueError:
+                fechas[nombre] = None
+            if fechas[nombre] is None:
+                return Response(
+                    {'error': f'El parámetro {nombre} es obligatorio (AAAA-MM-DD)'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            origenes[nombre] = origen_del_dia(fechas[nombre])
+            if origenes[nombre] is None:
+                return Response(
+                    {'error': f'No hay snapshot ni versiones de stock del {fechas[nombre]}'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+        def generar():
+            yield json.dumps({'from': str(fechas['from']), 'to': str(fechas['to'])})[:-1] + ', "cambios": ['
+            total = 0
+            for cambio in diferencias_snapshots(
+                fechas['from'], fechas['to'], origen_desde=origenes['from'], origen_hasta=origenes['to']
+            ):
+                yield (', ' if total else '') + json.dumps(cambio, ensure_ascii=False)
+                total += 1
+            yield f'], "total": {total}}}'
+
+        return StreamingHttpResponse(generar(), content_type='application/json')
+
+    @action(detail=True, methods=['get'])
+    def timeline(self, request, pk=None):
+        """
+        Evolución de precio, días en stock, reserva y publicación de un vehículo
+
+        Query params:
+        - desde, hasta: rango de fechas de snapshot (AAAA-MM-DD, opcionales)
+
+        La respuesta es columnar: una lista por campo, alineada con fechas.
+        También sirve para vehículos que ya no están en stock. Los días sin
+        snapshot se completan con las versiones de stock_version.
+        """
+        rango = {}
+        for nombre in ('desde', 'hasta'):
+            valor = request.query_params.get(nombre)
+            if not valor:
+                continue
+            try:
+                rango[nombre] = parse_date(valor)
+            except ValueError:
+                rango[nombre] = None
+            if rango[nombre] is None:
+                return Response(
+                    {'error': f'{nombre} debe ser una fecha AAAA-MM-DD'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        serie = serie_vehiculo(pk, **rango)
+        if serie is None:
+            return Response(
+                {'error': f'No hay histórico para el vehículo {pk}'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(serie)
 
-        Devuelve conteos básicos del stock actual
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated, IsAdminUser])
+    def cambios(self, request):
         """
-        total_vehiculos = self.queryset.count()
-        vehiculos_disponibles = self.queryset.filter(reservado=False).count()
-        vehiculos_publicados = self.queryset.filter(publicado=True).count()
+        Eventos de cambio de stock posteriores a un cursor (outbox de CDC)
 
-        return Response({
-            'total_vehiculos': total_vehiculos,
-            'vehiculos_disponibles': vehiculos_disponibles,
-            'vehiculos_publicados': vehiculos_publicados,
-        })
+        Query params:
+        - cursor: cursor devuelto por la llamada anterior (vacío para empezar)
+        - limite: número máximo de eventos (default: 1000, máximo: 10000)
+
+        Para consumir todos los cambios se repite la llamada con el cursor
+        devuelto mientras hay_mas sea true.
+        """
+        try:
+            limite = int(request.query_params.get('limite', LIMITE_CAMBIOS))
+        except ValueError:
+            return Response({'error': 'limite debe ser un entero'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            return Response(leer_cambios(request.query_params.get('cursor', ''), limite))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=False, methods=['get'])
     def export(self, request):
@@ -204,4 +440,40 @@ class StockViewSet(viewsets.ReadOnlyModelViewSet):
             return response
 
 
-from django.db.models import Count
+class JobRunViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Ejecuciones de comandos registradas con --profile y sus pasos.
+
+    Endpoints:
+    - GET /api/jobs/ - Listar ejecuciones (filtros: command, status)
+    - GET /api/jobs/{id}/ - Detalle de una ejecución con sus pasos
+    - GET /api/jobs/tendencias/?command=migrate_stock_and_scrape&ultimas=30 - Evolución por paso
+    """
+
+    queryset = JobRun.objects.prefetch_related('steps')
+    serializer_class = JobRunSerializer
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    pagination_class = StandardResultsSetPagination
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['command', 'status']
+    ordering_fields = ['started_at', 'wall_time']
+    ordering = ['-started_at']
+
+    @action(detail=False, methods=['get'])
+    def tendencias(self, request):
+        """
+        Series de métricas por paso de las últimas ejecuciones de un comando
+
+        Query params:
+        - command: nombre del comando (obligatorio)
+        - ultimas: número de ejecuciones (default: 30)
+        """
+        command = request.query_params.get('command')
+        if not command:
+            return Response({'error': 'El parámetro command es obligatorio'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ultimas = max(1, int(request.query_params.get('ultimas', 30)))
+        except ValueError:
+            return Response({'error': 'ultimas debe ser un entero'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(tendencias(command, ultimas))
@@ -27,6 +27,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # Third party
     'rest_framework',
@@ -175,6 +176,14 @@ DEEPSEEK_API_KEY = config('DEEPSEEK_API_KEY', default='sk-or-v1-60c1d8470f33af2e
 DEEPSEEK_API_BASE = 'https://openrouter.ai/api/v1'  # OpenRouter endpoint
 DEEPSEEK_MODEL = 'openai/gpt-oss-20b'  # Modelo principal - GPT-OSS-20B
 
+# Generación de vehículos con IA (apps.stock.ai_vehicle_generator): lotes en paralelo
+# con tamaño adaptativo según la latencia observada
+AI_GENERATOR_CONCURRENCIA = config('AI_GENERATOR_CONCURRENCIA', default=4, cast=int)
+AI_GENERATOR_MAX_LOTE = config('AI_GENERATOR_MAX_LOTE', default=30, cast=int)
+AI_GENERATOR_LATENCIA_OBJETIVO = config('AI_GENERATOR_LATENCIA_OBJETIVO', default=20.0, cast=float)
+# Con --streaming, vehículos generados que se guardan juntos en cuanto llegan
+AI_GENERATOR_LOTE_INSERCION = config('AI_GENERATOR_LOTE_INSERCION', default=25, cast=int)
+
 # Lista de modelos de fallback (se intentarán en orden si el principal falla)
 # Solo modelos verificados como disponibles en OpenRouter
 DEEPSEEK_FALLBACK_MODELS = [
@@ -198,3 +207,29 @@ DEEPSEEK_FALLBACK_MODELS = [
     'meta-llama/llama-3.2-3b-instruct:free',
     'mistralai/mistral-7b-instruct:free',
 ]
+
+# Scraping de coches.net (apps.stock.fetcher)
+SCRAPER_CONCURRENCIA = config('SCRAPER_CONCURRENCIA', default=4, cast=int)
+SCRAPER_PETICIONES_POR_SEGUNDO = config('SCRAPER_PETICIONES_POR_SEGUNDO', default=2.0, cast=float)
+SCRAPER_REINTENTOS = config('SCRAPER_REINTENTOS', default=3, cast=int)
+# Backend de extracción del HTML ("lxml" o "bs4") y procesos entre los que se reparte el parseo
+SCRAPER_EXTRACTOR = config('SCRAPER_EXTRACTOR', default='lxml')
+SCRAPER_PROCESOS = config('SCRAPER_PROCESOS', default=1, cast=int)
+# Caché HTTP en disco con peticiones condicionales (apps.stock.cache_http); vacío para desactivarla
+SCRAPER_CACHE_DIR = config('SCRAPER_CACHE_DIR', default=str(BASE_DIR / 'cache' / 'scraper'))
+
+# Caché compartida entre procesos (web, scheduler y etapas de derivados); sin REDIS_URL
+# se usa la caché en memoria de Django, válida solo dentro de cada proceso
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+# Derivados del stock que se precalculan al terminar la carga nocturna (apps.stock.derivados)
+STOCK_DERIVADOS_PROCESOS = config('STOCK_DERIVADOS_PROCESOS', default=4, cast=int)
+STOCK_DERIVADOS_TIMEOUT = config('STOCK_DERIVADOS_TIMEOUT', default=300.0, cast=float)
+STOCK_DERIVADOS_TTL = config('STOCK_DERIVADOS_TTL', default=26 * 3600, cast=int)